@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Agent pipeline record/replay harness
+Records a scenario against OpenAI to a cassette, or replays it offline with a
+deterministic fake chat model, driving every message through the webhook
+against a local MongoDB. Reports our own overhead per turn (graph
+construction, DB round trips, the rest of the turn) with model latency
+excluded, and checks replayed replies against the recording.
+Needs MONGODB_URI pointing to a local MongoDB; DATABASE_NAME defaults to
+broky_replay and is dropped before every run.
+Usage:
+  python scripts/agent_replay.py record -s scripts/scenarios/buyer_inquiry.json -c cassettes/buyer_inquiry.json
+  python scripts/agent_replay.py replay -s scripts/scenarios/buyer_inquiry.json -c cassettes/buyer_inquiry.json [-n RUNS] [--profile]
+"""
+import os
+import sys
+import json
+import cProfile
+import pstats
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_NAME", "broky_replay")
+os.environ.setdefault("INFOBIP_API_KEY", "harness-placeholder")
+os.environ.setdefault("INFOBIP_WHATSAPP_FROM", "573000000000")
+
+from bson import json_util
+
+
+def load_scenario(path):
+    """Load a scenario; seed documents use MongoDB extended JSON ($oid, $date)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json_util.loads(f.read())
+
+
+def summarize(results):
+    """Median per-turn figures over the runs"""
+    turns = {}
+    for run in results:
+        for turn in run:
+            turns.setdefault(turn.turn, []).append(turn)
+    summary = []
+    for index, samples in sorted(turns.items()):
+        summary.append({
+            "turn": index,
+            "text": samples[0].text,
+            "model_calls": samples[0].model_calls,
+            "input_tokens": samples[0].input_tokens,
+            "output_tokens": samples[0].output_tokens,
+            "overhead_ms_p50": round(statistics.median(t.overhead_ms for t in samples), 3),
+            "graph_build_ms_p50": round(statistics.median(t.graph_build_ms for t in samples), 3),
+            "db_round_trips": samples[0].db_round_trips,
+            "db_ms_p50": round(statistics.median(t.db_ms for t in samples), 3),
+            "other_ms_p50": round(statistics.median(t.other_ms for t in samples), 3),
+            "db_commands": samples[0].db_commands,
+        })
+    return summary
+
+
+def record(scenario_path, cassette_path):
+    from src.app.devtools.cassette import Cassette
+    from src.app.devtools.harness import AgentHarness
+
+    cassette = Cassette(cassette_path)
+    with AgentHarness(cassette, mode="record") as harness:
+        results = harness.run(load_scenario(scenario_path))
+    cassette.replies = [turn.replies for turn in results]
+    cassette.save()
+    print(json.dumps(summarize([results]), indent=2, ensure_ascii=False))
+    for turn in results:
+        print(f"[{turn.turn}] {turn.text}\n    -> {turn.replies}")
+
+
+def replay(scenario_path, cassette_path, runs, profile=False):
+    from src.app.devtools.cassette import Cassette
+    from src.app.devtools.harness import AgentHarness
+
+    cassette = Cassette.load(cassette_path)
+    scenario = load_scenario(scenario_path)
+    results = []
+    profiler = cProfile.Profile() if profile else None
+    with AgentHarness(cassette, mode="replay") as harness:
+        for run in range(runs):
+            # The first run builds the graphs, the next ones show the steady state
+            if profiler and run > 0:
+                profiler.enable()
+            results.append(harness.run(scenario))
+            if profiler:
+                profiler.disable()
+
+    print(json.dumps({"runs": runs, "turns": summarize(results)}, indent=2, ensure_ascii=False))
+
+    # Replay is deterministic: every run must send the replies that were recorded
+    diverged = [run for run, turns in enumerate(results) if [turn.replies for turn in turns] != cassette.replies]
+    if diverged:
+        print(f"Replies differ from the recording in runs {diverged}")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Agent pipeline record/replay harness')
+    parser.add_argument('mode', choices=['record', 'replay'], help='Record against OpenAI or replay offline')
+    parser.add_argument('-s', '--scenario', required=True, help='Scenario JSON file')
+    parser.add_argument('-c', '--cassette', required=True, help='Cassette JSON file')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='Replay runs')
+    parser.add_argument('--profile', action='store_true', help='Profile the steady-state replay runs')
+
+    args = parser.parse_args()
+    if args.mode == 'record':
+        record(args.scenario, args.cassette)
+    else:
+        replay(args.scenario, args.cassette, args.runs, args.profile)
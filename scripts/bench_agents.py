@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Agent benchmark suite
+Replays the synthetic conversations of scripts/scenarios/corpus (one per
+stage agent: RegisterAgent, PublisherAgent, VisitsAgent, CompletedDealAgent,
+SchedulerAgent) through the webhook with scripted fake chat models, so every
+turn runs the agents, tools and CRUD layer for real without any network
+call. Reports per stage the p50/p95/p99 of our own overhead per turn, the
+MongoDB round trips per turn and the memory allocated per turn (a separate
+tracemalloc pass, its overhead kept out of the timings), as JSON tagged
+with the commit, so runs of two commits can be compared with --baseline.
+Needs MONGODB_URI pointing to a local MongoDB; DATABASE_NAME defaults to
+broky_replay and is dropped before every run.
+Usage: python scripts/bench_agents.py [-n RUNS] [--stage STAGE] [-o results.json] [--baseline old.json] [--threshold 0.2] [--fail-on-regression]
+"""
+import os
+import sys
+import glob
+import json
+import subprocess
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_NAME", "broky_replay")
+os.environ.setdefault("OPENAI_API_KEY", "bench-placeholder")
+os.environ.setdefault("INFOBIP_API_KEY", "harness-placeholder")
+os.environ.setdefault("INFOBIP_WHATSAPP_FROM", "573000000000")
+
+from agent_replay import load_scenario
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "scenarios", "corpus")
+# Compared against the baseline, lower is better for all of them
+COMPARED = ("overhead_ms_p50", "overhead_ms_p95", "db_round_trips_per_turn", "alloc_peak_kib_per_turn")
+
+
+def commit():
+    """Short hash of the checked out commit, with a mark if the tree has changes"""
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True, stderr=subprocess.DEVNULL).strip()
+        dirty = subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{sha}-dirty" if dirty else sha
+
+
+def served_by():
+    """Turns served per agent, from the webhook's agent.turn_ms observations"""
+    from src.app.utils.metrics import metrics
+
+    prefix = "agent.turn_ms{agent="
+    return {
+        key[len(prefix):-1]: value["count"]
+        for key, value in metrics.snapshot()["histograms"].items()
+        if key.startswith(prefix)
+    }
+
+
+def timed_runs(harness, scenario, runs):
+    """Run the scenario, the first run warms the graph cache and is left out"""
+    from src.app.utils.metrics import metrics
+
+    harness.run(scenario)
+    metrics.reset()
+    turns = []
+    for _ in range(runs):
+        turns.extend(harness.run(scenario))
+    return turns, served_by()
+
+
+def allocation_run(harness, scenario):
+    """Peak and retained traced memory of every turn of one run"""
+    harness.reset_db(scenario.get("seed"))
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for turn, message in enumerate(scenario["messages"]):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            harness.run_turn(turn, message)
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - before) / 1024)
+            retained.append((after - before) / 1024)
+    finally:
+        tracemalloc.stop()
+    return peaks, retained
+
+
+def stage_report(scenario, turns, agents, peaks, retained):
+    from src.app.utils.metrics import percentile
+
+    overhead = [turn.overhead_ms for turn in turns]
+    return {
+        "agent": scenario.get("agent"),
+        "served_by": agents,
+        "turns": len(turns),
+        "model_calls_per_turn": round(sum(turn.model_calls for turn in turns) / len(turns), 2),
+        "overhead_ms_p50": round(percentile(overhead, 50), 3),
+        "overhead_ms_p95": round(percentile(overhead, 95), 3),
+        "overhead_ms_p99": round(percentile(overhead, 99), 3),
+        "graph_build_ms_p50": round(percentile([turn.graph_build_ms for turn in turns], 50), 3),
+        "db_ms_p50": round(percentile([turn.db_ms for turn in turns], 50), 3),
+        "db_round_trips_per_turn": round(sum(turn.db_round_trips for turn in turns) / len(turns), 2),
+        "alloc_peak_kib_per_turn": round(sum(peaks) / len(peaks), 1),
+        "alloc_retained_kib_per_turn": round(sum(retained) / len(retained), 1),
+    }
+
+
+def compare(stages, baseline, threshold):
+    """Relative change of every compared figure against the baseline, and the regressions beyond the threshold"""
+    changes, regressions = {}, []
+    for stage, report in stages.items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous:
+            continue
+        changes[stage] = {}
+        for figure in COMPARED:
+            if not previous.get(figure):
+                continue
+            change = (report[figure] - previous[figure]) / previous[figure]
+            changes[stage][figure] = round(change, 3)
+            if change > threshold:
+                regressions.append(f"{stage} {figure}: {previous[figure]} -> {report[figure]} (+{change:.0%})")
+    return changes, regressions
+
+
+def bench(runs=10, stage=None, output=None, baseline_path=None, threshold=0.2):
+    from src.app.devtools.cassette import Cassette
+    from src.app.devtools.harness import AgentHarness
+
+    scenarios = [load_scenario(path) for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.json")))]
+    if stage:
+        scenarios = [scenario for scenario in scenarios if scenario["stage"] == stage]
+
+    stages = {}
+    with AgentHarness(Cassette(), mode="scripted") as harness:
+        for scenario in scenarios:
+            turns, agents = timed_runs(harness, scenario, runs)
+            peaks, retained = allocation_run(harness, scenario)
+            stages[scenario["stage"]] = stage_report(scenario, turns, agents, peaks, retained)
+
+    results = {"commit": commit(), "runs": runs, "stages": stages}
+    regressions = []
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        changes, regressions = compare(stages, baseline, threshold)
+        results["baseline"] = {"commit": baseline.get("commit"), "threshold": threshold, "changes": changes, "regressions": regressions}
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return results, regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Agent benchmark suite')
+    parser.add_argument('-n', '--runs', type=int, default=10, help='Timed runs of every conversation')
+    parser.add_argument('--stage', help='Only the conversation of this stage (e.g. seller:visits)')
+    parser.add_argument('-o', '--output', help='Write the results JSON to this file')
+    parser.add_argument('--baseline', help='Results JSON of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative increase reported as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 if any figure regressed')
+
+    args = parser.parse_args()
+    _, regressions = bench(args.runs, args.stage, args.output, args.baseline, args.threshold)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Agent input building benchmark
+Compares the per-turn cost of building the agent's input the way turns did
+before checkpoints (the conversation window rebuilt from the whole history)
+with resuming from the chat's last checkpoint (metadata lookup, loading the
+checkpoint and converting only the new messages), for chats of growing
+length. Reports the time, the MongoDB commands and the tokens of the
+messages handed to the graph; the model still sees the whole checkpointed
+state, so this is the cost of preparing a turn, not of the model call.
+Needs MONGODB_URI pointing to a MongoDB; DATABASE_NAME defaults to
+broky_replay and its checkpoint collections are cleared before the run.
+Usage: python scripts/bench_checkpoints.py [-n ITERATIONS] [--turns 10 50 200] [--rtt-ms MS]
+"""
+import os
+import sys
+import json
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_NAME", "broky_replay")
+
+from pymongo import monitoring
+
+from bench_tool_calls import SimulatedLatency
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts the MongoDB commands sent"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def history(turns):
+    """Conversation history of a chat with the given number of turns"""
+    messages = []
+    for turn in range(turns):
+        messages.append({"sender": "user", "content": f"Mensaje {turn} del vendedor sobre el apartamento y la visita", "type": "text"})
+        messages.append({"sender": "system", "content": f"Respuesta {turn} de Broky con la información solicitada", "type": "text"})
+    messages.append({"sender": "user", "content": "¿Cuándo pueden venir a verlo?", "type": "text"})
+    return messages
+
+
+def seed_checkpoint(agent, agent_context, thread_id):
+    """Store the checkpoint a run of the previous turn would have left"""
+    from langchain_core.messages import AIMessage, ToolMessage
+    from langgraph.checkpoint.base import empty_checkpoint
+    from src.app.core.agent.checkpointer import get_checkpointer
+
+    previous = dict(agent_context, conversation_history=agent_context["conversation_history"][:-2])
+    state, config = agent.build_input(previous, thread_id)
+    messages = [message for message in state["messages"] if message.type != "remove"]
+    # Tool calls of the previous turn and its reply, kept in the checkpoint
+    messages += [
+        AIMessage(content="", tool_calls=[{"name": "get_user_info", "args": {}, "id": "call-0"}]),
+        ToolMessage(content="{}", tool_call_id="call-0"),
+        AIMessage(content=agent_context["conversation_history"][-2]["content"]),
+    ]
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": messages, "chat_id": agent_context["chat_id"]}
+    get_checkpointer().put(config, checkpoint, {"source": "loop", "step": 1, "parents": {}}, {})
+
+
+def bench(iterations=20, turns=(10, 50, 200), rtt_ms=0):
+    """Benchmark the window rebuild against the checkpoint resume"""
+    counter = CommandCounter()
+    monitoring.register(counter)
+    if rtt_ms:
+        monitoring.register(SimulatedLatency(rtt_ms))
+
+    from src.app.config import settings
+    from src.app.core.agent.checkpointer import get_checkpointer
+    from src.app.core.agent.context import count_tokens
+    from src.app.core.agent.seller.register import RegisterAgent
+
+    # Every turn stays in the window, so no run folds into the summary
+    settings.CONTEXT_KEEP_TURNS = max(turns) + 1
+    settings.CHECKPOINT_MAX_MESSAGES = 10 * max(turns)
+
+    agent = RegisterAgent()
+    checkpointer = get_checkpointer()
+    results = {}
+    for length in turns:
+        agent_context = {"chat_id": f"bench-{length}", "conversation_history": history(length)}
+        thread_id = agent.thread_id(agent_context, direct=True)
+        checkpointer.delete_thread(thread_id)
+        seed_checkpoint(agent, agent_context, thread_id)
+
+        modes = {}
+        for mode in ("rebuild", "resume"):
+            timings, commands = [], []
+            for _ in range(iterations):
+                before = counter.count
+                start = time.perf_counter()
+                if mode == "rebuild":
+                    state = agent.build_state(agent_context)
+                else:
+                    state, config = agent.build_input(agent_context, thread_id)
+                    # The graph loads the checkpoint it resumes from
+                    checkpointer.get_tuple(config)
+                timings.append((time.perf_counter() - start) * 1000)
+                commands.append(counter.count - before)
+            modes[mode] = {
+                "ms_p50": round(statistics.median(timings), 3),
+                "db_commands": statistics.median(commands),
+                "input_messages": len(state["messages"]),
+                "input_tokens": count_tokens(state["messages"]),
+            }
+        modes["speedup"] = round(modes["rebuild"]["ms_p50"] / modes["resume"]["ms_p50"], 2)
+        results[f"{length} turns"] = modes
+        checkpointer.delete_thread(thread_id)
+
+    print(json.dumps({"iterations": iterations, "rtt_ms": rtt_ms, "chats": results}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Agent input building benchmark')
+    parser.add_argument('-n', '--iterations', type=int, default=20, help='Runs per chat length and mode')
+    parser.add_argument('--turns', type=int, nargs='+', default=[10, 50, 200], help='Chat lengths in turns')
+    parser.add_argument('--rtt-ms', type=float, default=0, help='Simulated MongoDB round trip per command')
+
+    args = parser.parse_args()
+    bench(args.iterations, tuple(args.turns), args.rtt_ms)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Webhook concurrency benchmark
+Posts bursts of concurrent inbound messages (one per seller chat) to the
+webhook in-process, on a single event loop as in one uvicorn worker, with
+the model answered by the local OpenAI stand-in after --model-ms. Runs every
+burst twice: with the async agent path, and with the agent run blocking the
+event loop as the webhook used to (sync process_direct), and reports the
+wall time, the turns per second and the turn latency.
+Outbound WhatsApp messages are captured, not sent.
+Needs MONGODB_URI pointing to a MongoDB; DATABASE_NAME defaults to
+broky_replay and is dropped before the run.
+Usage: python scripts/bench_concurrency.py [--concurrency 1 10 100 300] [--model-ms MS]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_NAME", "broky_replay")
+os.environ.setdefault("INFOBIP_API_KEY", "bench-placeholder")
+os.environ.setdefault("INFOBIP_WHATSAPP_FROM", "573000000000")
+
+from bench_model_clients import percentiles, start_stand_in
+
+MESSAGE = "Queda en la Carrera 15 #93-40, Chicó, Bogotá"
+
+
+def seed(chats):
+    """Seed one seller per concurrent chat"""
+    from datetime import datetime
+    from src.app.core.database import DATABASE_NAME, get_db
+
+    db = get_db()
+    db.client.drop_database(DATABASE_NAME)
+    phones = [f"57310{index:07d}" for index in range(chats)]
+    db.users.insert_many([
+        {"name": f"Vendedor {index}", "phone": phone, "role": "seller", "availability": [], "created_at": datetime.utcnow()}
+        for index, phone in enumerate(phones)
+    ])
+    return phones
+
+
+def capture_outbound():
+    """Answer the Infobip calls locally"""
+    from src.app.models.whatsapp import MessageStatus, WhatsAppResponse
+    from src.app.services.infobip_service import InfobipService
+
+    def send(service, to, content=None, *args, **kwargs):
+        return WhatsAppResponse(
+            to=to,
+            messageCount=1,
+            messageId="bench",
+            status=MessageStatus(groupId=1, groupName="PENDING", id=7, name="PENDING_ENROUTE", description="Captured by the benchmark"),
+        )
+
+    async def asend(service, to, content=None, *args, **kwargs):
+        return send(service, to, content)
+
+    async def mark_as_read(service, message_id):
+        return True
+
+    # Replies go through the outbound dispatcher's threads, the inline sends stay async
+    InfobipService.send_text_message = send
+    InfobipService.send_image_message = send
+    InfobipService.asend_text_message = asend
+    InfobipService.asend_image_message = asend
+    InfobipService.amark_as_read = mark_as_read
+
+
+def payload(phone, turn):
+    return {
+        "results": [{
+            "messageId": f"bench-{phone}-{turn}",
+            "sender": phone,
+            "destination": os.environ["INFOBIP_WHATSAPP_FROM"],
+            "event": "MO",
+            "channel": "WHATSAPP",
+            "content": [{"type": "TEXT", "text": MESSAGE}],
+        }]
+    }
+
+
+async def burst(client, phones, turn):
+    """Post one message per chat at once"""
+    async def post(phone):
+        start = time.perf_counter()
+        response = await client.post("/webhook", json=payload(phone, turn), timeout=None)
+        response.raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(post(phone) for phone in phones))
+    wall_ms = (time.perf_counter() - start) * 1000
+    return {
+        "wall_ms": round(wall_ms, 1),
+        "turns_per_s": round(len(phones) / (wall_ms / 1000), 1),
+        **percentiles(timings),
+    }
+
+
+async def run(concurrency, model_ms):
+    import httpx
+    from src.app.main import app, configure_blocking_io
+    from src.app.core.agent.main import Agent
+
+    # The ASGI transport does not run the startup hooks
+    await configure_blocking_io()
+
+    async_direct = Agent.aprocess_direct
+
+    async def blocking_direct(self, agent_context):
+        # The agent run as the webhook used to do it, on the event loop
+        return self.process_direct(agent_context)
+
+    results = {}
+    turn = 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for chats in concurrency:
+            phones = seed(chats)
+            # Warm-up turn: builds the graphs and creates the chats
+            await burst(client, phones[:1], turn)
+            turn += 1
+            level = {}
+            for mode, process_direct in (("blocking", blocking_direct), ("async", async_direct)):
+                Agent.aprocess_direct = process_direct
+                level[mode] = await burst(client, phones, turn)
+                turn += 1
+            Agent.aprocess_direct = async_direct
+            level["speedup"] = round(level["blocking"]["wall_ms"] / level["async"]["wall_ms"], 2)
+            results[str(chats)] = level
+    return {"model_ms": model_ms, "concurrency": results}
+
+
+def bench(concurrency=(1, 10, 100, 300), model_ms=500, port=8101):
+    os.environ["MOCK_OPENAI_LATENCY_MS"] = str(model_ms)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench-placeholder")
+    start_stand_in(port)
+
+    from src.app.config import settings
+    # Enough model connections for the largest burst
+    settings.OPENAI_MAX_CONNECTIONS = max(settings.OPENAI_MAX_CONNECTIONS, max(concurrency))
+    # Every message goes to the agent (registration stage, direct worker), without checkpoints
+    settings.FAST_PATH_ENABLED = False
+    settings.AGENT_CHECKPOINTS = False
+    settings.PROCESSING_MESSAGE = ""
+    capture_outbound()
+
+    results = asyncio.run(run(concurrency, model_ms))
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Webhook concurrency benchmark')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 100, 300], help='Concurrent turns per burst')
+    parser.add_argument('--model-ms', type=float, default=500, help='Latency of the model stand-in')
+    parser.add_argument('--port', type=int, default=8101, help='Port for the in-process stand-in')
+
+    args = parser.parse_args()
+    bench(tuple(args.concurrency), args.model_ms, args.port)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Delivery report ingestion benchmark
+Records --messages sent messages, then applies their delivery and seen
+reports in webhooks of --batch reports (the way Infobip groups them), once
+with one update per report and once with the bulk write of
+OutboundCRUD.apply_transitions. Reports the time per webhook and the MongoDB
+commands of both, and the time of the "undelivered in the last hour" query
+with the index it used.
+Needs MONGODB_URI pointing to a MongoDB; DATABASE_NAME defaults to
+broky_replay and its outbound_messages collection is cleared before the run.
+Usage: python scripts/bench_delivery_reports.py [--messages N] [--batch N] [--failed-rate R] [--rtt-ms MS]
+"""
+import os
+import sys
+import json
+import time
+import random
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_NAME", "broky_replay")
+os.environ.setdefault("INFOBIP_API_KEY", "bench-placeholder")
+os.environ.setdefault("INFOBIP_WHATSAPP_FROM", "573000000000")
+
+from pymongo import monitoring
+
+from bench_checkpoints import CommandCounter
+from bench_model_clients import percentiles
+from bench_tool_calls import SimulatedLatency
+
+
+def seed(crud, messages):
+    """Record sent messages, returns their Infobip IDs"""
+    from src.app.models.whatsapp import OutboundKind, OutboundMessage
+
+    crud.messages.delete_many({})
+    sent = [
+        (OutboundMessage(to=f"57310{index:07d}", kind=OutboundKind.TEXT, content="¡Hola! Tu visita quedó agendada."), uuid.uuid4().hex)
+        for index in range(messages)
+    ]
+    for offset in range(0, len(sent), 1000):
+        crud.add_records(sent[offset:offset + 1000])
+    return [message_id for _, message_id in sent]
+
+
+def webhooks(message_ids, batch, failed_rate):
+    """Delivery reports (some failed), then seen reports of the delivered messages, in webhooks of batch reports"""
+    from src.app.devtools.mock_infobip import report_payload
+
+    failed = set(random.sample(message_ids, int(len(message_ids) * failed_rate)))
+    delivered = [message_id for message_id in message_ids if message_id not in failed]
+    payloads = []
+    for ids, group in ((delivered, "DELIVERED"), (sorted(failed), "UNDELIVERABLE"), (delivered, "SEEN")):
+        for offset in range(0, len(ids), batch):
+            payloads.append(report_payload(ids[offset:offset + batch], group))
+    random.shuffle(payloads)
+    return payloads
+
+
+def per_report(crud, transitions):
+    """One update per report, the status set as it comes"""
+    for transition in transitions:
+        crud.messages.update_one(
+            {"_id": transition.message_id},
+            {"$set": {"status": int(transition.status), transition.status.timestamp_field: transition.at}},
+        )
+
+
+def run(crud, payloads, counter, apply):
+    from src.app.services.infobip_service import InfobipService
+
+    service = InfobipService()
+    timings = []
+    commands_before = counter.count
+    for payload in payloads:
+        start = time.perf_counter()
+        apply(crud, service.parse_delivery_reports(payload))
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "webhook_ms": percentiles(timings),
+        "commands_per_webhook": round((counter.count - commands_before) / len(payloads), 2),
+    }
+
+
+def undelivered_query(crud):
+    from src.app.models.whatsapp import DeliveryStatus
+
+    since = datetime.utcnow() - timedelta(hours=1)
+    start = time.perf_counter()
+    records = crud.get_undelivered(since, [DeliveryStatus.SENT, DeliveryStatus.FAILED], limit=1000)
+    elapsed = (time.perf_counter() - start) * 1000
+    plan = crud.messages.find({
+        "status": {"$in": [int(DeliveryStatus.SENT), int(DeliveryStatus.FAILED)]}, "sent_at": {"$gte": since},
+    }).explain()
+    stage = plan.get("queryPlanner", {}).get("winningPlan", {})
+    while "inputStage" in stage and "indexName" not in stage:
+        stage = stage["inputStage"]
+    return {"records": len(records), "query_ms": round(elapsed, 3), "index": stage.get("indexName", stage.get("stage"))}
+
+
+def bench(messages=5000, batch=100, failed_rate=0.05, rtt_ms=0):
+    from src.app.core.crud.outbound_crud import OutboundCRUD
+    from src.app.core.database import get_db
+    from src.app.utils.logger import logger
+
+    counter = CommandCounter()
+    monitoring.register(counter)
+    if rtt_ms:
+        monitoring.register(SimulatedLatency(rtt_ms))
+    logger.disabled = True
+    crud = OutboundCRUD(get_db())
+
+    results = {}
+    for mode, apply in (("per_report", per_report), ("bulk", lambda crud, transitions: crud.apply_transitions(transitions))):
+        message_ids = seed(crud, messages)
+        random.seed(7)
+        results[mode] = run(crud, webhooks(message_ids, batch, failed_rate), counter, apply)
+    results["undelivered"] = undelivered_query(crud)
+    results["speedup_p50"] = round(results["per_report"]["webhook_ms"]["p50_ms"] / results["bulk"]["webhook_ms"]["p50_ms"], 2)
+
+    print(json.dumps({"messages": messages, "batch": batch, "failed_rate": failed_rate, "rtt_ms": rtt_ms, **results}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Delivery report ingestion benchmark')
+    parser.add_argument('--messages', type=int, default=5000, help='Sent messages to report on')
+    parser.add_argument('--batch', type=int, default=100, help='Reports per webhook')
+    parser.add_argument('--failed-rate', type=float, default=0.05, help='Share of messages reported undeliverable')
+    parser.add_argument('--rtt-ms', type=float, default=0, help='Simulated MongoDB round trip per command')
+
+    args = parser.parse_args()
+    bench(args.messages, args.batch, args.failed_rate, args.rtt_ms)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Single-worker direct mode benchmark
+Runs every scenario through the webhook with the supervisor in front of the
+stage's worker and with the worker invoked directly (AGENT_DIRECT_SINGLE_WORKER),
+and compares per-stage turn latency, model calls and token usage.
+Calls the models for real: use OpenAI, or the local stand-in
+(src/app/devtools/mock_openai.py) with OPENAI_BASE_URL for a latency-only run.
+Needs MONGODB_URI pointing to a local MongoDB; DATABASE_NAME defaults to
+broky_replay and is dropped before every run.
+Usage: python scripts/bench_direct_workers.py -s scripts/scenarios/buyer_inquiry.json [-s ...] [-n RUNS]
+"""
+import os
+import sys
+import json
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_NAME", "broky_replay")
+os.environ.setdefault("INFOBIP_API_KEY", "harness-placeholder")
+os.environ.setdefault("INFOBIP_WHATSAPP_FROM", "573000000000")
+
+from agent_replay import load_scenario
+
+
+def run_mode(scenario, direct, runs):
+    """Run a scenario in one mode and return the per-run turn results"""
+    from src.app.config import settings
+    from src.app.devtools.cassette import Cassette
+    from src.app.devtools.harness import AgentHarness
+
+    settings.AGENT_DIRECT_SINGLE_WORKER = direct
+    results = []
+    # Record mode calls the real models, nothing is saved
+    with AgentHarness(Cassette(), mode="record") as harness:
+        for _ in range(runs):
+            results.append(harness.run(scenario))
+    return results
+
+
+def summarize(results):
+    """Per-turn medians and the totals of a scenario in one mode"""
+    turns = list(zip(*results))
+    per_turn = [{
+        "text": samples[0].text,
+        "turn_ms_p50": round(statistics.median(t.turn_ms for t in samples), 1),
+        "model_calls": round(statistics.median(t.model_calls for t in samples), 1),
+        "input_tokens": round(statistics.median(t.input_tokens for t in samples)),
+        "output_tokens": round(statistics.median(t.output_tokens for t in samples)),
+    } for samples in turns]
+    return {
+        "turn_ms_p50": round(statistics.median(t.turn_ms for run in results for t in run), 1),
+        "model_calls": sum(turn["model_calls"] for turn in per_turn),
+        "input_tokens": sum(turn["input_tokens"] for turn in per_turn),
+        "output_tokens": sum(turn["output_tokens"] for turn in per_turn),
+        "turns": per_turn,
+    }
+
+
+def bench(scenario_paths, runs=3):
+    """Compare supervisor and direct mode for every scenario"""
+    from src.app.config import settings
+
+    # Measure the agents only, without the answer cache or the fast path answering for them
+    settings.ANSWER_CACHE_ENABLED = False
+    settings.FAST_PATH_ENABLED = False
+
+    report = {}
+    for path in scenario_paths:
+        scenario = load_scenario(path)
+        supervisor = summarize(run_mode(scenario, direct=False, runs=runs))
+        direct = summarize(run_mode(scenario, direct=True, runs=runs))
+        report[os.path.splitext(os.path.basename(path))[0]] = {
+            "supervisor": supervisor,
+            "direct": direct,
+            "turn_ms_saved_p50": round(supervisor["turn_ms_p50"] - direct["turn_ms_p50"], 1),
+            "model_calls_saved": supervisor["model_calls"] - direct["model_calls"],
+            "tokens_saved": (supervisor["input_tokens"] + supervisor["output_tokens"])
+                            - (direct["input_tokens"] + direct["output_tokens"]),
+        }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Single-worker direct mode benchmark')
+    parser.add_argument('-s', '--scenario', action='append', required=True, help='Scenario JSON file (one per stage)')
+    parser.add_argument('-n', '--runs', type=int, default=3, help='Runs per scenario and mode')
+
+    args = parser.parse_args()
+    bench(args.scenario, args.runs)
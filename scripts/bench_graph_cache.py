@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Supervisor graph construction benchmark
+Compares the per-turn cost of building and compiling each agent's supervisor
+graph (what every turn paid before graphs were cached) with the cost of
+getting the cached graph.
+Usage: python scripts/bench_graph_cache.py [-n ITERATIONS]
+"""
+import os
+import sys
+import json
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Building the models does not call OpenAI, it only needs a key to be configured
+os.environ.setdefault("OPENAI_API_KEY", "bench-placeholder")
+
+from src.app.core.agent.main import Agent
+from src.app.core.agent.seller.register import RegisterAgent
+from src.app.core.agent.seller.publisher import PublisherAgent
+from src.app.core.agent.seller.visits import VisitsAgent
+from src.app.core.agent.seller.completed_deal import CompletedDealAgent
+from src.app.core.agent.buyer.scheduler import SchedulerAgent
+
+AGENTS = [RegisterAgent, PublisherAgent, VisitsAgent, CompletedDealAgent, SchedulerAgent]
+
+
+def timed(fn, iterations):
+    """Run fn the given number of times and return the timings in ms"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def bench(iterations=5):
+    """Benchmark uncached vs cached supervisor graphs for every agent"""
+    results = {}
+    Agent.clear_graph_cache()
+    for agent_class in AGENTS:
+        agent = agent_class()
+        uncached = timed(agent.build_supervisor, iterations)
+        agent.get_supervisor()
+        cached = timed(agent.get_supervisor, iterations * 100)
+        results[agent_class.__name__] = {
+            "uncached_ms_p50": round(statistics.median(uncached), 3),
+            "uncached_ms_max": round(max(uncached), 3),
+            "cached_ms_p50": round(statistics.median(cached), 6),
+            "saved_per_turn_ms": round(statistics.median(uncached) - statistics.median(cached), 3),
+        }
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Supervisor graph construction benchmark')
+    parser.add_argument('-n', '--iterations', type=int, default=5, help='Uncached builds per agent')
+
+    args = parser.parse_args()
+    bench(args.iterations)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Infobip HTTP session benchmark
+Sends text messages to the mock Infobip (src/app/devtools/mock_infobip.py),
+once the way the service used to (requests.post, a new connection and
+headers for every message) and once through the service's pooled keep-alive
+client. Reports the send latency of both and the connection reuse
+statistics of the pooled client.
+Usage: python scripts/bench_infobip_session.py [-n MESSAGES] [--port PORT]
+"""
+import os
+import sys
+import json
+import time
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("INFOBIP_API_KEY", "bench-placeholder")
+os.environ.setdefault("INFOBIP_WHATSAPP_FROM", "573000000000")
+
+from bench_model_clients import percentiles
+
+TO = "573100000001"
+TEXT = "¡Hola! Tu visita quedó agendada para el sábado a las 3 pm."
+
+
+def per_call_connection(service, messages):
+    """Sends as before: requests.post with the headers built for every message"""
+    import requests
+    from src.app.models.whatsapp import WhatsAppResponse
+
+    timings = []
+    for _ in range(messages):
+        start = time.perf_counter()
+        response = requests.post(
+            f"{service.base_url}/whatsapp/1/message/text",
+            headers=service._get_headers(),
+            json=service._text_payload(TO, TEXT),
+            timeout=30.0,
+        )
+        WhatsAppResponse(**response.json())
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def pooled(service, messages):
+    timings = []
+    for _ in range(messages):
+        start = time.perf_counter()
+        service.send_text_message(TO, TEXT)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def bench(messages=500, port=8104):
+    os.environ["INFOBIP_BASE_URL"] = f"http://127.0.0.1:{port}"
+    from src.app.devtools import mock_infobip
+    mock_infobip.start(port)
+
+    from src.app.services.infobip_service import InfobipService
+    from src.app.utils.logger import logger
+
+    # One log line per send would dominate the timings
+    logger.disabled = True
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    service = InfobipService()
+    results = {
+        "per_call_connection": percentiles(per_call_connection(service, messages)),
+        "pooled": percentiles(pooled(service, messages)),
+        "connections": InfobipService.connection_stats()["sync"],
+    }
+    results["speedup_p50"] = round(results["per_call_connection"]["p50_ms"] / results["pooled"]["p50_ms"], 2)
+    print(json.dumps({"messages": messages, **results}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Infobip HTTP session benchmark')
+    parser.add_argument('-n', '--messages', type=int, default=500, help='Messages sent per mode')
+    parser.add_argument('--port', type=int, default=8104, help='Port for the in-process stand-in')
+
+    args = parser.parse_args()
+    bench(args.messages, args.port)
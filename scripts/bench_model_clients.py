@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Chat model client benchmark
+Compares building a fresh chat model (and HTTP client) for every call, as
+every turn used to do, with the shared pooled models of the model registry.
+Runs against the local OpenAI stand-in (src/app/devtools/mock_openai.py),
+started in-process unless --base-url points to a running one.
+Usage: python scripts/bench_model_clients.py [-n CALLS] [--base-url URL]
+"""
+import os
+import sys
+import json
+import time
+import threading
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def start_stand_in(port):
+    """Start the OpenAI stand-in in a background thread"""
+    import uvicorn
+    from src.app.devtools.mock_openai import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+    }
+
+
+def bench(calls, base_url):
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "bench-placeholder")
+
+    from langchain.chat_models import init_chat_model
+    from src.app.core.llm import model_registry
+
+    messages = [("human", "¿Cuánto cuesta la propiedad?")]
+
+    fresh = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        init_chat_model("openai:gpt-4.1", temperature=0, base_url=base_url).invoke(messages)
+        fresh.append((time.perf_counter() - start) * 1000)
+
+    pooled = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        model_registry.get("gpt-4.1").invoke(messages)
+        pooled.append((time.perf_counter() - start) * 1000)
+
+    results = {"calls": calls, "fresh_client": percentiles(fresh), "pooled_client": percentiles(pooled)}
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Chat model client benchmark')
+    parser.add_argument('-n', '--calls', type=int, default=50, help='Calls per client strategy')
+    parser.add_argument('--base-url', help='Base URL of a running OpenAI stand-in')
+    parser.add_argument('--port', type=int, default=8100, help='Port for the in-process stand-in')
+
+    args = parser.parse_args()
+    base_url = args.base_url
+    if not base_url:
+        start_stand_in(args.port)
+        base_url = f"http://127.0.0.1:{args.port}/v1"
+    bench(args.calls, base_url)
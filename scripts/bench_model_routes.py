@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Model routing SLO benchmark
+Sends the model calls of a stage's worker through the routing table against
+the local OpenAI stand-in, with the stage's primary model slower than its
+fallback (--primary-ms, --fallback-ms). Runs the calls twice: with the
+stage's SLO removed, always on the primary model, and with the SLO set to
+--slo-ms, where the stage switches to the fallback model once the p95 of the
+primary breaches it. Reports the call latency, the calls per model and the
+per-route latency recorded for tuning.
+Usage: python scripts/bench_model_routes.py [-n CALLS] [--slo-ms MS] [--primary-ms MS] [--fallback-ms MS]
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_model_clients import percentiles, start_stand_in
+
+STAGE = "seller:registration"
+INTENT = "PropertyRegistrationAgent"
+
+
+def run(calls):
+    """Send the calls of the stage's worker, each under the profile its turn would use"""
+    from src.app.core.agent.seller.register import RegisterAgent
+    from src.app.core.llm import model_registry
+
+    agent = RegisterAgent()
+    messages = [("human", "Quiero vender mi apartamento en Chicó")]
+    timings, models = [], {}
+    for _ in range(calls):
+        with model_registry.use_profile(agent.model_profile({})):
+            model = agent.model(INTENT)
+        start = time.perf_counter()
+        model.invoke(messages)
+        timings.append((time.perf_counter() - start) * 1000)
+        models[model.model_name] = models.get(model.model_name, 0) + 1
+    return {**percentiles(timings), "calls_per_model": models}
+
+
+def bench(calls=200, slo_ms=250, primary_ms=400, fallback_ms=80, port=8102):
+    from src.app.config import settings
+    from src.app.core.model_routes import model_router
+
+    settings.MODEL_ROUTE_FALLBACK_ENABLED = True
+
+    route = model_router.route(STAGE, INTENT)
+    os.environ["MOCK_OPENAI_MODEL_LATENCY_MS"] = json.dumps({route.model: primary_ms, route.fallback: fallback_ms})
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench-placeholder")
+    start_stand_in(port)
+
+    from src.app.utils.metrics import metrics
+
+    results = {}
+    for mode, slo in (("primary_only", None), ("slo_fallback", slo_ms)):
+        model_router.load()
+        model_router.table.stages[STAGE].slo_p95_ms = slo
+        metrics.reset()
+        results[mode] = run(calls)
+        results[mode]["fallbacks"] = metrics.counter("llm.route_fallbacks", stage=STAGE)
+        results[mode]["routes"] = {
+            key: value for key, value in metrics.snapshot()["histograms"].items() if key.startswith("llm.route_latency_ms")
+        }
+
+    print(json.dumps({"stage": STAGE, "intent": INTENT, "slo_p95_ms": slo_ms, "modes": results}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Model routing SLO benchmark')
+    parser.add_argument('-n', '--calls', type=int, default=200, help='Model calls per mode')
+    parser.add_argument('--slo-ms', type=float, default=250, help='p95 SLO of the stage')
+    parser.add_argument('--primary-ms', type=float, default=400, help='Latency of the primary model in the stand-in')
+    parser.add_argument('--fallback-ms', type=float, default=80, help='Latency of the fallback model in the stand-in')
+    parser.add_argument('--port', type=int, default=8102, help='Port for the in-process stand-in')
+
+    args = parser.parse_args()
+    bench(args.calls, args.slo_ms, args.primary_ms, args.fallback_ms, args.port)
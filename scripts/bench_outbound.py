@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Outbound dispatcher benchmark
+Sends the replies of concurrent chats to the mock Infobip
+(src/app/devtools/mock_infobip.py), answering after --latency-ms and
+throttling a share of the requests with a 429 (--error-rate). Inline, as turns used to send,
+the turn waits for the send and a throttled reply is lost; queued, the turn
+only enqueues it and the dispatcher retries it within its rate limit.
+Reports the time a turn spends on its reply, the replies delivered and
+lost, and whether every chat got its replies in order.
+Dead letters are stored in MongoDB if MONGODB_URI points to one.
+Usage: python scripts/bench_outbound.py [--chats N] [--replies N] [--latency-ms MS] [--error-rate R] [--rate N] [--workers N]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("INFOBIP_API_KEY", "bench-placeholder")
+os.environ.setdefault("INFOBIP_WHATSAPP_FROM", "573000000000")
+
+from bench_model_clients import percentiles
+
+
+async def turns(chats, replies):
+    """Every chat sends its replies one after another, the chats concurrently; returns the time spent per reply"""
+    from src.app.core.agent.main import AgentResponse, MessageType
+    from src.app.services.outbound_dispatcher import outbound_dispatcher
+
+    timings, lost = [], 0
+
+    async def chat(index):
+        nonlocal lost
+        for reply in range(replies):
+            start = time.perf_counter()
+            try:
+                await outbound_dispatcher.asend_message(f"57310{index:07d}", AgentResponse(type=MessageType.TEXT, message=str(reply)))
+            except Exception:
+                lost += 1
+            timings.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(chat(index) for index in range(chats)))
+    return timings, lost
+
+
+def run(chats, replies):
+    from src.app.devtools import mock_infobip
+    from src.app.services.infobip_service import InfobipService
+    from src.app.services.outbound_dispatcher import outbound_dispatcher
+    from src.app.utils.metrics import metrics
+
+    mock_infobip.reset()
+    metrics.reset()
+    start = time.perf_counter()
+
+    async def main():
+        result = await turns(chats, replies)
+        await InfobipService.aclose()
+        return result
+
+    timings, lost = asyncio.run(main())
+    outbound_dispatcher.flush()
+    wall_ms = (time.perf_counter() - start) * 1000
+    received = {to: [message["content"] for message in messages] for to, messages in mock_infobip.outbox.items()}
+    return {
+        "reply_ms": percentiles(timings),
+        "delivered": sum(len(texts) for texts in received.values()),
+        "lost": lost + int(metrics.counter("outbound.dead_letters", kind="text")),
+        "retries": int(metrics.counter("outbound.retries", kind="text")),
+        "in_order": all(texts == sorted(texts, key=int) for texts in received.values()),
+        "delivered_in_ms": round(wall_ms, 1),
+    }
+
+
+def bench(chats=20, replies=10, latency_ms=150, error_rate=0.1, rate=50, workers=8, port=8105):
+    os.environ["INFOBIP_BASE_URL"] = f"http://127.0.0.1:{port}"
+    from src.app.devtools import mock_infobip
+    mock_infobip.start(port, latency_ms=latency_ms, error_rate=error_rate, error_status=429)
+
+    from src.app.config import settings
+    from src.app.services.outbound_dispatcher import outbound_dispatcher
+    from src.app.utils.logger import logger
+
+    logger.disabled = True
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    settings.OUTBOUND_RATE_PER_SECOND = rate
+    settings.OUTBOUND_BURST = rate
+    settings.OUTBOUND_WORKERS = workers
+    settings.OUTBOUND_BACKOFF_BASE = 0.2
+    # Only the sends are measured, no delivery records
+    settings.OUTBOUND_TRACKING_ENABLED = False
+
+    results = {}
+    for mode in ("inline", "queued"):
+        settings.OUTBOUND_QUEUE_ENABLED = mode == "queued"
+        results[mode] = run(chats, replies)
+    outbound_dispatcher.shutdown()
+
+    print(json.dumps({
+        "chats": chats, "replies_per_chat": replies, "latency_ms": latency_ms,
+        "error_rate": error_rate, "rate_per_second": rate, "workers": workers, "modes": results,
+    }, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Outbound dispatcher benchmark')
+    parser.add_argument('--chats', type=int, default=20, help='Concurrent chats')
+    parser.add_argument('--replies', type=int, default=10, help='Replies per chat')
+    parser.add_argument('--latency-ms', type=float, default=150, help='Latency of the stand-in per request')
+    parser.add_argument('--error-rate', type=float, default=0.1, help='Share of requests throttled with a 429')
+    parser.add_argument('--rate', type=float, default=50, help='Dispatcher rate limit, messages per second')
+    parser.add_argument('--workers', type=int, default=8, help='Dispatcher worker threads')
+    parser.add_argument('--port', type=int, default=8105, help='Port for the in-process mock Infobip')
+
+    args = parser.parse_args()
+    bench(args.chats, args.replies, args.latency_ms, args.error_rate, args.rate, args.workers, args.port)
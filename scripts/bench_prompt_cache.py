@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Prompt cache benchmark
+Runs buyer conversations through the BookingAgent worker against the local
+OpenAI stand-in with its prompt cache simulation on, with the worker prompt
+laid out as before (the date inside the system prompt, ahead of the
+conversation) and with the stable layout (static system prompt, the
+conversation, the date last). The conversations cross a day change halfway.
+Reports the prompt tokens, the cached ones and the estimated cost of each
+layout. The stand-in answers without tool calls, so no MongoDB is needed.
+Usage: python scripts/bench_prompt_cache.py [--chats N] [--turns N]
+"""
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_model_clients import start_stand_in
+
+DATES = ("2026-03-13", "2026-03-14")
+
+
+def legacy_worker(agent):
+    """The BookingAgent as it was built before: the date formatted into the system prompt"""
+    from langchain_core.messages import SystemMessage
+    from langgraph.prebuilt import create_react_agent
+    from src.app.config import settings
+    from src.app.core.agent.main import AgentState
+    from src.app.core.agent.tool_executor import ConcurrentToolNode
+
+    with open(os.path.join(settings.PROMPTS_DIR, "booking_agent.v1.txt"), encoding="utf-8") as f:
+        template = f.read()
+    stable = agent.get_workers()[0]
+
+    def booking_prompt(state):
+        return [SystemMessage(content=template.format(current_date=state["current_date"]))] + state["messages"]
+
+    return create_react_agent(
+        model=agent.model("BookingAgent"),
+        tools=ConcurrentToolNode(list(stable.nodes["tools"].bound.tools_by_name.values())),
+        prompt=booking_prompt,
+        name="BookingAgent",
+        state_schema=AgentState,
+        version="v1",
+    )
+
+
+def run(worker, chats, turns):
+    """Send every turn of every chat, the chats interleaved as live traffic"""
+    from langchain_core.messages import AIMessage, HumanMessage
+    from src.app.core.usage import start_turn
+    from src.app.models.usage import ModelUsage
+    from src.app.devtools import mock_openai
+
+    mock_openai._cached_prefixes.clear()
+    histories = {chat: [] for chat in range(chats)}
+    total = ModelUsage()
+    for turn in range(turns):
+        current_date = DATES[turn * len(DATES) // turns]
+        for chat, history in histories.items():
+            history.append(HumanMessage(content=f"Chat {chat}: ¿puedo visitar el apartamento el sábado a las {9 + turn % 8}?"))
+            tracker = start_turn()
+            result = worker.invoke({"messages": history, "chat_id": f"bench-{chat}", "current_date": current_date})
+            history.append(AIMessage(content=result["messages"][-1].content))
+            total.add(tracker.usage)
+    return {
+        "calls": total.calls,
+        "input_tokens": total.input_tokens,
+        "cached_input_tokens": total.cached_input_tokens,
+        "cached_ratio": round(total.cached_input_tokens / total.input_tokens, 3) if total.input_tokens else 0,
+        "cost_usd": round(total.cost_usd, 4),
+    }
+
+
+def bench(chats=5, turns=20, port=8103):
+    os.environ["MOCK_OPENAI_PROMPT_CACHE"] = "true"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench-placeholder")
+    start_stand_in(port)
+
+    from src.app.core.agent.buyer.scheduler import SchedulerAgent
+
+    agent = SchedulerAgent()
+    results = {
+        "date_in_system_prompt": run(legacy_worker(agent), chats, turns),
+        "stable_prefix": run(agent.get_workers()[0], chats, turns),
+    }
+    print(json.dumps({"chats": chats, "turns": turns, "dates": DATES, "layouts": results}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Prompt cache benchmark')
+    parser.add_argument('--chats', type=int, default=5, help='Concurrent buyer conversations')
+    parser.add_argument('--turns', type=int, default=20, help='Turns per conversation')
+    parser.add_argument('--port', type=int, default=8103, help='Port for the in-process stand-in')
+
+    args = parser.parse_args()
+    bench(args.chats, args.turns, args.port)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Stage transition warm-up benchmark
+Moves the seller's property and the buyer's chat of the buyer_inquiry
+scenario through their stages and measures what the first turn in each new
+stage does before the model call: getting the stage's agent and its
+compiled graphs, and loading the user and the property into the turn
+context. Cold runs clear the graph cache and have STAGE_WARMUP_ENABLED off;
+warm runs let the transition event prepare the turn (waiting for it, as
+when the user's next message comes a moment later).
+Needs MONGODB_URI pointing to a MongoDB; DATABASE_NAME defaults to
+broky_replay and is dropped before the run.
+Usage: python scripts/bench_stage_warmup.py [-n ITERATIONS] [--rtt-ms MS]
+"""
+import os
+import sys
+import json
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_NAME", "broky_replay")
+os.environ.setdefault("OPENAI_API_KEY", "bench-placeholder")
+
+from pymongo import monitoring
+
+from bench_checkpoints import CommandCounter
+from bench_tool_calls import SimulatedLatency, seed
+
+
+def first_turn(role, chat_id):
+    """What the first turn of the new stage does before calling the model"""
+    from src.app.core.agents_factory import AgentsFactory
+    from src.app.core.agent.turn_context import TurnContext, warm_entities
+    from src.app.core.crud.chat_crud import ChatCRUD
+    from src.app.core.database import get_db
+
+    # The webhook has already loaded the chat
+    chat = ChatCRUD(get_db()).get_chat_by_id(chat_id)
+    agent = AgentsFactory.get_agent(role, {"chat_id": chat_id})
+    if agent.uses_direct_mode():
+        agent.get_workers()
+    else:
+        agent.get_supervisor()
+    turn = TurnContext(chat_id=chat_id).prime(chat=chat, entries=warm_entities.pop(chat_id))
+    turn.user
+    turn.owned_property if role == "seller" else turn.linked_property
+    return turn.stats()["reads"]
+
+
+def bench(iterations=5, rtt_ms=0):
+    """Benchmark the first turn after each stage transition, cold and warmed"""
+    counter = CommandCounter()
+    monitoring.register(counter)
+    if rtt_ms:
+        monitoring.register(SimulatedLatency(rtt_ms))
+
+    from src.app.config import settings
+    from src.app.core.agent.main import Agent
+    from src.app.core.crud.chat_crud import ChatCRUD
+    from src.app.core.database import get_db
+    from src.app.core.stage_events import stage_events
+    from src.app.models.business_stage import BuyerStage, SellerStage
+    from src.app.services.stage_service import StageService
+
+    chats = seed()
+    # update_seller_stage reaches the property through the seller's chat
+    ChatCRUD(get_db()).update_chat(chats["seller"], {"property_id": str(get_db().properties.find_one()["_id"])})
+    transitions = [("seller", stage) for stage in SellerStage] + [("buyer", stage) for stage in BuyerStage]
+
+    results = {}
+    for mode in ("cold", "warm"):
+        settings.STAGE_WARMUP_ENABLED = mode == "warm"
+        timings, commands, reads = [], [], []
+        for _ in range(iterations):
+            for role, stage in transitions:
+                Agent.clear_graph_cache()
+                if role == "seller":
+                    changed = StageService().update_seller_stage(chats[role], stage)
+                else:
+                    changed = StageService().update_buyer_stage(chats[role], stage)
+                stage_events.wait()
+                if not changed:
+                    # Already in that stage, no transition
+                    continue
+
+                before = counter.count
+                start = time.perf_counter()
+                reads.append(first_turn(role, chats[role]))
+                timings.append((time.perf_counter() - start) * 1000)
+                commands.append(counter.count - before)
+        results[mode] = {
+            "ms_p50": round(statistics.median(timings), 2),
+            "ms_max": round(max(timings), 2),
+            "db_commands": statistics.median(commands),
+            "entity_reads": statistics.median(reads),
+        }
+    results["speedup"] = round(results["cold"]["ms_p50"] / results["warm"]["ms_p50"], 2)
+
+    print(json.dumps({"iterations": iterations, "rtt_ms": rtt_ms, "transitions": len(transitions), "first_turn": results}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Stage transition warm-up benchmark')
+    parser.add_argument('-n', '--iterations', type=int, default=5, help='Rounds through every stage per mode')
+    parser.add_argument('--rtt-ms', type=float, default=0, help='Simulated MongoDB round trip per command')
+
+    args = parser.parse_args()
+    bench(args.iterations, args.rtt_ms)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Template batching benchmark
+Sends a reminder template to --recipients recipients through the outbound
+dispatcher, against the mock Infobip (src/app/devtools/mock_infobip.py)
+answering after --latency-ms per request and rejecting a share of the
+messages of every request (--reject-rate). Once with one request per
+recipient (INFOBIP_TEMPLATE_BATCH_SIZE=1, as templates used to go out) and
+once batched. Reports the requests made, the time to deliver the fan-out,
+the messages delivered and retried, and the batch sizes.
+Dead letters are stored in MongoDB if MONGODB_URI points to one.
+Usage: python scripts/bench_template_batch.py [--recipients N] [--batch-size N] [--latency-ms MS] [--reject-rate R] [--rate N] [--workers N]
+"""
+import os
+import sys
+import json
+import time
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("INFOBIP_API_KEY", "bench-placeholder")
+os.environ.setdefault("INFOBIP_WHATSAPP_FROM", "573000000000")
+
+TEMPLATE = "visit_reminder"
+
+
+def run(recipients):
+    from src.app.devtools import mock_infobip
+    from src.app.services.outbound_dispatcher import outbound_dispatcher
+    from src.app.utils.metrics import metrics
+
+    mock_infobip.reset()
+    metrics.reset()
+    start = time.perf_counter()
+    outbound_dispatcher.send_template_messages(TEMPLATE, {
+        f"57310{index:07d}": {"body": {"placeholders": ["sábado", "3 pm"]}} for index in range(recipients)
+    })
+    outbound_dispatcher.flush()
+    wall_ms = (time.perf_counter() - start) * 1000
+    batch_sizes = metrics.values("outbound.batch_size")
+    return {
+        "requests": mock_infobip.stats["requests"],
+        "delivered": len(mock_infobip.outbox),
+        "retries": int(metrics.counter("outbound.retries", kind="template")),
+        "dead_letters": int(metrics.counter("outbound.dead_letters", kind="template")),
+        "batches": len(batch_sizes),
+        "mean_batch_size": round(sum(batch_sizes) / len(batch_sizes), 1) if batch_sizes else 1,
+        "delivered_in_ms": round(wall_ms, 1),
+    }
+
+
+def bench(recipients=500, batch_size=100, latency_ms=150, reject_rate=0.05, rate=200, workers=4, port=8106):
+    os.environ["INFOBIP_BASE_URL"] = f"http://127.0.0.1:{port}"
+    from src.app.devtools import mock_infobip
+    mock_infobip.start(port, latency_ms=latency_ms, reject_rate=reject_rate)
+
+    from src.app.config import settings
+    from src.app.services.outbound_dispatcher import outbound_dispatcher
+    from src.app.utils.logger import logger
+
+    logger.disabled = True
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    settings.OUTBOUND_QUEUE_ENABLED = True
+    settings.OUTBOUND_RATE_PER_SECOND = rate
+    settings.OUTBOUND_BURST = rate
+    settings.OUTBOUND_WORKERS = workers
+    settings.OUTBOUND_BACKOFF_BASE = 0.2
+    # Only the sends are measured, no delivery records
+    settings.OUTBOUND_TRACKING_ENABLED = False
+
+    results = {}
+    for mode, size in (("per_recipient", 1), ("batched", batch_size)):
+        settings.INFOBIP_TEMPLATE_BATCH_SIZE = size
+        results[mode] = run(recipients)
+    outbound_dispatcher.shutdown()
+
+    print(json.dumps({
+        "recipients": recipients, "batch_size": batch_size, "latency_ms": latency_ms,
+        "reject_rate": reject_rate, "rate_per_second": rate, "workers": workers, "modes": results,
+    }, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Template batching benchmark')
+    parser.add_argument('--recipients', type=int, default=500, help='Recipients of the template')
+    parser.add_argument('--batch-size', type=int, default=100, help='Template messages per request when batched')
+    parser.add_argument('--latency-ms', type=float, default=150, help='Latency of the stand-in per request')
+    parser.add_argument('--reject-rate', type=float, default=0.05, help='Share of messages the stand-in rejects')
+    parser.add_argument('--rate', type=float, default=200, help='Dispatcher rate limit, messages per second')
+    parser.add_argument('--workers', type=int, default=4, help='Dispatcher worker threads')
+    parser.add_argument('--port', type=int, default=8106, help='Port for the in-process mock Infobip')
+
+    args = parser.parse_args()
+    bench(args.recipients, args.batch_size, args.latency_ms, args.reject_rate, args.rate, args.workers, args.port)
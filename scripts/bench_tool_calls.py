@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Multi-tool step benchmark
+Runs the tool calls of steps where the model asks for several tools at once
+(e.g. get_remaining_buyer_info with get_seller_availability) one after
+another, as before, and through the ConcurrentToolNode the workers use, and
+compares the step latency. MongoDB round trips dominate these steps; use
+--rtt-ms to add a simulated network round trip to every command when
+running against a local MongoDB.
+Needs MONGODB_URI pointing to a MongoDB; DATABASE_NAME defaults to
+broky_replay and is dropped before the run.
+Usage: python scripts/bench_tool_calls.py [-n ITERATIONS] [--rtt-ms MS]
+"""
+import os
+import sys
+import json
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_NAME", "broky_replay")
+
+from pymongo import monitoring
+
+from agent_replay import load_scenario
+
+SCENARIO = os.path.join(os.path.dirname(__file__), "scenarios", "buyer_inquiry.json")
+SELLER_PHONE = "573000000001"
+BUYER_PHONE = "573000000002"
+
+
+class SimulatedLatency(monitoring.CommandListener):
+    """Adds a fixed delay to every MongoDB command, listeners run inline in the calling thread"""
+
+    def __init__(self, rtt_ms):
+        self.rtt = rtt_ms / 1000
+
+    def started(self, event):
+        time.sleep(self.rtt)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def seed():
+    """Seed the seller and the property, and a buyer chat linked to the property"""
+    from src.app.core.database import DATABASE_NAME, get_db
+    from src.app.core.crud.chat_crud import ChatCRUD
+    from src.app.core.crud.user_crud import UserCRUD
+
+    db = get_db()
+    db.client.drop_database(DATABASE_NAME)
+    for collection, documents in load_scenario(SCENARIO)["seed"].items():
+        db[collection].insert_many([dict(document) for document in documents])
+    property_id = str(db.properties.find_one()["_id"])
+
+    chats = {}
+    for role, phone in (("seller", SELLER_PHONE), ("buyer", BUYER_PHONE)):
+        user = UserCRUD(db).get_or_create_user(phone)
+        chat = ChatCRUD(db).get_or_create_chat(phone)
+        ChatCRUD(db).update_chat_user_id(chat.id, user.id)
+        if role == "buyer":
+            ChatCRUD(db).update_chat(chat.id, {"property_id": property_id})
+        chats[role] = chat.id
+    return chats
+
+
+def step(chat_id, calls):
+    """Graph state with an AI message asking for several tools at once"""
+    from langchain_core.messages import AIMessage
+    from src.app.core.agent.turn_context import TurnContext
+
+    message = AIMessage(content="", tool_calls=[
+        {"name": tool.name, "args": args, "id": f"call-{index}"} for index, (tool, args) in enumerate(calls)
+    ])
+    # A new turn context every time, so each run does its own reads
+    return {"messages": [message], "chat_id": chat_id, "turn": TurnContext(chat_id=chat_id)}
+
+
+def timed(node, chat_id, calls, iterations, config=None):
+    timings = []
+    for _ in range(iterations):
+        state = step(chat_id, calls)
+        start = time.perf_counter()
+        result = node.invoke(state, {"configurable": {}, **(config or {})})
+        timings.append((time.perf_counter() - start) * 1000)
+    names = [message.name for message in result["messages"]]
+    assert names == [tool.name for tool, _ in calls], f"Results out of order: {names}"
+    return timings
+
+
+def bench(iterations=20, rtt_ms=0):
+    """Benchmark sequential vs concurrent execution of multi-tool steps"""
+    if rtt_ms:
+        monitoring.register(SimulatedLatency(rtt_ms))
+
+    from langgraph.prebuilt import ToolNode
+    from src.app.core.agent.tool_executor import ConcurrentToolNode
+    from src.app.core.tools.register import get_user_info, get_remaining_info
+    from src.app.core.tools.general import get_business_stage
+    from src.app.core.tools.buyer.scheduler import get_remaining_buyer_info, get_seller_availability
+
+    chats = seed()
+    steps = {
+        "buyer: get_remaining_buyer_info + get_seller_availability": (
+            chats["buyer"], [(get_remaining_buyer_info, {}), (get_seller_availability, {})]),
+        "seller: get_user_info + get_remaining_info": (
+            chats["seller"], [(get_user_info, {}), (get_remaining_info, {})]),
+        "seller: get_user_info + get_remaining_info + get_business_stage": (
+            chats["seller"], [(get_user_info, {}), (get_remaining_info, {}), (get_business_stage, {"user_type": "seller"})]),
+    }
+
+    results = {}
+    for name, (chat_id, calls) in steps.items():
+        tools = [tool for tool, _ in calls]
+        sequential = timed(ToolNode(tools), chat_id, calls, iterations, {"max_concurrency": 1})
+        concurrent = timed(ConcurrentToolNode(tools), chat_id, calls, iterations)
+        results[name] = {
+            "sequential_ms_p50": round(statistics.median(sequential), 3),
+            "concurrent_ms_p50": round(statistics.median(concurrent), 3),
+            "speedup": round(statistics.median(sequential) / statistics.median(concurrent), 2),
+        }
+    print(json.dumps({"iterations": iterations, "rtt_ms": rtt_ms, "steps": results}, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Multi-tool step benchmark')
+    parser.add_argument('-n', '--iterations', type=int, default=20, help='Runs per step and mode')
+    parser.add_argument('--rtt-ms', type=float, default=0, help='Simulated MongoDB round trip per command')
+
+    args = parser.parse_args()
+    bench(args.iterations, args.rtt_ms)
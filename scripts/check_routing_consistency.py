@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Routing context consistency checker
+Compares the denormalised routing context stored on every chat with the
+users, chats and properties collections it is derived from.
+Usage: python scripts/check_routing_consistency.py [--fix] [--limit N]
+"""
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.app.services.stage_service import StageService
+
+
+def check(fix=False, limit=0):
+    """Check every chat and optionally rebuild the inconsistent ones"""
+    stage_service = StageService()
+    cursor = stage_service.db.chats.find({}, {"_id": 1})
+    if limit:
+        cursor = cursor.limit(limit)
+
+    checked = 0
+    inconsistent = []
+    for chat_doc in cursor:
+        chat_id = str(chat_doc["_id"])
+        result = stage_service.check_routing_consistency(chat_id)
+        checked += 1
+        if result["consistent"]:
+            continue
+
+        inconsistent.append(result)
+        if fix:
+            stage_service.rebuild_routing_context(chat_id)
+
+    print(json.dumps({
+        "checked": checked,
+        "inconsistent": len(inconsistent),
+        "fixed": len(inconsistent) if fix else 0,
+        "details": inconsistent,
+    }, indent=2, default=str))
+    return inconsistent
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Routing context consistency checker')
+    parser.add_argument('--fix', action='store_true', help='Rebuild inconsistent routing contexts')
+    parser.add_argument('-l', '--limit', type=int, default=0, help='Limit the number of chats checked')
+
+    args = parser.parse_args()
+    inconsistent = check(args.fix, args.limit)
+    sys.exit(1 if inconsistent and not args.fix else 0)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Webhook load generator
+Posts inbound WhatsApp messages (text, image and audio, in the --mix
+shares) from --senders users to the webhook at --rate messages per second
+for --duration seconds, as Infobip would. Arrivals are open-loop: a slow
+webhook does not slow the load down, so the results show the throughput
+the server holds and the latency at that rate.
+Meant to run against the app pointed at the local stand-ins, e.g.:
+    MOCK_INFOBIP_LATENCY_MS=100 uvicorn src.app.devtools.mock_infobip:app --port 8101
+    MOCK_OPENAI_LATENCY_MS=500 uvicorn src.app.devtools.mock_openai:app --port 8100
+    INFOBIP_BASE_URL=http://localhost:8101 OPENAI_BASE_URL=http://localhost:8100/v1 uvicorn src.app.main:app --port 8000
+Reports the webhook latency, the status codes and the messages the mock
+Infobip accepted (replies delivered), read after the outbound queue drains.
+Usage: python scripts/load_webhook.py [--rate N] [--duration S] [--senders N] [--mix text=0.8,image=0.1,audio=0.1] [--url URL] [--infobip-url URL]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+from collections import Counter
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_model_clients import percentiles
+from src.app.devtools.mock_infobip import inbound_payload
+
+
+def parse_mix(mix):
+    """'text=0.8,audio=0.2' -> {'text': 0.8, 'audio': 0.2}"""
+    shares = {}
+    for part in mix.split(","):
+        kind, _, share = part.partition("=")
+        shares[kind.strip()] = float(share or 1)
+    return shares
+
+
+async def infobip_stats(client, infobip_url):
+    response = await client.get(f"{infobip_url}/stats")
+    return response.json()
+
+
+async def drain(client, infobip_url, timeout):
+    """Wait until the mock Infobip stops receiving messages (the outbound queue drained)"""
+    deadline = time.monotonic() + timeout
+    last = None
+    while time.monotonic() < deadline:
+        current = (await infobip_stats(client, infobip_url))["messages"]
+        if current == last:
+            return
+        last = current
+        await asyncio.sleep(1)
+
+
+async def load(rate, duration, senders, mix, url, infobip_url, drain_timeout):
+    kinds, weights = zip(*parse_mix(mix).items())
+    numbers = [f"57320{index:07d}" for index in range(senders)]
+    timings, statuses, kinds_sent = [], Counter(), Counter()
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(300.0), limits=httpx.Limits(max_connections=None)) as client:
+        before = await infobip_stats(client, infobip_url)
+
+        async def post(payload):
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=payload)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            timings.append((time.perf_counter() - start) * 1000)
+
+        tasks = []
+        start = time.perf_counter()
+        for index in range(int(rate * duration)):
+            # Open-loop: each arrival is scheduled on the clock, not after the previous response
+            delay = start + index / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = random.choices(kinds, weights)[0]
+            kinds_sent[kind] += 1
+            tasks.append(asyncio.create_task(post(inbound_payload(random.choice(numbers), kind, media_base_url=infobip_url))))
+        sent_in = time.perf_counter() - start
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        await drain(client, infobip_url, drain_timeout)
+        after = await infobip_stats(client, infobip_url)
+
+    return {
+        "sent": len(tasks),
+        "kinds": dict(kinds_sent),
+        "offered_rate": round(len(tasks) / sent_in, 1) if sent_in else None,
+        "completed_rate": round(len(tasks) / elapsed, 1),
+        "statuses": dict(statuses),
+        "webhook_ms": percentiles(timings) if timings else None,
+        "infobip": {key: after[key] - before[key] for key in ("messages", "errors", "reads", "media")},
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Webhook load generator')
+    parser.add_argument('--rate', type=float, default=10, help='Inbound messages per second')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load')
+    parser.add_argument('--senders', type=int, default=50, help='Distinct users sending messages')
+    parser.add_argument('--mix', default='text=0.8,image=0.1,audio=0.1', help='Share of each message kind')
+    parser.add_argument('--url', default='http://localhost:8000/webhook', help='Webhook under test')
+    parser.add_argument('--infobip-url', default='http://localhost:8101', help='Mock Infobip serving the media and counting the replies')
+    parser.add_argument('--drain', type=float, default=60, help='Seconds to wait for the outbound queue to drain')
+
+    args = parser.parse_args()
+    results = asyncio.run(load(args.rate, args.duration, args.senders, args.mix, args.url, args.infobip_url, args.drain))
+    print(json.dumps({"rate": args.rate, "duration": args.duration, "senders": args.senders, **results}, indent=2))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+AI model usage report
+Aggregates the usage stored on the agent replies (calls, tokens, latency and
+estimated cost) per business stage, with the share of prompt tokens served
+from the provider's prompt cache, and lists the chats that spent the most.
+Usage: python scripts/usage_report.py [--days DAYS] [--top N]
+"""
+import os
+import sys
+import json
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.app.core.database import get_db
+from src.app.core.crud.message_crud import MessageCRUD
+
+
+def report(days=None, top=10):
+    """Print the usage per stage and the most expensive chats"""
+    db = get_db()
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    stages = MessageCRUD(db).get_usage_by_stage(since)
+    for row in stages:
+        row["cost_usd"] = round(row["cost_usd"], 4)
+        row["latency_ms"] = round(row["latency_ms"] or 0, 1)
+        row["cached_ratio"] = round(row["cached_input_tokens"] / row["input_tokens"], 3) if row["input_tokens"] else 0
+
+    chats = [
+        {
+            "chat_id": str(chat["_id"]),
+            "user_phone": chat.get("user_phone"),
+            "turns": chat["usage"].get("turns", 0),
+            "cost_usd": round(chat["usage"].get("cost_usd", 0), 4),
+        }
+        for chat in db.chats.find({"usage": {"$exists": True}}, {"user_phone": 1, "usage": 1})
+        .sort("usage.cost_usd", -1)
+        .limit(top)
+    ]
+    print(json.dumps({"since": since.isoformat() if since else None, "stages": stages, "top_chats": chats}, indent=2))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='AI model usage report')
+    parser.add_argument('--days', type=int, help='Only count the last days')
+    parser.add_argument('--top', type=int, default=10, help='Most expensive chats to list')
+
+    args = parser.parse_args()
+    report(args.days, args.top)
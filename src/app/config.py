@@ -9,10 +9,112 @@ class Settings:
     INFOBIP_API_KEY: str = os.getenv("INFOBIP_API_KEY", "")
     INFOBIP_BASE_URL: str = os.getenv("INFOBIP_BASE_URL", "https://api.infobip.com")
     INFOBIP_WHATSAPP_FROM: str = os.getenv("INFOBIP_WHATSAPP_FROM", "")
+    # Pooled keep-alive HTTP client for Infobip, connection failures are retried INFOBIP_CONNECT_RETRIES times
+    INFOBIP_TIMEOUT: float = float(os.getenv("INFOBIP_TIMEOUT", "30"))
+    INFOBIP_CONNECT_TIMEOUT: float = float(os.getenv("INFOBIP_CONNECT_TIMEOUT", "5"))
+    INFOBIP_CONNECT_RETRIES: int = int(os.getenv("INFOBIP_CONNECT_RETRIES", "2"))
+    INFOBIP_MAX_CONNECTIONS: int = int(os.getenv("INFOBIP_MAX_CONNECTIONS", "50"))
+    INFOBIP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("INFOBIP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    INFOBIP_KEEPALIVE_EXPIRY: float = float(os.getenv("INFOBIP_KEEPALIVE_EXPIRY", "60"))
+    # Template messages packed into one request to the template endpoint
+    INFOBIP_TEMPLATE_BATCH_SIZE: int = int(os.getenv("INFOBIP_TEMPLATE_BATCH_SIZE", "100"))
+    # Outbound queue: the turn ends once its reply is queued, OUTBOUND_WORKERS threads send the messages
+    # at up to OUTBOUND_RATE_PER_SECOND (the sender's Infobip throughput), in order per recipient, retrying
+    # 429s, 5xx and connection failures with jittered exponential backoff before dead-lettering them
+    OUTBOUND_QUEUE_ENABLED: bool = os.getenv("OUTBOUND_QUEUE_ENABLED", "true").lower() == "true"
+    OUTBOUND_WORKERS: int = int(os.getenv("OUTBOUND_WORKERS", "4"))
+    OUTBOUND_RATE_PER_SECOND: float = float(os.getenv("OUTBOUND_RATE_PER_SECOND", "20"))
+    OUTBOUND_BURST: int = int(os.getenv("OUTBOUND_BURST", "20"))
+    OUTBOUND_MAX_ATTEMPTS: int = int(os.getenv("OUTBOUND_MAX_ATTEMPTS", "5"))
+    OUTBOUND_BACKOFF_BASE: float = float(os.getenv("OUTBOUND_BACKOFF_BASE", "0.5"))
+    OUTBOUND_BACKOFF_MAX: float = float(os.getenv("OUTBOUND_BACKOFF_MAX", "30"))
+    OUTBOUND_SHUTDOWN_TIMEOUT: float = float(os.getenv("OUTBOUND_SHUTDOWN_TIMEOUT", "10"))
+    # Messages of a turn carry an idempotency key (chat, turn, content): a key already sent within
+    # OUTBOUND_IDEMPOTENCY_TTL_HOURS is skipped, one claimed but not sent within OUTBOUND_IDEMPOTENCY_CLAIM_SECONDS
+    # (the process died before sending it) can be claimed again
+    OUTBOUND_IDEMPOTENCY_ENABLED: bool = os.getenv("OUTBOUND_IDEMPOTENCY_ENABLED", "true").lower() == "true"
+    OUTBOUND_IDEMPOTENCY_TTL_HOURS: int = int(os.getenv("OUTBOUND_IDEMPOTENCY_TTL_HOURS", "24"))
+    OUTBOUND_IDEMPOTENCY_CLAIM_SECONDS: int = int(os.getenv("OUTBOUND_IDEMPOTENCY_CLAIM_SECONDS", "300"))
+    # Sent messages are recorded in outbound_messages (for OUTBOUND_RECORD_TTL_DAYS) and their delivery and
+    # seen reports applied to them. Every OUTBOUND_RESEND_INTERVAL seconds (0 disables it), the messages that
+    # failed to deliver in the last OUTBOUND_RESEND_WINDOW_MINUTES are sent again, up to OUTBOUND_MAX_RESENDS times
+    OUTBOUND_TRACKING_ENABLED: bool = os.getenv("OUTBOUND_TRACKING_ENABLED", "true").lower() == "true"
+    OUTBOUND_RECORD_TTL_DAYS: int = int(os.getenv("OUTBOUND_RECORD_TTL_DAYS", "30"))
+    OUTBOUND_RESEND_INTERVAL: int = int(os.getenv("OUTBOUND_RESEND_INTERVAL", "300"))
+    OUTBOUND_RESEND_WINDOW_MINUTES: int = int(os.getenv("OUTBOUND_RESEND_WINDOW_MINUTES", "60"))
+    OUTBOUND_MAX_RESENDS: int = int(os.getenv("OUTBOUND_MAX_RESENDS", "1"))
+    # Text sent right away while the agent works on a reply (empty to only mark the message as read)
+    PROCESSING_MESSAGE: str = os.getenv("PROCESSING_MESSAGE", "")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", "60"))
+    OPENAI_CONNECT_TIMEOUT: float = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "50"))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    OPENAI_KEEPALIVE_EXPIRY: float = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
     
     AWS_ACCESS_KEY: str = os.getenv("AWS_ACCESS_KEY", "")
     AWS_SECRET_KEY: str = os.getenv("AWS_SECRET_KEY", "")
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
 
+    # Stream the agent run and send the reply as soon as the responding worker finishes (off by default:
+    # the reply is the worker's, the supervisor's hand-back no longer gets to reword it)
+    AGENT_STREAMING: bool = os.getenv("AGENT_STREAMING", "false").lower() == "true"
+    # Run the worker without the supervisor when a stage has a single worker (off by default: the reply
+    # is the worker's, without the supervisor's prompt)
+    AGENT_DIRECT_SINGLE_WORKER: bool = os.getenv("AGENT_DIRECT_SINGLE_WORKER", "false").lower() == "true"
+
+    # Resume every turn from the chat's last graph checkpoint in MongoDB instead of rebuilding the messages
+    AGENT_CHECKPOINTS: bool = os.getenv("AGENT_CHECKPOINTS", "true").lower() == "true"
+    CHECKPOINT_KEEP: int = int(os.getenv("CHECKPOINT_KEEP", "1"))
+    CHECKPOINT_MAX_MESSAGES: int = int(os.getenv("CHECKPOINT_MAX_MESSAGES", "60"))
+    CHECKPOINT_TTL_DAYS: int = int(os.getenv("CHECKPOINT_TTL_DAYS", "30"))
+
+    # Pre-build the next stage's agent and load the chat's entities when a chat changes stage
+    STAGE_WARMUP_ENABLED: bool = os.getenv("STAGE_WARMUP_ENABLED", "true").lower() == "true"
+    STAGE_WARM_TTL: float = float(os.getenv("STAGE_WARM_TTL", "600"))
+
+    # Worker threads for the blocking steps of the async webhook (sync database calls, sync tools, transcriptions)
+    BLOCKING_IO_THREADS: int = int(os.getenv("BLOCKING_IO_THREADS", "64"))
+
+    # Read-only tool calls of a step run concurrently, up to this many at a time
+    TOOL_MAX_CONCURRENCY: int = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+
+    # Per-property answer cache for buyer fact questions (off by default: cached questions get an answer
+    # built from the property instead of the agent's)
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+    ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "200"))
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+
+    # Per-chat AI budget (0, the default, disables it and never changes a chat's models): over CHAT_BUDGET_DOWNGRADE_AT of the budget the chat
+    # switches to CHAT_BUDGET_DOWNGRADE_MODEL, once spent it also keeps fewer turns in the context
+    CHAT_BUDGET_USD: float = float(os.getenv("CHAT_BUDGET_USD", "0"))
+    CHAT_BUDGET_DOWNGRADE_AT: float = float(os.getenv("CHAT_BUDGET_DOWNGRADE_AT", "0.8"))
+    CHAT_BUDGET_DOWNGRADE_MODEL: str = os.getenv("CHAT_BUDGET_DOWNGRADE_MODEL", "gpt-4.1-mini")
+    CHAT_BUDGET_KEEP_TURNS: int = int(os.getenv("CHAT_BUDGET_KEEP_TURNS", "2"))
+
+    # Rule-based fast path for greetings, thanks, confirmations and emoji (off by default: it replaces
+    # the agent's replies to them with fixed templates)
+    FAST_PATH_ENABLED: bool = os.getenv("FAST_PATH_ENABLED", "false").lower() == "true"
+
+    # Conversation window
+    CONTEXT_KEEP_TURNS: int = int(os.getenv("CONTEXT_KEEP_TURNS", "6"))
+    CONTEXT_FOLD_BATCH: int = int(os.getenv("CONTEXT_FOLD_BATCH", "8"))
+    CONTEXT_SUMMARY_MODEL: str = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4.1-mini")
+
+    # Model routing table (stage x intent -> model), with a p95 latency SLO per stage checked over
+    # the last MODEL_ROUTE_WINDOW calls; with MODEL_ROUTE_FALLBACK_ENABLED (off by default, the fallbacks are
+    # smaller models) a breaching stage uses its fallback models for a while
+    MODEL_ROUTE_FALLBACK_ENABLED: bool = os.getenv("MODEL_ROUTE_FALLBACK_ENABLED", "false").lower() == "true"
+    MODEL_ROUTES_PATH: str = os.getenv("MODEL_ROUTES_PATH", os.path.join(os.path.dirname(__file__), "resources", "model_routes.json"))
+    MODEL_ROUTE_WINDOW: int = int(os.getenv("MODEL_ROUTE_WINDOW", "50"))
+    MODEL_ROUTE_MIN_SAMPLES: int = int(os.getenv("MODEL_ROUTE_MIN_SAMPLES", "20"))
+    MODEL_ROUTE_FALLBACK_SECONDS: float = float(os.getenv("MODEL_ROUTE_FALLBACK_SECONDS", "300"))
+
+    # Prompt registry
+    PROMPTS_DIR: str = os.getenv("PROMPTS_DIR", os.path.join(os.path.dirname(__file__), "resources", "prompts"))
+    PROMPT_CACHE_DIR: str = os.getenv("PROMPT_CACHE_DIR", "")
+    PROMPT_REFRESH_INTERVAL: int = int(os.getenv("PROMPT_REFRESH_INTERVAL", "0"))
+
 settings = Settings()
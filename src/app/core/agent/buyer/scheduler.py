@@ -5,13 +5,13 @@ Defines the SchedulerAgent class, which is responsible for scheduling visits for
 - Manage cancellation/rescheduling of the visit.
 """
 
-from datetime import datetime
-
+from src.app.core.agent.context import stable_prompt
 from src.app.core.agent.main import Agent, AgentState
+from src.app.core.agent.tool_executor import ConcurrentToolNode
 
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
-from langchain import hub
+from src.app.core.prompts import prompt_registry
 
 from src.app.core.tools.buyer.scheduler import (
     save_buyer_info,
@@ -23,21 +23,26 @@ from src.app.core.tools.buyer.scheduler import (
 
 
 class SchedulerAgent(Agent):
+    route_stage = "buyer"
+    prompt_names = ("booking_agent",)
+
     def get_agents(self) -> list[CompiledStateGraph]:
-        prompt = hub.pull("booking_agent")
+        prompt = prompt_registry.get("booking_agent")
 
         booking_agent = create_react_agent(
-            model="openai:gpt-4.1",
-            tools=[
+            model=self.model("BookingAgent"),
+            tools=ConcurrentToolNode([
                 get_remaining_buyer_info,
                 save_buyer_info,
                 get_seller_availability,
                 save_visit_info,
                 notify_seller,
-            ],
-            prompt=prompt.format(current_date=datetime.now().strftime("%Y-%m-%d")),
+            ]),
+            # The graph is cached across turns, the date is read from the state after the conversation
+            prompt=stable_prompt(prompt.format()),
             name="BookingAgent",
-            state_schema=AgentState
+            state_schema=AgentState,
+            version="v1",
         )
 
         return [booking_agent]
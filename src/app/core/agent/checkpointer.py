@@ -0,0 +1,332 @@
+"""
+MongoDB checkpointer for the agent graphs.
+
+Every agent run used to start from the messages rebuilt out of the messages
+collection, so the tool calls and results of the previous turns were lost
+and the whole history was converted and counted again. With checkpoints the
+graph state of the last run of a chat is stored in MongoDB and the next
+turn resumes from it, appending only the messages saved since (see
+Agent.build_input).
+
+Checkpoints are stored one document per checkpoint, with the channel values
+inline: the agents only keep the last checkpoint of every thread, so there
+is nothing to share between versions. The turn context is per turn and is
+never stored. Old checkpoints of a thread are pruned after every run and
+the ones of abandoned threads expire through a TTL index.
+"""
+
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence
+
+from bson import Binary
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.database import Database
+
+from src.app.config import settings
+from src.app.core.database import get_db
+from src.app.utils.logger import logger
+
+# Per-turn channels, set again by every run
+EPHEMERAL_CHANNELS = ("turn",)
+
+
+class MongoCheckpointSaver(BaseCheckpointSaver):
+    """LangGraph checkpoint saver storing the checkpoints and pending writes in MongoDB"""
+
+    def __init__(self, db: Optional[Database] = None, ttl_days: Optional[int] = None):
+        super().__init__()
+        self.db = db if db is not None else get_db()
+        self.checkpoints = self.db.checkpoints
+        self.writes = self.db.checkpoint_writes
+        self.ttl_days = settings.CHECKPOINT_TTL_DAYS if ttl_days is None else ttl_days
+        self._indexes_ready = False
+        self._indexes_lock = threading.Lock()
+
+    def ensure_indexes(self) -> None:
+        """Create the lookup and TTL indexes once per process"""
+        if self._indexes_ready:
+            return
+        with self._indexes_lock:
+            if self._indexes_ready:
+                return
+            keys = [("thread_id", ASCENDING), ("checkpoint_ns", ASCENDING), ("checkpoint_id", DESCENDING)]
+            self.checkpoints.create_index(keys, unique=True)
+            self.writes.create_index(keys + [("task_id", ASCENDING), ("idx", ASCENDING)], unique=True)
+            if self.ttl_days > 0:
+                for collection in (self.checkpoints, self.writes):
+                    collection.create_index("created_at", expireAfterSeconds=int(timedelta(days=self.ttl_days).total_seconds()))
+            self._indexes_ready = True
+
+    def _dump(self, value: Any) -> dict:
+        type_, data = self.serde.dumps_typed(value)
+        return {"type": type_, "data": Binary(data)}
+
+    def _load(self, value: dict) -> Any:
+        return self.serde.loads_typed((value["type"], bytes(value["data"])))
+
+    def _to_tuple(self, doc: dict) -> CheckpointTuple:
+        thread_id, checkpoint_ns = doc["thread_id"], doc["checkpoint_ns"]
+        writes = self.writes.find(
+            {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": doc["checkpoint_id"]}
+        ).sort([("task_id", ASCENDING), ("idx", ASCENDING)])
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": doc["checkpoint_id"],
+            }},
+            checkpoint=self._load(doc["checkpoint"]),
+            metadata=doc.get("metadata") or {},
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": doc["parent_checkpoint_id"],
+                }}
+                if doc.get("parent_checkpoint_id")
+                else None
+            ),
+            pending_writes=[(write["task_id"], write["channel"], self._load(write["value"])) for write in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        Get a checkpoint of a thread: the one in the config's checkpoint_id, or the latest.
+
+        Args:
+            config: Run config with the thread_id (and optionally checkpoint_ns and checkpoint_id)
+
+        Returns:
+            Optional[CheckpointTuple]: The checkpoint with its pending writes, None if there is none
+        """
+        self.ensure_indexes()
+        configurable = config["configurable"]
+        query = {"thread_id": configurable["thread_id"], "checkpoint_ns": configurable.get("checkpoint_ns", "")}
+        if checkpoint_id := get_checkpoint_id(config):
+            query["checkpoint_id"] = checkpoint_id
+        doc = self.checkpoints.find_one(query, sort=[("checkpoint_id", DESCENDING)])
+        return self._to_tuple(doc) if doc else None
+
+    def get_latest_metadata(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Metadata of the latest root checkpoint of a thread, without loading the checkpoint itself.
+
+        Returns:
+            Optional[Dict[str, Any]]: The metadata plus the number of messages in the state, None without checkpoints
+        """
+        self.ensure_indexes()
+        doc = self.checkpoints.find_one(
+            {"thread_id": thread_id, "checkpoint_ns": ""},
+            {"metadata": 1, "message_total": 1},
+            sort=[("checkpoint_id", DESCENDING)],
+        )
+        if doc is None:
+            return None
+        return {**(doc.get("metadata") or {}), "message_total": doc.get("message_total", 0)}
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List the checkpoints matching the config and metadata filter, newest first"""
+        self.ensure_indexes()
+        query: Dict[str, Any] = {}
+        if config:
+            configurable = config["configurable"]
+            if "thread_id" in configurable:
+                query["thread_id"] = configurable["thread_id"]
+            if "checkpoint_ns" in configurable:
+                query["checkpoint_ns"] = configurable["checkpoint_ns"]
+            if checkpoint_id := get_checkpoint_id(config):
+                query["checkpoint_id"] = checkpoint_id
+        if before and (before_id := get_checkpoint_id(before)):
+            query["checkpoint_id"] = {"$lt": before_id}
+        for key, value in (filter or {}).items():
+            query[f"metadata.{key}"] = value
+
+        cursor = self.checkpoints.find(query).sort("checkpoint_id", DESCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        for doc in cursor:
+            yield self._to_tuple(doc)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """
+        Store a checkpoint, without the per-turn channels.
+
+        Args:
+            config: Run config of the checkpoint
+            checkpoint: Checkpoint to store
+            metadata: Checkpoint metadata, with the run config's metadata merged in
+            new_versions: Channel versions written in this step (stored inline with the checkpoint)
+
+        Returns:
+            RunnableConfig: Config pointing to the stored checkpoint
+        """
+        self.ensure_indexes()
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        channel_values = {
+            key: value for key, value in checkpoint["channel_values"].items() if key not in EPHEMERAL_CHANNELS
+        }
+        self.checkpoints.replace_one(
+            {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]},
+            {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+                "parent_checkpoint_id": configurable.get("checkpoint_id"),
+                "checkpoint": self._dump({**checkpoint, "channel_values": channel_values}),
+                "metadata": get_checkpoint_metadata(config, metadata),
+                "message_total": len(channel_values.get("messages") or []),
+                "created_at": datetime.utcnow(),
+            },
+            upsert=True,
+        )
+        return {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Store the pending writes of a task, linked to the config's checkpoint"""
+        self.ensure_indexes()
+        configurable = config["configurable"]
+        key = {
+            "thread_id": configurable["thread_id"],
+            "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+            "checkpoint_id": configurable["checkpoint_id"],
+            "task_id": task_id,
+        }
+        operations = []
+        for index, (channel, value) in enumerate(writes):
+            if channel in EPHEMERAL_CHANNELS:
+                continue
+            idx = WRITES_IDX_MAP.get(channel, index)
+            document = {
+                **key,
+                "idx": idx,
+                "channel": channel,
+                "value": self._dump(value),
+                "task_path": task_path,
+                "created_at": datetime.utcnow(),
+            }
+            # Special writes (errors, interrupts) keep their first value
+            operation = "$setOnInsert" if idx >= 0 else "$set"
+            operations.append(UpdateOne({**key, "idx": idx}, {operation: document}, upsert=True))
+        if operations:
+            self.writes.bulk_write(operations, ordered=False)
+
+    def prune(self, thread_id: str, keep: Optional[int] = None) -> int:
+        """
+        Delete the old checkpoints of a thread: every root checkpoint but the
+        last `keep`, and the subgraph checkpoints of the finished runs.
+
+        Args:
+            thread_id: Thread to prune
+            keep: Root checkpoints to keep, CHECKPOINT_KEEP by default
+
+        Returns:
+            int: Number of checkpoints deleted
+        """
+        keep = max(keep or settings.CHECKPOINT_KEEP, 1)
+        old_ids = [
+            doc["checkpoint_id"]
+            for doc in self.checkpoints.find({"thread_id": thread_id, "checkpoint_ns": ""}, {"checkpoint_id": 1})
+            .sort("checkpoint_id", DESCENDING)
+            .skip(keep)
+        ]
+        query = {"thread_id": thread_id, "$or": [{"checkpoint_ns": {"$ne": ""}}, {"checkpoint_id": {"$in": old_ids}}]}
+        deleted = self.checkpoints.delete_many(query).deleted_count
+        self.writes.delete_many(query)
+        if deleted:
+            logger.info(f"Pruned {deleted} checkpoints of thread {thread_id}")
+        return deleted
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint and pending write of a thread"""
+        self.checkpoints.delete_many({"thread_id": thread_id})
+        self.writes.delete_many({"thread_id": thread_id})
+
+    # The agents run synchronously; the async interface runs the same operations in a worker thread
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+_checkpointer: Optional[MongoCheckpointSaver] = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> MongoCheckpointSaver:
+    """Process-wide checkpoint saver, sharing one MongoDB client"""
+    global _checkpointer
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                _checkpointer = MongoCheckpointSaver()
+    return _checkpointer
@@ -0,0 +1,285 @@
+"""
+Token-aware conversation window.
+
+Keeps the last turns of a chat verbatim and folds the older ones into a
+rolling summary stored on the chat document, so the prompt sent to the
+agents stops growing with the age of the chat. The summary is updated
+incrementally: only the messages that left the window since the last fold
+are sent to the summarisation model, and folding waits until a batch of
+them has accumulated. The fold runs in a background thread once the turn's
+reply is sent (summary_folds.start); the turn that triggers it sends the
+messages unfolded, so the summarisation never adds to a reply's latency.
+
+Worker prompts are laid out for the providers' prompt caching, which
+reuses the longest prefix already seen: the static system prompt goes
+first and byte-identical on every call, then the conversation, and the
+turn's volatile data (the date) goes last (see stable_prompt).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Set
+
+import tiktoken
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from pydantic import BaseModel
+
+from src.app.config import settings
+from src.app.core.crud.chat_crud import ChatCRUD
+from src.app.core.database import get_db
+from src.app.core.llm import model_registry
+from src.app.core.prompts import prompt_registry
+from src.app.models.chat import ConversationSummary
+from src.app.utils.logger import logger
+
+# Approximate per-message overhead of the chat format (role, separators)
+MESSAGE_TOKEN_OVERHEAD = 4
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> Optional[tiktoken.Encoding]:
+    # tiktoken downloads its vocabularies on first use, fall back to an estimate when offline
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"Token encoding for {model} unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(messages: list[BaseMessage], model: str = "gpt-4.1") -> int:
+    """
+    Count the prompt tokens of a list of messages.
+
+    Args:
+        messages: Messages to count
+        model: Model whose tokenizer is used
+
+    Returns:
+        int: Approximate number of prompt tokens
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return sum(len(str(message.content)) // 4 + MESSAGE_TOKEN_OVERHEAD for message in messages)
+    return sum(len(encoding.encode(str(message.content))) + MESSAGE_TOKEN_OVERHEAD for message in messages)
+
+
+class ContextWindowStats(BaseModel):
+    """Token counts of the context built for a turn"""
+    messages_total: int
+    messages_sent: int
+    messages_summarised: int
+    tokens_before: int
+    tokens_after: int
+
+
+class ConversationWindow:
+    """Builds the messages sent to the agents from the conversation history"""
+
+    def __init__(
+        self,
+        keep_turns: int = settings.CONTEXT_KEEP_TURNS,
+        fold_batch: int = settings.CONTEXT_FOLD_BATCH,
+        summary_model: str = settings.CONTEXT_SUMMARY_MODEL,
+    ):
+        self.keep_turns = keep_turns
+        self.fold_batch = fold_batch
+        self.summary_model = summary_model
+        self.stats: Optional[ContextWindowStats] = None
+        # Summary the last built messages start with
+        self.summary: Optional[ConversationSummary] = None
+
+    @staticmethod
+    def to_messages(conversation_history: list[dict]) -> list[BaseMessage]:
+        """Convert the stored conversation history to chat messages"""
+        messages: list[BaseMessage] = []
+        for message in conversation_history:
+            if message.get("sender") == "user":
+                messages.append(HumanMessage(content=message.get("content")))
+            elif message.get("sender") == "system":
+                messages.append(AIMessage(content=message.get("content")))
+        return messages
+
+    def window_start(self, conversation_history: list[dict]) -> int:
+        """Index of the first message of the last keep_turns turns (a turn starts with a user message)"""
+        user_indexes = [i for i, message in enumerate(conversation_history) if message.get("sender") == "user"]
+        if len(user_indexes) <= self.keep_turns:
+            return 0
+        return user_indexes[-self.keep_turns]
+
+    def needs_fold(self, conversation_history: list[dict], summary: Optional[ConversationSummary] = None) -> bool:
+        """Whether enough messages left the window to fold them into the summary"""
+        summary = summary or ConversationSummary()
+        return self.window_start(conversation_history) - summary.message_count >= self.fold_batch
+
+    def build(
+        self,
+        chat_id: str,
+        conversation_history: list[dict],
+        summary: Optional[ConversationSummary] = None,
+    ) -> list[BaseMessage]:
+        """
+        Build the messages for a turn: the rolling summary followed by the
+        messages that are not folded into it.
+
+        Args:
+            chat_id: Chat ID, used to store the updated summary
+            conversation_history: Full conversation history of the chat
+            summary: Summary currently stored on the chat
+
+        Returns:
+            list[BaseMessage]: Messages to send to the agent
+        """
+        summary = summary or ConversationSummary()
+
+        # Fold in batches so the verbatim part of the prompt stays stable between folds;
+        # this turn keeps the unfolded messages, the fold runs after its reply
+        if self.needs_fold(conversation_history, summary):
+            start = self.window_start(conversation_history)
+            summary_folds.defer(chat_id, self, summary, conversation_history[summary.message_count:start])
+
+        self.summary = summary
+        folded = min(summary.message_count, len(conversation_history))
+        messages = self.to_messages(conversation_history[folded:])
+        if summary.text:
+            messages = [SystemMessage(content=f"Resumen de la conversación anterior:\n{summary.text}")] + messages
+
+        all_messages = self.to_messages(conversation_history)
+        self.stats = ContextWindowStats(
+            messages_total=len(conversation_history),
+            messages_sent=len(conversation_history) - folded,
+            messages_summarised=folded,
+            tokens_before=count_tokens(all_messages),
+            tokens_after=count_tokens(messages),
+        )
+        logger.info(
+            f"Context for chat {chat_id}: {self.stats.tokens_before} -> {self.stats.tokens_after} tokens "
+            f"({self.stats.messages_sent}/{self.stats.messages_total} messages verbatim, "
+            f"{self.stats.messages_summarised} summarised)"
+        )
+        return messages
+
+    def fold(self, chat_id: str, summary: ConversationSummary, new_messages: list[dict]) -> ConversationSummary:
+        """
+        Fold messages that left the window into the rolling summary and store it.
+
+        Returns the previous summary unchanged if the summarisation fails.
+        """
+        transcript = "\n".join(
+            f"{'Usuario' if message.get('sender') == 'user' else 'Broky'}: {message.get('content')}"
+            for message in new_messages
+        )
+        prompt = prompt_registry.get("conversation_summary").format(
+            summary=summary.text or "(sin resumen)",
+            messages=transcript,
+        )
+        try:
+            response = model_registry.get(self.summary_model).invoke([HumanMessage(content=prompt)])
+        except Exception as e:
+            logger.error(f"Error summarising chat {chat_id}: {e}")
+            return summary
+
+        updated = ConversationSummary(
+            text=str(response.content).strip(),
+            message_count=summary.message_count + len(new_messages),
+        )
+        ChatCRUD(get_db()).update_summary(chat_id, updated.text, updated.message_count)
+        return updated
+
+
+class SummaryFolds:
+    """
+    Folds deferred by the turns' windows, one per chat, run in a background
+    thread when the turn's reply has been sent. A chat whose fold is still
+    running does not get another one; its next turns send the messages
+    unfolded until the summary is stored.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self._pending: Dict[str, tuple] = {}
+        self._running: Set[str] = set()
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def defer(
+        self,
+        chat_id: str,
+        window: ConversationWindow,
+        summary: ConversationSummary,
+        new_messages: list[dict],
+    ) -> None:
+        """
+        Record the fold a turn needs, to run once its reply is sent.
+
+        Args:
+            chat_id: Chat ID
+            window: Window that built the turn's messages (its summary model folds)
+            summary: Summary currently stored on the chat
+            new_messages: Messages that left the window since that summary
+        """
+        with self._lock:
+            if chat_id not in self._running:
+                self._pending[chat_id] = (window, summary, new_messages)
+
+    def start(self, chat_id: str) -> None:
+        """Run the chat's deferred fold, if any, without waiting for it"""
+        with self._lock:
+            fold = self._pending.pop(chat_id, None)
+            if fold is None:
+                return
+            self._running.add(chat_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="summary-folds")
+            self._executor.submit(self._run, chat_id, *fold)
+
+    def _run(self, chat_id: str, window: ConversationWindow, summary: ConversationSummary, new_messages: list[dict]) -> None:
+        try:
+            window.fold(chat_id, summary, new_messages)
+        except Exception as e:
+            logger.error(f"Error folding the summary of chat {chat_id}: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(chat_id)
+
+    def wait(self) -> None:
+        """Wait for the folds already started (scripts and shutdown)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+summary_folds = SummaryFolds()
+
+
+def turn_facts(state: dict) -> str:
+    """Volatile data of the turn appended after the conversation"""
+    return f"Fecha actual: {state.get('current_date') or datetime.now().strftime('%Y-%m-%d')}"
+
+
+def stable_prompt(
+    system_prompt: str,
+    volatile: Callable[[dict], str] = turn_facts,
+) -> Callable[[dict], list[BaseMessage]]:
+    """
+    Build a worker prompt with a cache-friendly layout: the static system
+    prompt, the conversation, and the volatile data of the turn last, so a
+    new date does not invalidate the cached prefix of the conversation.
+
+    Args:
+        system_prompt: Fully formatted static instructions
+        volatile: Builds the trailing system message from the graph state
+
+    Returns:
+        Callable[[dict], list[BaseMessage]]: Prompt for create_react_agent
+    """
+    system_message = SystemMessage(content=system_prompt)
+
+    def prompt(state: dict) -> list[BaseMessage]:
+        return [system_message, *state["messages"], SystemMessage(content=volatile(state))]
+    return prompt
@@ -1,17 +1,33 @@
+import asyncio
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Optional
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
 
-from langchain import hub
-from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
-from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, RemoveMessage
 
-from langgraph.graph.state import CompiledStateGraph, StateGraph
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langgraph.graph.state import CompiledStateGraph
 from langgraph_supervisor import create_supervisor
 from langgraph.prebuilt.chat_agent_executor import AgentStateWithStructuredResponse
 
 from pydantic import BaseModel, Field
 from enum import Enum
+from src.app.config import settings
+from src.app.core.agent.checkpointer import get_checkpointer
+from src.app.core.agent.context import ConversationWindow
+from src.app.core.agent.turn_context import TurnContext
+from src.app.core.llm import DEFAULT_PROFILE, FAST_PROFILE, model_registry
+from src.app.core.model_routes import model_router
+from src.app.core.prompts import prompt_registry
+from src.app.models.chat import ConversationSummary
 from src.app.utils.logger import logger
+from src.app.utils.metrics import metrics
+
+
+SUPERVISOR_NAME = "supervisor"
 
 
 class AgentState(AgentStateWithStructuredResponse):
@@ -19,6 +35,8 @@ class AgentState(AgentStateWithStructuredResponse):
     The state of the agent.
     """
     chat_id: str = Field(description="ID del chat")
+    current_date: str = Field(description="Fecha actual (YYYY-MM-DD)")
+    turn: TurnContext = Field(description="Chat, usuario y propiedad del turno")
 
 
 class MessageType(str, Enum):
@@ -37,8 +55,28 @@ class AgentResponse(BaseModel):
 class Agent(ABC):
     """
     Base class for all agents.
+
+    The compiled supervisor graph only depends on the agent class, the
+    version of its prompts and the model profile, so it is built once per
+    process and reused on every turn. Per-turn data (chat_id, current_date,
+    messages) goes through the graph state.
     """
 
+    # Registry prompts used by the workers, besides the supervisor prompt
+    prompt_names: tuple[str, ...] = ()
+
+    # Stage of the model routing table the agent's models come from
+    route_stage: str = ""
+
+    # Callback handlers attached to every run (e.g. the devtools tool call recorder)
+    callbacks: list = []
+
+    _graph_cache: dict[tuple[type, str, str], CompiledStateGraph] = {}
+    _worker_cache: dict[tuple[type, str, str], list[CompiledStateGraph]] = {}
+    _graph_cache_lock = threading.Lock()
+    # Streamed runs going on after their reply was sent, per checkpoint thread
+    _finishing_streams: dict[str, asyncio.Task] = {}
+
     @abstractmethod
     def get_agents(self) -> list[CompiledStateGraph]:
         """
@@ -59,25 +97,30 @@ class Agent(ABC):
         """
         pass
 
-    def process(self, agent_context: dict) -> AgentResponse:
+    def get_prompt_version(self) -> str:
         """
-        Processes the user's message
+        Get the version of the prompts used by this agent, part of the graph cache key.
 
-        Args:
-            agent_context: The context of the agent.
+        Returns:
+            str: The prompt version.
+        """
+        return prompt_registry.version("supervisor", *self.prompt_names)
+
+    def build_supervisor(self) -> CompiledStateGraph:
+        """
+        Build and compile the supervisor graph with the agent's workers.
 
         Returns:
-            str: The agent's response to the user's message.
+            CompiledStateGraph: The compiled supervisor graph.
         """
-        logger.info(f"Processing agent {self.__class__.__name__}")
         agents: list[CompiledStateGraph] = self.get_agents()
 
-        model = init_chat_model("openai:gpt-4.1", temperature=0)
+        model = self.model(SUPERVISOR_NAME)
 
-        prompt = hub.pull("supervisor")
+        prompt = prompt_registry.get("supervisor")
         prompt = prompt.format(flow_description=self.get_flow_description())
 
-        supervisor: StateGraph = create_supervisor(
+        return create_supervisor(
             agents=agents,
             model=model,
             prompt=prompt,
@@ -85,19 +128,493 @@ class Agent(ABC):
             output_mode="last_message",
             response_format=AgentResponse,
             state_schema=AgentState,
+            supervisor_name=SUPERVISOR_NAME,
         ).compile()
 
-        messages: list[BaseMessage] = []
-        for message in agent_context.get("conversation_history"):
-            if message.get("sender") == "user":
-                messages.append(HumanMessage(content=message.get("content")))
-            elif message.get("sender") == "system":
-                messages.append(AIMessage(content=message.get("content")))
+    def model(self, intent: str) -> BaseChatModel:
+        """
+        Get the chat model routed to one of the agent's intents.
+
+        Args:
+            intent: "supervisor" or the worker's name
+
+        Returns:
+            BaseChatModel: The model of the route, under the profile the graph is built with
+        """
+        return model_registry.route(self.route_stage, intent)
+
+    def model_profile(self, agent_context: dict) -> str:
+        """
+        Model profile of a turn: the one set by the budget policy, else the
+        fast one while the agent's stage breaches its latency SLO.
+        """
+        profile = agent_context.get("model_profile")
+        if profile:
+            return profile
+        if model_router.degraded(self.route_stage):
+            return FAST_PROFILE
+        return DEFAULT_PROFILE
+
+    def get_supervisor(self, profile: str = DEFAULT_PROFILE) -> CompiledStateGraph:
+        """
+        Get the compiled supervisor graph for this agent class, building it on first use.
+
+        Args:
+            profile: Model profile the graph is built with (see ModelRegistry.use_profile).
+
+        Returns:
+            CompiledStateGraph: The cached compiled supervisor graph.
+        """
+        key = (self.__class__, self.get_prompt_version(), profile)
+        supervisor = Agent._graph_cache.get(key)
+        if supervisor is not None:
+            return supervisor
+
+        with Agent._graph_cache_lock:
+            supervisor = Agent._graph_cache.get(key)
+            if supervisor is None:
+                start = time.perf_counter()
+                with model_registry.use_profile(profile):
+                    supervisor = self.build_supervisor()
+                Agent._graph_cache[key] = supervisor
+                build_ms = (time.perf_counter() - start) * 1000
+                metrics.observe("agent.graph_build_ms", build_ms, agent=self.__class__.__name__)
+                logger.info(
+                    f"Built supervisor graph for {self.__class__.__name__} "
+                    f"(prompt version {key[1]}, {profile} models) in {build_ms:.1f} ms"
+                )
+        return supervisor
+
+    @classmethod
+    def clear_graph_cache(cls) -> None:
+        """
+        Drop every cached supervisor graph so the next turn rebuilds them.
+        """
+        with Agent._graph_cache_lock:
+            Agent._graph_cache.clear()
+            Agent._worker_cache.clear()
+
+    def get_workers(self, profile: str = DEFAULT_PROFILE) -> list[CompiledStateGraph]:
+        """
+        Get the compiled worker agents of this agent class on their own
+        (without the supervisor), building them on first use.
 
-        response = supervisor.invoke({"messages": messages, "chat_id": agent_context.get("chat_id")}, {"run_name": self.__class__.__name__, "metadata": {"chat_id": agent_context.get("chat_id")}})
+        Args:
+            profile: Model profile the workers are built with.
+
+        Returns:
+            list[CompiledStateGraph]: The cached worker agents.
+        """
+        key = (self.__class__, self.get_prompt_version(), profile)
+        workers = Agent._worker_cache.get(key)
+        if workers is not None:
+            return workers
+
+        with Agent._graph_cache_lock:
+            workers = Agent._worker_cache.get(key)
+            if workers is None:
+                with model_registry.use_profile(profile):
+                    workers = self.get_agents()
+                Agent._worker_cache[key] = workers
+        return workers
+
+    def has_single_worker(self) -> bool:
+        """
+        Whether the agent has a single worker, which can then be invoked without the supervisor.
+        """
+        return len(self.get_workers()) == 1
+
+    def uses_direct_mode(self) -> bool:
+        """
+        Whether turns skip the supervisor: a supervisor with a single worker
+        always delegates to it, its routing and hand-back calls add nothing.
+        """
+        return settings.AGENT_DIRECT_SINGLE_WORKER and self.has_single_worker()
+
+    def build_state(self, agent_context: dict) -> dict:
+        """
+        Build the graph input for a turn from the agent context.
+
+        Args:
+            agent_context: The context of the agent.
+
+        Returns:
+            dict: The initial state of the supervisor graph.
+        """
+        # Chats over their budget keep fewer turns
+        window = ConversationWindow(keep_turns=agent_context.get("keep_turns") or settings.CONTEXT_KEEP_TURNS)
+        messages: list[BaseMessage] = window.build(
+            agent_context.get("chat_id"),
+            agent_context.get("conversation_history"),
+            agent_context.get("summary"),
+        )
+
+        return {"messages": messages, **self._turn_state(agent_context)}
+
+    def _turn_state(self, agent_context: dict) -> dict:
+        """State keys set on every turn besides the messages"""
+        return {
+            "chat_id": agent_context.get("chat_id"),
+            "current_date": datetime.now().strftime("%Y-%m-%d"),
+            "turn": agent_context.get("turn") or TurnContext(chat_id=agent_context.get("chat_id")),
+        }
+
+    def thread_id(self, agent_context: dict, direct: bool = False) -> str:
+        """
+        Checkpoint thread of a chat's runs: one per agent class and mode, as
+        the stages (and the direct and supervisor modes) run different graphs.
+        """
+        return f"{agent_context.get('chat_id')}:{self.__class__.__name__}{'.direct' if direct else ''}"
+
+    def build_input(self, agent_context: dict, thread_id: str) -> tuple[dict, dict]:
+        """
+        Build the graph input and run config of a turn that resumes from the
+        thread's last checkpoint.
+
+        The checkpoint metadata records how many stored messages its state
+        covers, so the input only carries the messages saved since (the new
+        user message and any reply sent outside the graph) and the graph
+        appends them to the checkpointed messages, tool calls included. The
+        state is compacted, replaced by the conversation window, when the
+        window folds messages into the summary, when the context size changes
+        or when it grows past CHECKPOINT_MAX_MESSAGES.
+
+        Args:
+            agent_context: The context of the agent.
+            thread_id: Checkpoint thread of the run.
+
+        Returns:
+            tuple[dict, dict]: The graph input and the run config.
+        """
+        history: list[dict] = agent_context.get("conversation_history") or []
+        summary: ConversationSummary = agent_context.get("summary") or ConversationSummary()
+        keep_turns = agent_context.get("keep_turns") or settings.CONTEXT_KEEP_TURNS
+        window = ConversationWindow(keep_turns=keep_turns)
+
+        saved = get_checkpointer().get_latest_metadata(thread_id)
+        covered = saved.get("message_count") if saved else None
+        resume = (
+            covered is not None
+            and covered <= len(history)
+            and saved.get("folded") == summary.message_count
+            and saved.get("keep_turns") == keep_turns
+            and saved["message_total"] + len(history) - covered <= settings.CHECKPOINT_MAX_MESSAGES
+            and not window.needs_fold(history, summary)
+        )
+
+        if resume:
+            messages: list[BaseMessage] = window.to_messages(history[covered:])
+            folded = summary.message_count
+            action = "resume"
+        else:
+            messages = window.build(agent_context.get("chat_id"), history, summary)
+            folded = window.summary.message_count
+            action = "new"
+            if saved:
+                # Drop the checkpointed messages (and their tool calls) for the window
+                messages = [RemoveMessage(id=REMOVE_ALL_MESSAGES)] + messages
+                action = "compact"
+        metrics.incr("agent.checkpoints", action=action, agent=self.__class__.__name__)
+
+        config = self.run_config(agent_context)
+        config["configurable"] = {"thread_id": thread_id}
+        config["metadata"].update({
+            # The caller saves the reply right after the run, the state already holds it
+            "message_count": len(history) + 1,
+            "folded": folded,
+            "keep_turns": keep_turns,
+        })
+        return {"messages": messages, **self._turn_state(agent_context)}, config
+
+    def run_graph(self, graph: CompiledStateGraph, agent_context: dict, thread_id: str) -> dict:
+        """
+        Run a turn through a graph, resuming from the thread's checkpoint when
+        AGENT_CHECKPOINTS is on. The checkpoint is only written once the run
+        finishes and the older ones are pruned.
 
+        Args:
+            graph: Supervisor or worker graph.
+            agent_context: The context of the agent.
+            thread_id: Checkpoint thread of the run.
+
+        Returns:
+            dict: The final state of the graph.
+        """
+        if not settings.AGENT_CHECKPOINTS:
+            state = self.build_state(agent_context)
+            response = graph.invoke(state, self.run_config(agent_context))
+        else:
+            state, config = self.build_input(agent_context, thread_id)
+            checkpointer = get_checkpointer()
+            response = graph.copy(update={"checkpointer": checkpointer}).invoke(state, config, durability="exit")
+            checkpointer.prune(thread_id)
+        self.report_turn(state)
+        return response
+
+    async def arun_graph(self, graph: CompiledStateGraph, agent_context: dict, thread_id: str) -> dict:
+        """
+        Async version of run_graph: the model calls go through the async HTTP
+        client, the input building and the pruning (database and tokenizer
+        work) run in a worker thread, and LangGraph runs the sync tools in
+        its executor.
+        """
+        if not settings.AGENT_CHECKPOINTS:
+            state = await asyncio.to_thread(self.build_state, agent_context)
+            response = await graph.ainvoke(state, self.run_config(agent_context))
+        else:
+            state, config = await asyncio.to_thread(self.build_input, agent_context, thread_id)
+            checkpointer = get_checkpointer()
+            response = await graph.copy(update={"checkpointer": checkpointer}).ainvoke(state, config, durability="exit")
+            await asyncio.to_thread(checkpointer.prune, thread_id)
+        self.report_turn(state)
+        return response
+
+    def report_turn(self, state: dict) -> None:
+        """
+        Log and record the database reads the tools did through the turn context.
+        """
+        stats = state["turn"].stats()
+        metrics.observe("turn.context_reads", stats["reads"], agent=self.__class__.__name__)
+        metrics.observe("turn.context_hits", stats["hits"], agent=self.__class__.__name__)
+        logger.info(
+            f"Turn context for chat {state['chat_id']}: {stats['reads']} DB reads, "
+            f"{stats['hits']} served from the context"
+        )
+
+    def run_config(self, agent_context: dict) -> dict:
+        """
+        Build the run configuration (tracing name, metadata and callbacks) for a turn.
+        """
+        return {
+            "run_name": self.__class__.__name__,
+            "metadata": {"chat_id": agent_context.get("chat_id")},
+            "callbacks": list(Agent.callbacks),
+        }
+
+    def process(self, agent_context: dict) -> AgentResponse:
+        """
+        Processes the user's message
+
+        Args:
+            agent_context: The context of the agent.
+
+        Returns:
+            str: The agent's response to the user's message.
+        """
+        if self.uses_direct_mode():
+            return self.process_direct(agent_context)
+
+        logger.info(f"Processing agent {self.__class__.__name__}")
+        supervisor: CompiledStateGraph = self.get_supervisor(self.model_profile(agent_context))
+
+        response = self.run_graph(supervisor, agent_context, self.thread_id(agent_context))
+        return self._supervisor_reply(response)
+
+    async def aprocess(self, agent_context: dict) -> AgentResponse:
+        """
+        Async version of process.
+        """
+        if self.uses_direct_mode():
+            return await self.aprocess_direct(agent_context)
+
+        logger.info(f"Processing agent {self.__class__.__name__} (async)")
+        supervisor: CompiledStateGraph = self.get_supervisor(self.model_profile(agent_context))
+
+        response = await self.arun_graph(supervisor, agent_context, self.thread_id(agent_context))
+        return self._supervisor_reply(response)
+
+    @staticmethod
+    def _supervisor_reply(response: dict) -> AgentResponse:
+        """The worker's answer, before the supervisor hand-back messages"""
         ai_messages = list(filter(lambda message: isinstance(message, AIMessage), response["messages"]))
 
         message_response: AgentResponse = AgentResponse(type=MessageType.TEXT, message=ai_messages[-3].content)
 
         return message_response
+
+    def process_stream(self, agent_context: dict, on_reply: Callable[[AgentResponse], None]) -> AgentResponse:
+        """
+        Processes the user's message streaming the graph updates, and hands the
+        reply to on_reply as soon as the responding worker produces its last
+        message, without waiting for the supervisor hand-back and
+        structured-response hops. Without checkpoints the run stops there;
+        with AGENT_CHECKPOINTS it runs to the end after on_reply, so the exit
+        checkpoint is written.
+
+        Args:
+            agent_context: The context of the agent.
+            on_reply: Callback that delivers the reply to the user.
+
+        Returns:
+            AgentResponse: The agent's response to the user's message.
+        """
+        if self.uses_direct_mode():
+            reply = self.process_direct(agent_context)
+            on_reply(reply)
+            return reply
+
+        logger.info(f"Processing agent {self.__class__.__name__} (streaming)")
+        supervisor: CompiledStateGraph = self.get_supervisor(self.model_profile(agent_context))
+        thread_id = self.thread_id(agent_context)
+        if settings.AGENT_CHECKPOINTS:
+            state, config = self.build_input(agent_context, thread_id)
+            graph = supervisor.copy(update={"checkpointer": get_checkpointer()})
+            stream = graph.stream(state, config, stream_mode="updates", subgraphs=True, durability="exit")
+        else:
+            state = self.build_state(agent_context)
+            stream = supervisor.stream(state, self.run_config(agent_context), stream_mode="updates", subgraphs=True)
+
+        try:
+            reply: Optional[AgentResponse] = None
+            supervisor_message: Optional[str] = None
+            for namespace, update in stream:
+                reply, supervisor_message = self._read_update(namespace, update, supervisor_message)
+                if reply is not None:
+                    break
+
+            # The supervisor answered by itself without delegating to a worker
+            if reply is None:
+                reply = AgentResponse(type=MessageType.TEXT, message=supervisor_message)
+
+            on_reply(reply)
+            if settings.AGENT_CHECKPOINTS:
+                # The reply is out, the hand-back hops only complete the checkpointed state
+                for _ in stream:
+                    pass
+                get_checkpointer().prune(thread_id)
+        finally:
+            stream.close()
+            self.report_turn(state)
+        return reply
+
+    async def aprocess_stream(self, agent_context: dict, on_reply: Callable[[AgentResponse], Awaitable[None]]) -> AgentResponse:
+        """
+        Async version of process_stream, on_reply is awaited. With
+        AGENT_CHECKPOINTS the rest of the run goes on in a background task
+        (see finish_streams), the chat's next turn waits for it.
+        """
+        if self.uses_direct_mode():
+            reply = await self.aprocess_direct(agent_context)
+            await on_reply(reply)
+            return reply
+
+        logger.info(f"Processing agent {self.__class__.__name__} (async streaming)")
+        supervisor: CompiledStateGraph = self.get_supervisor(self.model_profile(agent_context))
+        thread_id = self.thread_id(agent_context)
+        if settings.AGENT_CHECKPOINTS:
+            # The chat's previous run may still be writing its checkpoint
+            previous = Agent._finishing_streams.get(thread_id)
+            if previous is not None:
+                await asyncio.shield(previous)
+            state, config = await asyncio.to_thread(self.build_input, agent_context, thread_id)
+            graph = supervisor.copy(update={"checkpointer": get_checkpointer()})
+            stream = graph.astream(state, config, stream_mode="updates", subgraphs=True, durability="exit")
+        else:
+            state = await asyncio.to_thread(self.build_state, agent_context)
+            stream = supervisor.astream(state, self.run_config(agent_context), stream_mode="updates", subgraphs=True)
+
+        handed_off = False
+        try:
+            reply: Optional[AgentResponse] = None
+            supervisor_message: Optional[str] = None
+            async for namespace, update in stream:
+                reply, supervisor_message = self._read_update(namespace, update, supervisor_message)
+                if reply is not None:
+                    break
+
+            # The supervisor answered by itself without delegating to a worker
+            if reply is None:
+                reply = AgentResponse(type=MessageType.TEXT, message=supervisor_message)
+
+            await on_reply(reply)
+            if settings.AGENT_CHECKPOINTS:
+                Agent._finishing_streams[thread_id] = asyncio.create_task(self._afinish_stream(stream, state, thread_id))
+                handed_off = True
+        finally:
+            if not handed_off:
+                await stream.aclose()
+                self.report_turn(state)
+        return reply
+
+    async def _afinish_stream(self, stream, state: dict, thread_id: str) -> None:
+        """Run a streamed turn to the end after its reply was sent, so the exit checkpoint is written"""
+        try:
+            async for _ in stream:
+                pass
+            await asyncio.to_thread(get_checkpointer().prune, thread_id)
+        except Exception as e:
+            logger.error(f"Error finishing the run of {thread_id}: {e}")
+        finally:
+            await stream.aclose()
+            self.report_turn(state)
+            if Agent._finishing_streams.get(thread_id) is asyncio.current_task():
+                del Agent._finishing_streams[thread_id]
+
+    @classmethod
+    async def finish_streams(cls) -> None:
+        """Wait for the streamed runs still writing their checkpoints (shutdown)"""
+        tasks = list(cls._finishing_streams.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _read_update(self, namespace: tuple, update: dict, supervisor_message: Optional[str]) -> tuple[Optional[AgentResponse], Optional[str]]:
+        """
+        Read a streamed graph update.
+
+        Returns:
+            tuple: The reply if a worker produced its final answer, and the supervisor's last answer so far.
+        """
+        worker = bool(namespace) and namespace[0].split(":")[0] != SUPERVISOR_NAME
+        for node_update in update.values():
+            last_message = self._last_ai_message(node_update)
+            if last_message is None:
+                continue
+            if worker:
+                return AgentResponse(type=MessageType.TEXT, message=last_message.content), supervisor_message
+            supervisor_message = last_message.content
+        return None, supervisor_message
+
+    def process_direct(self, agent_context: dict) -> AgentResponse:
+        """
+        Processes the user's message with the agent's first (only) worker,
+        skipping the supervisor routing, hand-back and structured-response
+        calls. The reply is the worker's last message.
+
+        Args:
+            agent_context: The context of the agent.
+
+        Returns:
+            AgentResponse: The agent's response to the user's message.
+        """
+        logger.info(f"Processing agent {self.__class__.__name__} (direct worker)")
+        worker: CompiledStateGraph = self.get_workers(self.model_profile(agent_context))[0]
+
+        response = self.run_graph(worker, agent_context, self.thread_id(agent_context, direct=True))
+
+        last_message = self._last_ai_message(response)
+        return AgentResponse(type=MessageType.TEXT, message=last_message.content if last_message else None)
+
+    async def aprocess_direct(self, agent_context: dict) -> AgentResponse:
+        """
+        Async version of process_direct.
+        """
+        logger.info(f"Processing agent {self.__class__.__name__} (async direct worker)")
+        worker: CompiledStateGraph = self.get_workers(self.model_profile(agent_context))[0]
+
+        response = await self.arun_graph(worker, agent_context, self.thread_id(agent_context, direct=True))
+
+        last_message = self._last_ai_message(response)
+        return AgentResponse(type=MessageType.TEXT, message=last_message.content if last_message else None)
+
+    @staticmethod
+    def _last_ai_message(node_update) -> Optional[AIMessage]:
+        """Last AI message of a node update if it is a final answer (no tool calls)"""
+        if not isinstance(node_update, dict):
+            return None
+        messages = node_update.get("messages") or []
+        if not messages:
+            return None
+        last_message = messages[-1]
+        if isinstance(last_message, AIMessage) and not last_message.tool_calls and last_message.content:
+            return last_message
+        return None
@@ -14,14 +14,14 @@ from src.app.core.tools.general import update_business_stage
 
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
-from langchain import hub
 
 
 class CompletedDealAgent(Agent):
+    route_stage = "seller:completed"
     def get_agents(self) -> list[CompiledStateGraph]:
         # Contract management agent for handling the completed deal flow
         contract_agent = create_react_agent(
-            model="openai:gpt-4o",
+            model=self.model("ContractManagementAgent"),
             tools=[generate_sales_contract],
             prompt=(
                 "Eres un agente especializado en la gestión de acuerdos completados de compra y venta de propiedades. "
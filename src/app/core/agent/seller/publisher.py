@@ -7,10 +7,11 @@ Defines the PublisherAgent class, which is responsible for registering the avail
 """
 
 from src.app.core.agent.main import Agent, AgentState
+from src.app.core.agent.tool_executor import ConcurrentToolNode
 
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
-from langchain import hub
+from src.app.core.prompts import prompt_registry
 
 from src.app.core.tools.publisher import generate_qr
 from src.app.core.tools.general import save_availability, update_business_stage
@@ -18,14 +19,18 @@ from src.app.models.business_stage import SellerStage
 
 
 class PublisherAgent(Agent):
+    route_stage = "seller:publishing"
+    prompt_names = ("agenda_agent",)
+
     def get_agents(self) -> list[CompiledStateGraph]:
-        prompt = hub.pull("agenda_agent")
+        prompt = prompt_registry.get("agenda_agent")
         agenda_agent = create_react_agent(
-            model="openai:gpt-4.1",
-            tools=[save_availability, generate_qr, update_business_stage],
+            model=self.model("AgendaAgent"),
+            tools=ConcurrentToolNode([save_availability, generate_qr, update_business_stage]),
             prompt=prompt.format(next_stage=SellerStage.VISITS.value),
             name="AgendaAgent",
-            state_schema=AgentState
+            state_schema=AgentState,
+            version="v1",
         )
         
         return [agenda_agent]
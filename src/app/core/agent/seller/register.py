@@ -7,24 +7,29 @@ Defines the RegisterAgent class, which is responsible for registering sellers in
 """
 
 from src.app.core.agent.main import Agent, AgentState
+from src.app.core.agent.tool_executor import ConcurrentToolNode
 from src.app.core.tools.general import update_business_stage
 from src.app.core.tools.register import get_user_info, save_property_info, get_remaining_info
 
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
-from langchain import hub
+from src.app.core.prompts import prompt_registry
 
 
 class RegisterAgent(Agent):
+    route_stage = "seller:registration"
+    prompt_names = ("property_registration_agent",)
+
     def get_agents(self) -> list[CompiledStateGraph]:
-        prompt = hub.pull("property_registration_agent")
+        prompt = prompt_registry.get("property_registration_agent")
 
         property_registration_agent = create_react_agent(
-            model="openai:gpt-4.1",
-            tools=[save_property_info, get_user_info, get_remaining_info, update_business_stage],
+            model=self.model("PropertyRegistrationAgent"),
+            tools=ConcurrentToolNode([save_property_info, get_user_info, get_remaining_info, update_business_stage]),
             prompt=prompt.format(),
             name="PropertyRegistrationAgent",
             state_schema=AgentState,
+            version="v1",
         )
 
         return [property_registration_agent]
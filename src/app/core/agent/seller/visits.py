@@ -7,7 +7,7 @@ from src.app.core.agent.main import Agent, AgentState
 
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
-from langchain import hub
+from src.app.core.prompts import prompt_registry
 
 from src.app.core.tools.visits import create_property_card, get_appraisal_info, publish_property    
 from src.app.core.tools.general import save_availability
@@ -15,10 +15,13 @@ from src.app.models.business_stage import SellerStage
 
 
 class VisitsAgent(Agent):
+    route_stage = "seller:visits"
+    prompt_names = ("agenda_agent",)
+
     def get_agents(self) -> list[CompiledStateGraph]:
-        prompt = hub.pull("agenda_agent")
+        prompt = prompt_registry.get("agenda_agent")
         agenda_management_agent = create_react_agent(
-            model="openai:gpt-4.1",
+            model=self.model("AgendaManagementAgent"),
             tools=[save_availability],
             prompt=prompt.format(next_stage="No hay siguiente etapa"),
             name="AgendaManagementAgent",
@@ -26,7 +29,7 @@ class VisitsAgent(Agent):
         )
 
         property_card_agent = create_react_agent(
-            model="openai:gpt-4o",
+            model=self.model("PropertyCardAgent"),
             # TODO: Implement the tools for the property card agent
             tools=[create_property_card],
             # TODO: Iterate over the prompt
@@ -36,7 +39,7 @@ class VisitsAgent(Agent):
         )
         
         appraisal_agent = create_react_agent(
-            model="openai:gpt-4o",
+            model=self.model("AppraisalAgent"),
             # TODO: Implement the tools for the appraisal agent
             tools=[get_appraisal_info],
             # TODO: Iterate over the prompt
@@ -46,7 +49,7 @@ class VisitsAgent(Agent):
         )
         
         publishing_agent = create_react_agent(
-            model="openai:gpt-4o",
+            model=self.model("PublishingAgent"),
             # TODO: Implement the tools for the publishing agent
             tools=[publish_property],
             # TODO: Iterate over the prompt
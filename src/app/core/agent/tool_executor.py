@@ -0,0 +1,95 @@
+"""
+Tool executor for the worker agents.
+
+When the model asks for several tools in one step, the tool calls are run
+in batches in the order the model emitted them: consecutive read-only
+calls (tools marked with @read_only) run concurrently, on a thread pool for
+sync tools or with asyncio.gather for async ones, and every other call runs
+on its own once the calls before it finished, so a lookup emitted after a
+save sees the saved data. The results keep the order of the calls.
+
+The workers use it with create_react_agent(version="v1"): with "v2" every
+tool call is sent to the tool node as a separate task and the node never
+sees the step as a whole.
+"""
+
+import asyncio
+from typing import Any, List, Optional, Sequence, Union
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import get_config_list, get_executor_for_config
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+from langgraph.store.base import BaseStore
+
+from src.app.config import settings
+
+
+def read_only(tool: BaseTool) -> BaseTool:
+    """Mark a tool as read-only: it can run concurrently with the other read-only calls of a step"""
+    tool.metadata = {**(tool.metadata or {}), "read_only": True}
+    return tool
+
+
+class ConcurrentToolNode(ToolNode):
+    """ToolNode running the independent tool calls of a step concurrently"""
+
+    def __init__(self, tools: Sequence[Union[BaseTool, Any]], *, max_concurrency: Optional[int] = None, **kwargs: Any):
+        super().__init__(tools, **kwargs)
+        self.max_concurrency = max_concurrency or settings.TOOL_MAX_CONCURRENCY
+
+    def is_read_only(self, call: dict) -> bool:
+        tool = self.tools_by_name.get(call["name"])
+        return bool(tool and (tool.metadata or {}).get("read_only"))
+
+    def batches(self, tool_calls: list) -> List[List[int]]:
+        """
+        Split the calls of a step into batches that can run concurrently.
+
+        Args:
+            tool_calls: Tool calls of the step, in the order the model emitted them
+
+        Returns:
+            List[List[int]]: Indexes of the calls of every batch, batches run one after another
+        """
+        batches: List[List[int]] = []
+        for index, call in enumerate(tool_calls):
+            if self.is_read_only(call) and batches and self.is_read_only(tool_calls[batches[-1][0]]):
+                batches[-1].append(index)
+            else:
+                batches.append([index])
+        return batches
+
+    def _func(self, input: Any, config: RunnableConfig, *, store: Optional[BaseStore]) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        config_list = get_config_list(config, len(tool_calls))
+        outputs: list = [None] * len(tool_calls)
+        with get_executor_for_config({**config, "max_concurrency": self.max_concurrency}) as executor:
+            for batch in self.batches(tool_calls):
+                if len(batch) == 1:
+                    outputs[batch[0]] = self._run_one(tool_calls[batch[0]], input_type, config_list[batch[0]])
+                    continue
+                results = executor.map(
+                    self._run_one,
+                    [tool_calls[i] for i in batch],
+                    [input_type] * len(batch),
+                    [config_list[i] for i in batch],
+                )
+                for index, output in zip(batch, results):
+                    outputs[index] = output
+        return self._combine_tool_outputs(outputs, input_type)
+
+    async def _afunc(self, input: Any, config: RunnableConfig, *, store: Optional[BaseStore]) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        outputs: list = [None] * len(tool_calls)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(call: dict) -> Any:
+            async with semaphore:
+                return await self._arun_one(call, input_type, config)
+
+        for batch in self.batches(tool_calls):
+            results = await asyncio.gather(*(run(tool_calls[i]) for i in batch))
+            for index, output in zip(batch, results):
+                outputs[index] = output
+        return self._combine_tool_outputs(outputs, input_type)
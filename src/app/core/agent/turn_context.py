@@ -0,0 +1,245 @@
+"""
+Per-turn context of the chat being processed.
+
+The tools used to look up the chat, its user and its property from
+state["chat_id"] on their own, so one turn read the same documents several
+times. The TurnContext loads each entity at most once per turn and is passed
+to the agents and tools through the graph state. Tools that write drop the
+entities they changed so the next read sees the new data.
+
+Only chat_id and turn_id (the inbound message the turn answers, which keys
+the turn's outbound messages) are model fields: the cached entities are private attributes,
+so the context is never serialised with the state. Tool calls of the same
+step run concurrently and share the context: each entity is loaded by one
+of them while the others wait for it.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from pydantic import BaseModel, PrivateAttr
+from pymongo.database import Database
+
+from src.app.config import settings
+from src.app.core.crud.chat_crud import ChatCRUD
+from src.app.core.crud.property_crud import PropertyCRUD
+from src.app.core.crud.user_crud import UserCRUD
+from src.app.core.database import get_db
+from src.app.models.business_stage import BuyerStage, SellerStage
+from src.app.models.chat import Chat
+from src.app.models.property import Property
+from src.app.models.user import User
+
+
+class TurnContext(BaseModel):
+    """Chat, user, property and stage of a turn, each read from the database at most once"""
+
+    chat_id: str
+    turn_id: Optional[str] = None
+
+    _db: Optional[Database] = PrivateAttr(default=None)
+    _cache: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _reads: int = PrivateAttr(default=0)
+    _hits: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _key_locks: Dict[str, threading.Lock] = PrivateAttr(default_factory=dict)
+
+    def __copy__(self) -> "TurnContext":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "TurnContext":
+        # Handoffs to the workers deep-copy the supervisor state, every node of the turn must share one context
+        return self
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TurnContext":
+        """Get the turn context of the graph state, or a new one if the state has none"""
+        turn = state.get("turn")
+        if isinstance(turn, TurnContext):
+            return turn
+        return cls(chat_id=state.get("chat_id") or "")
+
+    @property
+    def db(self) -> Database:
+        with self._lock:
+            if self._db is None:
+                self._db = get_db()
+            return self._db
+
+    def _cached(self, key: str) -> tuple:
+        with self._lock:
+            if key in self._cache:
+                self._hits += 1
+                return True, self._cache[key]
+            return False, None
+
+    def _get(self, key: str, loader: Callable[[], Any]) -> Any:
+        found, value = self._cached(key)
+        if found:
+            return value
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            found, value = self._cached(key)
+            if found:
+                return value
+            value = loader()
+            with self._lock:
+                self._reads += 1
+                self._cache[key] = value
+        return value
+
+    def prime(
+        self,
+        chat: Optional[Chat] = None,
+        user: Optional[User] = None,
+        entries: Optional[Dict[str, Any]] = None,
+    ) -> "TurnContext":
+        """Seed the context with entities the pipeline already loaded (entries: a snapshot of another context)"""
+        with self._lock:
+            if entries:
+                self._cache.update(entries)
+            if chat is not None:
+                self._cache["chat"] = chat
+            if user is not None:
+                self._cache["user"] = user
+        return self
+
+    @property
+    def chat(self) -> Optional[Chat]:
+        return self._get("chat", lambda: ChatCRUD(self.db).get_chat_by_id(self.chat_id))
+
+    @property
+    def user(self) -> Optional[User]:
+        """User of the chat"""
+        chat = self.chat
+        if not chat or not chat.user_phone:
+            return None
+        return self._get("user", lambda: UserCRUD(self.db).get_user_by_phone(chat.user_phone))
+
+    @property
+    def owned_property_id(self) -> Optional[str]:
+        """Property owned by the user of the chat (sellers have one property for now)"""
+        user = self.user
+        if not user:
+            return None
+
+        def load() -> Optional[str]:
+            property_doc = self.db.properties.find_one({"owner_id": user.id}, {"_id": 1})
+            return str(property_doc["_id"]) if property_doc else None
+        return self._get("owned_property_id", load)
+
+    def get_property(self, property_id: Optional[str]) -> Optional[Property]:
+        """Property by ID"""
+        if not property_id:
+            return None
+        return self._get(f"property:{property_id}", lambda: PropertyCRUD(self.db).get_property_by_id(property_id))
+
+    @property
+    def owned_property(self) -> Optional[Property]:
+        return self.get_property(self.owned_property_id)
+
+    @property
+    def linked_property(self) -> Optional[Property]:
+        """Property linked to the chat (the one a buyer asks about)"""
+        chat = self.chat
+        return self.get_property(chat.property_id if chat else None)
+
+    @property
+    def seller_stage(self) -> SellerStage:
+        linked_property = self.linked_property
+        return linked_property.business_stage if linked_property else SellerStage.REGISTRATION
+
+    @property
+    def buyer_stage(self) -> Optional[BuyerStage]:
+        chat = self.chat
+        return chat.business_stage if chat else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Entities loaded so far, to prime another context with"""
+        with self._lock:
+            return dict(self._cache)
+
+    def invalidate(self, *names: str) -> None:
+        """
+        Drop cached entities after a write, all of them if no name is given.
+        The entities warmed for the chat's next turn are dropped too.
+
+        Args:
+            names: "chat", "user", "owned_property_id" or "property" (every property)
+        """
+        warm_entities.discard(self.chat_id)
+        with self._lock:
+            if not names:
+                self._cache.clear()
+                return
+            for key in list(self._cache):
+                if key in names or ("property" in names and key.startswith("property:")):
+                    del self._cache[key]
+
+    def stats(self) -> Dict[str, int]:
+        """Database reads done and reads served from the context during the turn"""
+        with self._lock:
+            return {"reads": self._reads, "hits": self._hits}
+
+
+class WarmEntities:
+    """
+    Entities of chats loaded ahead of their next turn (after a stage
+    transition). Each snapshot is used once and expires after
+    STAGE_WARM_TTL seconds; a write through the chat's turn context while
+    it is being loaded or waiting drops it.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}
+        self._loading: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, chat_id: str) -> object:
+        """Start loading a chat's entities, returns the token to store them with"""
+        token = object()
+        with self._lock:
+            self._loading[chat_id] = token
+        return token
+
+    def put(self, chat_id: str, entries: Dict[str, Any], token: object) -> bool:
+        """
+        Store the entities loaded for a chat's next turn.
+
+        Args:
+            chat_id: Chat ID
+            entries: Snapshot of a turn context
+            token: Token returned by begin
+
+        Returns:
+            bool: False if the chat was written to (or loaded again) since begin, the snapshot is discarded
+        """
+        with self._lock:
+            if self._loading.get(chat_id) is not token:
+                return False
+            del self._loading[chat_id]
+            now = time.monotonic()
+            # Chats that never came back
+            for key in [key for key, (loaded_at, _) in self._entries.items() if now - loaded_at > settings.STAGE_WARM_TTL]:
+                del self._entries[key]
+            self._entries[chat_id] = (now, entries)
+            return True
+
+    def pop(self, chat_id: str) -> Dict[str, Any]:
+        """Entities warmed for the chat, empty if there are none or they expired"""
+        with self._lock:
+            loaded_at, entries = self._entries.pop(chat_id, (0, {}))
+        if time.monotonic() - loaded_at > settings.STAGE_WARM_TTL:
+            return {}
+        return entries
+
+    def discard(self, chat_id: str) -> None:
+        """Drop the chat's warmed entities, and any snapshot being loaded"""
+        with self._lock:
+            self._entries.pop(chat_id, None)
+            self._loading.pop(chat_id, None)
+
+
+warm_entities = WarmEntities()
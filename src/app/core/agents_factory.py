@@ -1,49 +1,82 @@
+import asyncio
+import time
+
 from src.app.core.agent.main import Agent
 from src.app.core.agent.seller.register import RegisterAgent
 from src.app.core.agent.seller.publisher import PublisherAgent
 from src.app.core.agent.seller.visits import VisitsAgent
 from src.app.core.agent.seller.completed_deal import CompletedDealAgent
 from src.app.core.agent.buyer.scheduler import SchedulerAgent
+from src.app.core.agent.turn_context import TurnContext, warm_entities
+from src.app.core.stage_events import StageTransition, stage_events
 from src.app.services.stage_service import StageService
 from src.app.models.business_stage import SellerStage, BuyerStage
+from src.app.models.chat import RoutingContext
 from src.app.utils.logger import logger
+from src.app.utils.metrics import metrics
+
+
+SELLER_AGENTS = {
+    SellerStage.REGISTRATION: RegisterAgent,
+    SellerStage.PUBLISHING: PublisherAgent,
+    SellerStage.VISITS: VisitsAgent,
+    SellerStage.COMPLETED: CompletedDealAgent
+}
+
+BUYER_AGENTS = {
+    BuyerStage.CONTACT: SchedulerAgent,
+    BuyerStage.QUALIFICATION: SchedulerAgent,
+    BuyerStage.SCHEDULING: SchedulerAgent,
+    BuyerStage.FOLLOW_UP: SchedulerAgent
+}
 
 
 class AgentsFactory:
+    @staticmethod
+    def get_routing_context(context: dict) -> RoutingContext:
+        """
+        Gets the routing context of the chat, reading it from the chat document
+        only when it was not already resolved for this context.
+        """
+        if context.get("routing") is None:
+            context["routing"] = StageService().get_routing_context(context.get("chat_id"))
+        return context["routing"]
+
+    @staticmethod
+    async def aget_routing_context(context: dict) -> RoutingContext:
+        """
+        Async version of get_routing_context: the chat document is read in a worker thread.
+        """
+        if context.get("routing") is None:
+            context["routing"] = await asyncio.to_thread(
+                lambda: StageService().get_routing_context(context.get("chat_id"))
+            )
+        return context["routing"]
+
     @staticmethod
     def seller_agent(context: dict) -> Agent:
         """
         Defines rules to get a specific agent for a seller.
         """
-        chat_id = context.get("chat_id")
-        
-        stage_service = StageService()
-        property_stage = stage_service.get_seller_stage(chat_id)
-        mapped_stage = {
-            SellerStage.REGISTRATION: RegisterAgent,
-            SellerStage.PUBLISHING: PublisherAgent,
-            SellerStage.VISITS: VisitsAgent,
-            SellerStage.COMPLETED: CompletedDealAgent
-        }
-        return mapped_stage.get(property_stage, RegisterAgent)()
+        routing = AgentsFactory.get_routing_context(context)
+        return AgentsFactory.agent_for_stage("seller", routing.seller_stage)
 
     @staticmethod
     def buyer_agent(context: dict) -> Agent:
         """
         Defines rules to get a specific agent for a buyer.
         """
-        chat_id = context.get("chat_id")
-        
-        stage_service = StageService()
-        buyer_stage = stage_service.get_buyer_stage(chat_id)
-        
-        mapped_stage = {
-            BuyerStage.CONTACT: SchedulerAgent,
-            BuyerStage.QUALIFICATION: SchedulerAgent,
-            BuyerStage.SCHEDULING: SchedulerAgent,
-            BuyerStage.FOLLOW_UP: SchedulerAgent
-        }
-        return mapped_stage.get(buyer_stage, SchedulerAgent)()
+        routing = AgentsFactory.get_routing_context(context)
+        return AgentsFactory.agent_for_stage("buyer", routing.buyer_stage)
+
+    @staticmethod
+    def agent_for_stage(user_type: str, stage) -> Agent:
+        """
+        Gets the agent handling a business stage.
+        """
+        if user_type == "seller":
+            return SELLER_AGENTS.get(stage or SellerStage.REGISTRATION, RegisterAgent)()
+        return BUYER_AGENTS.get(stage, SchedulerAgent)()
 
     @staticmethod
     def get_agent(user_type: str, context: dict = None) -> Agent:
@@ -60,3 +93,46 @@ class AgentsFactory:
             return AgentsFactory.buyer_agent(context)
         else:
             raise ValueError(f"Invalid user type: {user_type}")
+
+    @staticmethod
+    async def aget_agent(user_type: str, context: dict = None) -> Agent:
+        """
+        Async version of get_agent, for the webhook.
+        """
+        if context is None:
+            context = {}
+        await AgentsFactory.aget_routing_context(context)
+        return AgentsFactory.get_agent(user_type, context)
+
+    @staticmethod
+    def warm_stage(event: StageTransition) -> None:
+        """
+        Prepares the chat's next turn after a stage transition: compiles the
+        graphs of the new stage's agent (default model profile) and loads the
+        chat's entities for the next turn's context.
+        """
+        start = time.perf_counter()
+        token = warm_entities.begin(event.chat_id)
+        try:
+            agent = AgentsFactory.agent_for_stage(event.role, event.stage)
+            if agent.uses_direct_mode():
+                agent.get_workers()
+            else:
+                agent.get_supervisor()
+
+            turn = TurnContext(chat_id=event.chat_id)
+            turn.user
+            if event.role == "seller":
+                turn.owned_property
+            else:
+                turn.linked_property
+        except Exception:
+            warm_entities.discard(event.chat_id)
+            raise
+        stored = warm_entities.put(event.chat_id, turn.snapshot(), token)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        metrics.observe("stage.warm_ms", elapsed_ms, role=event.role, stage=event.stage.value)
+        logger.info(f"Warmed {type(agent).__name__} for chat {event.chat_id} in {elapsed_ms:.1f}ms (entities kept: {stored})")
+
+
+stage_events.subscribe(AgentsFactory.warm_stage)
@@ -0,0 +1,208 @@
+"""
+Per-property answer cache for repeated buyer questions.
+
+Buyers coming from the same flyer ask the same handful of questions about the
+same property ("¿cuánto cuesta?", "¿dónde queda?", "¿qué amenidades tiene?").
+Once the agent has answered one of those fact questions, the same question
+from other buyers of the property is answered from the cache without running
+the agent.
+
+The cached answer is never the agent's reply, which may be personalised (the
+buyer's name, their situation): it is a template filled from the fields of
+the Property, one per fact type. A question is only cacheable when all its
+content words (stopwords aside) belong to a single fact type, and a lookup
+only hits when the content words are the same as those of the cached
+question, so "¿cuánto cuesta con descuento?" never gets the answer to
+"¿cuánto cuesta el apartamento?".
+
+Entries of a property are dropped whenever the property is updated
+(PropertyCRUD.update_property_partial). The cache lives in the process, so
+with several API workers each keeps (and invalidates) its own copy.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+
+from ..config import settings
+from ..models.property import Property
+from ..utils.logger import logger
+from ..utils.metrics import metrics
+from ..utils.text import normalize_text
+
+
+def _format_value(value: float) -> str:
+    # Colombian format, dots between thousands
+    return f"${value:,.0f}".replace(",", ".")
+
+
+def _join(items) -> str:
+    items = [str(item) for item in items if item]
+    return ", ".join(items[:-1]) + f" y {items[-1]}" if len(items) > 1 else "".join(items)
+
+
+# Words of the questions about each fact of the property, the same for every buyer
+FACT_WORDS: Dict[str, FrozenSet[str]] = {
+    fact: frozenset(words.split())
+    for fact, words in {
+        "price": "cuanto precio valor cuesta vale costo",
+        "location": "donde direccion ubicacion ubicada ubicado queda",
+        "type": "tipo casa apartamento",
+        "amenities": "amenidades comodidades",
+        "nearby": "cerca alrededores",
+        "description": "descripcion caracteristicas",
+    }.items()
+}
+
+# Answer of each fact type, built from the property (None if the property does not have the field)
+FACT_ANSWERS: Dict[str, Callable[[Property], Optional[str]]] = {
+    "price": lambda p: f"El precio de la propiedad es {_format_value(p.value)}." if p.value else None,
+    "location": lambda p: f"La propiedad está ubicada en {p.address}." if p.address else None,
+    "type": lambda p: f"La propiedad es de tipo {p.type}." if p.type else None,
+    "amenities": lambda p: f"La propiedad cuenta con {_join(p.amenities)}." if p.amenities else None,
+    "nearby": lambda p: f"Cerca de la propiedad hay {_join(p.nearby_places)}." if p.nearby_places else None,
+    "description": lambda p: p.description or None,
+}
+
+# Words naming the property, allowed in a question about any fact ("¿dónde queda el apartamento?")
+SUBJECT_WORDS = frozenset("casa apartamento apto propiedad inmueble".split())
+
+# Anything personal or about scheduling depends on the conversation, never cached
+PERSONAL_QUESTION_PATTERN = re.compile(
+    r"\b(visita|visitar|agendar|agenda|cita|horario|disponible|disponibilidad|hoy|manana|lunes|martes|"
+    r"miercoles|jueves|viernes|sabado|domingo|mi|nombre|correo|cancelar|reprogramar)\b"
+)
+
+# Words that do not change what is being asked
+STOPWORDS = frozenset(
+    "el la los las un una de del que es son hay tiene tienen y o a en por favor esta este esa ese "
+    "hola buenas buenos dias tardes noches porfa me puedes decir saber quisiera".split()
+)
+
+MAX_QUESTION_WORDS = 12
+
+
+def content_tokens(text: str) -> FrozenSet[str]:
+    """Words of a question that are not stopwords"""
+    return frozenset(word for word in normalize_text(text).split() if word not in STOPWORDS)
+
+
+def fact_type(text: str) -> Optional[str]:
+    """
+    Fact of the property a buyer message asks about.
+
+    Args:
+        text: Buyer message
+
+    Returns:
+        Optional[str]: Key of FACT_WORDS, or None if the message is not a short
+        question about exactly one fact (or has words of no fact)
+    """
+    question = normalize_text(text)
+    if not question or len(question.split()) > MAX_QUESTION_WORDS:
+        return None
+    if PERSONAL_QUESTION_PATTERN.search(question):
+        return None
+    tokens = content_tokens(question)
+    facts = [fact for fact, words in FACT_WORDS.items() if tokens & (words - SUBJECT_WORDS)]
+    if not facts and tokens & FACT_WORDS["type"]:
+        # Only words naming the property: "¿es casa o apartamento?"
+        facts = ["type"]
+    if len(facts) != 1:
+        return None
+    if tokens - FACT_WORDS[facts[0]] - SUBJECT_WORDS:
+        return None
+    return facts[0]
+
+
+def is_cacheable_question(text: str) -> bool:
+    """Whether a buyer message is a short question about a fact of the property"""
+    return fact_type(text) is not None
+
+
+class AnswerCache:
+    """Per-property cache of answers to fact questions"""
+
+    def __init__(
+        self,
+        max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl: float = settings.ANSWER_CACHE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Per property: content tokens of the question -> (answer, stored at), oldest first
+        self._properties: Dict[str, OrderedDict[FrozenSet[str], Tuple[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, property_id: str, question: str) -> Optional[str]:
+        """
+        Find the cached answer to the same question.
+
+        Args:
+            property_id: Property the question is about
+            question: Buyer question
+
+        Returns:
+            Optional[str]: Cached answer, or None on a miss
+        """
+        if not property_id or not is_cacheable_question(question):
+            return None
+
+        tokens = content_tokens(question)
+        with self._lock:
+            entry = self._properties.get(property_id, {}).get(tokens)
+
+        if entry is None or (self.ttl and time.time() - entry[1] > self.ttl):
+            metrics.incr("answer_cache.miss")
+            return None
+
+        metrics.incr("answer_cache.hit")
+        logger.info(f"Answer cache hit for property {property_id}")
+        return entry[0]
+
+    def store(self, property_id: str, question: str, property_obj: Optional[Property]) -> bool:
+        """
+        Cache the answer to a question, built from the property, if the question is cacheable.
+
+        Args:
+            property_id: Property the question is about
+            question: Buyer question
+            property_obj: The property, its fields fill the answer
+
+        Returns:
+            bool: True if the answer was cached
+        """
+        fact = fact_type(question)
+        tokens = content_tokens(question)
+        # Questions of only stopwords would match any other such question
+        if not property_id or property_obj is None or fact is None or not tokens:
+            return False
+        answer = FACT_ANSWERS[fact](property_obj)
+        if not answer:
+            return False
+
+        with self._lock:
+            entries = self._properties.setdefault(property_id, OrderedDict())
+            entries.pop(tokens, None)
+            if len(entries) >= self.max_entries:
+                # Drop the oldest entry
+                entries.popitem(last=False)
+            entries[tokens] = (answer, time.time())
+        return True
+
+    def invalidate(self, property_id: str) -> None:
+        """Drop every cached answer of a property"""
+        with self._lock:
+            removed = self._properties.pop(str(property_id), None)
+        if removed is not None:
+            logger.info(f"Answer cache invalidated for property {property_id}")
+
+    def clear(self) -> None:
+        """Drop every cached answer"""
+        with self._lock:
+            self._properties.clear()
+
+
+answer_cache = AnswerCache()
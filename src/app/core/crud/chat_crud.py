@@ -1,19 +1,57 @@
 from typing import List, Optional, Dict, Any
 from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime
 
-from ...models import Chat
+from ...models import Chat, RoutingContext, ConversationSummary, ChatUsage, TurnUsage
 from ...models.business_stage import BuyerStage
 from ...utils.logger import logger
 
 
+def usage_increments(usage: TurnUsage) -> Dict[str, Any]:
+    """
+    Build the $inc of a turn's usage on the chat totals and on its stage totals
+    """
+    increments = {"usage.turns": 1}
+    stage = usage.stage or "unknown"
+    for field in ("calls", "input_tokens", "cached_input_tokens", "output_tokens", "units", "latency_ms", "cost_usd"):
+        increments[f"usage.{field}"] = getattr(usage, field)
+        increments[f"usage.stages.{stage}.{field}"] = getattr(usage, field)
+    return increments
+
+
 class ChatCRUD:
     """CRUD operations for Chat collection"""
     
     def __init__(self, db: Database):
         self.collection = db.chats
     
+    @staticmethod
+    def _routing_from_doc(chat_doc: Dict[str, Any]) -> Optional[RoutingContext]:
+        """Build the routing context stored in a chat document, if any"""
+        routing = chat_doc.get("routing")
+        if not routing:
+            return None
+        return RoutingContext(**routing)
+    
+    @classmethod
+    def _chat_from_doc(cls, chat_doc: Dict[str, Any]) -> Chat:
+        """Build a Chat with every stored field, the turn context serves it to the tools"""
+        return Chat(
+            id=str(chat_doc["_id"]),
+            user_id=chat_doc["user_id"],
+            user_phone=chat_doc.get("user_phone"),
+            property_id=chat_doc.get("property_id"),
+            business_stage=BuyerStage(chat_doc["business_stage"]) if chat_doc.get("business_stage") else None,
+            routing=cls._routing_from_doc(chat_doc),
+            summary=ConversationSummary(**chat_doc["summary"]) if chat_doc.get("summary") else None,
+            usage=ChatUsage(**chat_doc["usage"]) if chat_doc.get("usage") else None,
+            created_at=chat_doc["created_at"],
+            updated_at=chat_doc.get("updated_at"),
+            is_active=chat_doc.get("is_active", True)
+        )
+    
     def get_or_create_chat(self, user_phone: str) -> Chat:
         """
         Get existing chat or create new one for a user by phone number
@@ -24,13 +62,7 @@ class ChatCRUD:
         
         if chat_doc:
             # Return existing chat
-            return Chat(
-                id=str(chat_doc["_id"]),
-                user_id=chat_doc["user_id"],
-                user_phone=chat_doc.get("user_phone"),
-                created_at=chat_doc["created_at"],
-                is_active=chat_doc.get("is_active", True)
-            )
+            return self._chat_from_doc(chat_doc)
         else:
             # Create new chat
             chat_data = {
@@ -79,13 +111,7 @@ class ChatCRUD:
         chat_doc = self.collection.find_one({"user_phone": user_phone})
         
         if chat_doc:
-            return Chat(
-                id=str(chat_doc["_id"]),
-                user_id=chat_doc["user_id"],
-                user_phone=chat_doc.get("user_phone"),
-                created_at=chat_doc["created_at"],
-                is_active=chat_doc.get("is_active", True)
-            )
+            return self._chat_from_doc(chat_doc)
         
         return None
     
@@ -102,10 +128,115 @@ class ChatCRUD:
         logger.info(f"Updating chat stage for chat {chat_id} to {new_stage}")
         result = self.collection.update_one(
             {"_id": ObjectId(chat_id)},
-            {"$set": {"business_stage": new_stage.value}}
+            {
+                "$set": {"business_stage": new_stage.value, "routing.buyer_stage": new_stage.value},
+                "$inc": {"routing.version": 1}
+            }
         )
         return result.modified_count > 0
     
+    def update_summary(self, chat_id: str, text: str, message_count: int) -> bool:
+        """
+        Store the rolling summary of a chat, unless a summary covering
+        at least as many messages was already stored
+        
+        Args:
+            chat_id: Chat ID
+            text: Summary text
+            message_count: Number of messages folded into the summary
+            
+        Returns:
+            bool: True if updated successfully, False otherwise
+        """
+        logger.info(f"Updating summary for chat {chat_id} ({message_count} messages)")
+        try:
+            result = self.collection.update_one(
+                {
+                    "_id": ObjectId(chat_id),
+                    "$or": [
+                        {"summary.message_count": {"$lt": message_count}},
+                        {"summary": {"$exists": False}}
+                    ]
+                },
+                {"$set": {"summary": {
+                    "text": text,
+                    "message_count": message_count,
+                    "updated_at": datetime.utcnow()
+                }}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error updating chat summary: {e}")
+            return False
+    
+    def add_usage(self, chat_id: str, usage: TurnUsage) -> bool:
+        """
+        Add the model usage of a turn to the chat totals and to its stage totals
+        
+        Args:
+            chat_id: Chat ID
+            usage: Usage of the turn
+            
+        Returns:
+            bool: True if updated successfully, False otherwise
+        """
+        logger.info(f"Adding usage to chat {chat_id}: {usage.calls} calls, ${usage.cost_usd:.4f}")
+        try:
+            result = self.collection.update_one(
+                {"_id": ObjectId(chat_id)},
+                {"$inc": usage_increments(usage)}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error adding chat usage: {e}")
+            return False
+    
+    def get_routing_context(self, chat_id: str) -> Optional[RoutingContext]:
+        """
+        Get the denormalised routing context of a chat with a single _id lookup
+        
+        Args:
+            chat_id: Chat ID
+            
+        Returns:
+            Optional[RoutingContext]: Routing context if the chat has one, None otherwise
+        """
+        logger.info(f"Getting routing context for chat {chat_id}")
+        chat_doc = self.collection.find_one({"_id": ObjectId(chat_id)}, {"routing": 1})
+        if not chat_doc:
+            return None
+        return self._routing_from_doc(chat_doc)
+    
+    def update_routing_context(self, chat_id: str, **fields: Any) -> bool:
+        """
+        Update some fields of the routing context and bump its version
+        
+        Args:
+            chat_id: Chat ID
+            fields: Routing fields to set (role, property_id, seller_stage, buyer_stage)
+            
+        Returns:
+            bool: True if updated successfully, False otherwise
+        """
+        logger.info(f"Updating routing context for chat {chat_id} with {fields}")
+        update = {
+            f"routing.{key}": value.value if hasattr(value, "value") else value
+            for key, value in fields.items()
+            if key in RoutingContext.model_fields and key != "version"
+        }
+        if not update:
+            return False
+        
+        try:
+            result = self.collection.update_one(
+                {"_id": ObjectId(chat_id)},
+                {"$set": update, "$inc": {"routing.version": 1}}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error updating routing context: {e}")
+            return False
+    
     def get_chat_by_id(self, chat_id: str) -> Optional[Chat]:
         """
         Get chat by ID
@@ -121,14 +252,7 @@ class ChatCRUD:
             chat_doc = self.collection.find_one({"_id": ObjectId(chat_id)})
             
             if chat_doc:
-                return Chat(
-                    id=str(chat_doc["_id"]),
-                    user_id=chat_doc["user_id"],
-                    property_id=chat_doc.get("property_id"),
-                    user_phone=chat_doc.get("user_phone"),
-                    created_at=chat_doc["created_at"],
-                    is_active=chat_doc.get("is_active", True)
-                )
+                return self._chat_from_doc(chat_doc)
             
             return None
         except Exception as e:
@@ -167,4 +291,26 @@ class ChatCRUD:
             return result.modified_count > 0
         except Exception as e:
             print(f"Error updating chat: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+class AsyncChatCRUD:
+    """Async (motor) CRUD operations for Chat collection, used by the webhook"""
+    
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db.chats
+    
+    async def add_usage(self, chat_id: str, usage: TurnUsage) -> bool:
+        """
+        Add the model usage of a turn to the chat totals and to its stage totals
+        """
+        logger.info(f"Adding usage to chat {chat_id}: {usage.calls} calls, ${usage.cost_usd:.4f}")
+        try:
+            result = await self.collection.update_one(
+                {"_id": ObjectId(chat_id)},
+                {"$inc": usage_increments(usage)}
+            )
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Error adding chat usage: {e}")
+            return False
@@ -1,5 +1,6 @@
 from typing import List, Optional, Dict, Any
 from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime
 
@@ -7,6 +8,50 @@ from ...models import Message, MessageType, MessageSender
 from ...utils.logger import logger
 
 
+def build_user_message(chat_id: str, processed_message: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the message document of an inbound user message
+    """
+    # Determine message type
+    content_type = processed_message.get("type", "text").lower()
+    if content_type == "text":
+        message_type = MessageType.TEXT
+        content = processed_message.get("content", {}).get("text", "")
+    elif content_type == "image":
+        message_type = MessageType.IMAGE
+        content = processed_message.get("content", {}).get("url", "")
+    elif content_type == "audio":
+        message_type = MessageType.AUDIO
+        content = processed_message.get("content", {}).get("url", "")
+    else:
+        message_type = MessageType.TEXT
+        content = str(processed_message.get("content", {}))
+    
+    # Create message document
+    return {
+        "chat_id": chat_id,
+        "sender": MessageSender.USER.value,
+        "type": message_type.value,
+        "content": content,
+        "timestamp": datetime.utcnow()
+    }
+
+
+def to_message(doc: Dict[str, Any]) -> Message:
+    """
+    Convert a message document to a Message object
+    """
+    return Message(
+        id=str(doc["_id"]),
+        chat_id=doc["chat_id"],
+        sender=MessageSender(doc["sender"]),
+        type=MessageType(doc["type"]),
+        content=doc["content"],
+        timestamp=doc["timestamp"],
+        usage=doc.get("usage")
+    )
+
+
 class MessageCRUD:
     """CRUD operations for Message collection"""
     
@@ -18,44 +63,13 @@ class MessageCRUD:
         Add message to MongoDB
         """
         logger.info(f"Adding message to chat {chat_id}")
-        # Determine message type
-        content_type = processed_message.get("type", "text").lower()
-        if content_type == "text":
-            message_type = MessageType.TEXT
-            content = processed_message.get("content", {}).get("text", "")
-        elif content_type == "image":
-            message_type = MessageType.IMAGE
-            content = processed_message.get("content", {}).get("url", "")
-        elif content_type == "audio":
-            message_type = MessageType.AUDIO
-            content = processed_message.get("content", {}).get("url", "")
-        else:
-            message_type = MessageType.TEXT
-            content = str(processed_message.get("content", {}))
-        
-        # Create message document
-        message_doc = {
-            "chat_id": chat_id,
-            "sender": MessageSender.USER.value,
-            "type": message_type.value,
-            "content": content,
-            "timestamp": datetime.utcnow()
-        }
+        message_doc = build_user_message(chat_id, processed_message)
         
         # Insert into MongoDB
         result = self.collection.insert_one(message_doc)
         
         # Return Message object with generated ID
-        message = Message(
-            id=str(result.inserted_id),
-            chat_id=chat_id,
-            sender=MessageSender.USER,
-            type=message_type,
-            content=content,
-            timestamp=message_doc["timestamp"]
-        )
-        
-        return message
+        return to_message({**message_doc, "_id": result.inserted_id})
     
     def get_messages_by_chat(self, chat_id: str) -> List[Message]:
         """
@@ -68,16 +82,69 @@ class MessageCRUD:
         ).sort("timestamp", 1)  # Sort by timestamp ascending
         
         # Convert documents to Message objects
-        messages = []
-        for doc in message_docs:
-            message = Message(
-                id=str(doc["_id"]),
-                chat_id=doc["chat_id"],
-                sender=MessageSender(doc["sender"]),
-                type=MessageType(doc["type"]),
-                content=doc["content"],
-                timestamp=doc["timestamp"]
-            )
-            messages.append(message)
+        return [to_message(doc) for doc in message_docs]
+    
+    def get_usage_by_stage(self, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Aggregate the model usage stored on agent replies per business stage
+        
+        Args:
+            since: Only count replies sent after this date
+            
+        Returns:
+            List[Dict[str, Any]]: One row per stage with turns, calls, tokens (cached ones too), latency and cost
+        """
+        logger.info(f"Aggregating usage by stage since {since}")
+        match: Dict[str, Any] = {"usage": {"$exists": True}}
+        if since:
+            match["timestamp"] = {"$gte": since}
         
-        return messages
\ No newline at end of file
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": "$usage.stage",
+                "turns": {"$sum": 1},
+                "calls": {"$sum": "$usage.calls"},
+                "input_tokens": {"$sum": "$usage.input_tokens"},
+                "cached_input_tokens": {"$sum": "$usage.cached_input_tokens"},
+                "output_tokens": {"$sum": "$usage.output_tokens"},
+                "latency_ms": {"$avg": "$usage.latency_ms"},
+                "cost_usd": {"$sum": "$usage.cost_usd"},
+            }},
+            {"$sort": {"cost_usd": -1}}
+        ]
+        return [
+            {"stage": row.pop("_id") or "unknown", **row}
+            for row in self.collection.aggregate(pipeline)
+        ]
+
+
+class AsyncMessageCRUD:
+    """Async (motor) CRUD operations for Message collection, used by the webhook"""
+    
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db.messages
+    
+    async def add_message(self, chat_id: str, processed_message: Dict[str, Any]) -> Message:
+        """
+        Add message to MongoDB
+        """
+        logger.info(f"Adding message to chat {chat_id}")
+        message_doc = build_user_message(chat_id, processed_message)
+        result = await self.collection.insert_one(message_doc)
+        return to_message({**message_doc, "_id": result.inserted_id})
+    
+    async def insert_message(self, message_doc: Dict[str, Any]) -> Message:
+        """
+        Insert a complete message document (e.g. an agent reply)
+        """
+        result = await self.collection.insert_one(message_doc)
+        return to_message({**message_doc, "_id": result.inserted_id})
+    
+    async def get_messages_by_chat(self, chat_id: str) -> List[Message]:
+        """
+        Get all messages for a specific chat
+        """
+        logger.info(f"Getting messages by chat {chat_id}")
+        cursor = self.collection.find({"chat_id": chat_id}).sort("timestamp", 1)
+        return [to_message(doc) async for doc in cursor]
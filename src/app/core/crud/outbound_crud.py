@@ -0,0 +1,209 @@
+import threading
+from typing import Any, Dict, List, Set, Tuple
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+
+from ...config import settings
+from ...models.whatsapp import DeliveryStatus, OutboundMessage, StatusTransition
+from ...utils.logger import logger
+
+# Duplicate key error code of MongoDB
+DUPLICATE_KEY = 11000
+
+
+class OutboundCRUD:
+    """CRUD operations for the outbound WhatsApp message collections"""
+
+    _indexes_ready = False
+    _indexes_lock = threading.Lock()
+
+    def __init__(self, db: Database):
+        self.dead_letters = db.outbound_dead_letters
+        self.sent_keys = db.outbound_sent_keys
+        self.messages = db.outbound_messages
+
+    def ensure_indexes(self) -> None:
+        """Create the TTL indexes and the undelivered messages index once per process"""
+        if OutboundCRUD._indexes_ready:
+            return
+        with OutboundCRUD._indexes_lock:
+            if OutboundCRUD._indexes_ready:
+                return
+            ttl = int(timedelta(hours=settings.OUTBOUND_IDEMPOTENCY_TTL_HOURS).total_seconds())
+            self.sent_keys.create_index("claimed_at", expireAfterSeconds=ttl)
+            self.messages.create_index("sent_at", expireAfterSeconds=int(timedelta(days=settings.OUTBOUND_RECORD_TTL_DAYS).total_seconds()))
+            # Only the messages not delivered yet, a small share of them, for the resends
+            self.messages.create_index(
+                [("status", ASCENDING), ("sent_at", ASCENDING)],
+                name="undelivered",
+                partialFilterExpression={"status": {"$lt": int(DeliveryStatus.DELIVERED)}},
+            )
+            OutboundCRUD._indexes_ready = True
+
+    def claim_keys(self, keys: List[Tuple[str, str]]) -> Set[str]:
+        """
+        Claim the idempotency keys of messages about to be sent, in one round trip.
+        A key is claimed if no message had it, or if its claim is older than
+        OUTBOUND_IDEMPOTENCY_CLAIM_SECONDS and it was never sent.
+
+        Args:
+            keys: (key, recipient) of every message
+
+        Returns:
+            Set[str]: Keys claimed, the others belong to messages already sent or being sent
+        """
+        self.ensure_indexes()
+        now = datetime.utcnow()
+        documents = [{"_id": key, "to": to, "status": "pending", "claimed_at": now} for key, to in keys]
+        claimed = {key for key, _ in keys}
+        duplicates = []
+        try:
+            self.sent_keys.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != DUPLICATE_KEY:
+                    raise
+                duplicates.append(documents[error["index"]]["_id"])
+        stale = now - timedelta(seconds=settings.OUTBOUND_IDEMPOTENCY_CLAIM_SECONDS)
+        for key in duplicates:
+            result = self.sent_keys.update_one(
+                {"_id": key, "status": "pending", "claimed_at": {"$lt": stale}},
+                {"$set": {"claimed_at": now}},
+            )
+            if not result.modified_count:
+                claimed.discard(key)
+        return claimed
+
+    def mark_keys_sent(self, keys: List[str]) -> None:
+        """Mark claimed idempotency keys as sent, so they are never claimed again until they expire"""
+        if keys:
+            self.sent_keys.update_many({"_id": {"$in": keys}}, {"$set": {"status": "sent", "sent_at": datetime.utcnow()}})
+
+    def release_key(self, key: str) -> None:
+        """Drop the claim of a message that was not sent, so a retried turn can send it"""
+        self.sent_keys.delete_one({"_id": key, "status": "pending"})
+
+    def add_dead_letter(self, message: OutboundMessage, error: str) -> str:
+        """
+        Store a message the dispatcher gave up on
+
+        Args:
+            message: The message, with its attempts
+            error: Last error
+
+        Returns:
+            str: ID of the dead letter
+        """
+        logger.info(f"Storing dead letter for {message.to} after {message.attempts} attempts: {error}")
+        document = message.model_dump(mode="json")
+        document["error"] = error
+        document["failed_at"] = datetime.utcnow()
+        result = self.dead_letters.insert_one(document)
+        return str(result.inserted_id)
+
+    def get_dead_letters(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Latest dead letters, newest first"""
+        documents = list(self.dead_letters.find().sort("failed_at", DESCENDING).limit(limit))
+        for document in documents:
+            document["_id"] = str(document["_id"])
+        return documents
+
+    def add_records(self, sent: List[Tuple[OutboundMessage, str]]) -> None:
+        """
+        Record sent messages, to apply their delivery reports to
+
+        Args:
+            sent: (message, Infobip message ID) of every message sent
+        """
+        if not sent:
+            return
+        self.ensure_indexes()
+        now = datetime.utcnow()
+        documents = []
+        for message, message_id in sent:
+            document = message.model_dump(
+                include={"to", "kind", "content", "template_name", "language", "template_data", "chat_id", "resend_of", "resends"},
+                mode="json",
+                exclude_none=True,
+            )
+            document.update({"_id": message_id, "status": int(DeliveryStatus.SENT), "sent_at": now})
+            documents.append(document)
+        try:
+            self.messages.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # A message ID seen before (a stand-in reusing IDs) keeps its first record
+            if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+
+    def apply_transitions(self, transitions: List[StatusTransition]) -> int:
+        """
+        Apply status changes to the message records in one bulk write. The
+        status only moves up and every status keeps its own timestamp. A
+        failure reported after the message was delivered or seen is ignored,
+        so the record never carries the error of a status it does not have.
+
+        Args:
+            transitions: Status changes from delivery and seen reports
+
+        Returns:
+            int: Records the transitions were applied to
+        """
+        if not transitions:
+            return 0
+        operations = []
+        for transition in transitions:
+            query: Dict[str, Any] = {"_id": transition.message_id}
+            fields: Dict[str, Any] = {transition.status.timestamp_field: transition.at}
+            if transition.status == DeliveryStatus.FAILED:
+                query["status"] = {"$lte": int(DeliveryStatus.FAILED)}
+                fields["error_code"] = transition.error_code
+                fields["permanent"] = transition.permanent
+            operations.append(UpdateOne(
+                query,
+                {"$max": {"status": int(transition.status)}, "$set": fields},
+            ))
+        result = self.messages.bulk_write(operations, ordered=False)
+        return result.matched_count
+
+    def get_undelivered(self, since: datetime, statuses: List[DeliveryStatus], limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Messages sent since a time and still in one of the given undelivered
+        statuses (served by the undelivered index), oldest first
+
+        Args:
+            since: Earliest send time
+            statuses: SENT (no report yet) and/or FAILED
+            limit: Maximum records
+
+        Returns:
+            List[Dict[str, Any]]: The message records
+        """
+        return list(self.messages.find({
+            "status": {"$in": [int(status) for status in statuses]},
+            "sent_at": {"$gte": since},
+        }).sort("sent_at", ASCENDING).limit(limit))
+
+    def get_resendable(self, since: datetime, max_resends: int, limit: int = 100) -> List[Dict[str, Any]]:
+        """Messages sent since a time that failed to deliver for a reason that may pass, not resent yet"""
+        return list(self.messages.find({
+            "status": int(DeliveryStatus.FAILED),
+            "sent_at": {"$gte": since},
+            "permanent": {"$ne": True},
+            "resent_at": {"$exists": False},
+            "resends": {"$lt": max_resends},
+        }).sort("sent_at", ASCENDING).limit(limit))
+
+    def mark_resent(self, message_ids: List[str]) -> None:
+        """Mark undelivered messages as resent, so they are not picked again"""
+        if message_ids:
+            self.messages.update_many({"_id": {"$in": message_ids}}, {"$set": {"resent_at": datetime.utcnow()}})
+
+    def count_by_status(self, since: datetime) -> Dict[str, int]:
+        """Messages sent since a time per current status"""
+        counts = self.messages.aggregate([
+            {"$match": {"sent_at": {"$gte": since}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ])
+        return {DeliveryStatus(document["_id"]).name.lower(): document["count"] for document in counts}
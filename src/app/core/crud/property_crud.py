@@ -6,6 +6,7 @@ from bson.errors import InvalidId
 
 from ...models import Property
 from ...models.business_stage import SellerStage
+from ..answer_cache import answer_cache
 from ...utils.logger import logger
 
 
@@ -80,12 +81,16 @@ class PropertyCRUD:
             {"$set": filtered_update}
         )
         
+        # Cached answers about the property may be stale now
+        answer_cache.invalidate(property_id)
+        
         return result.modified_count > 0
     
-    def get_property_missing_fields(self, property_id: str) -> Optional[Dict[str, Any]]:
-        """Get property missing fields for progress tracking"""
+    def get_property_missing_fields(self, property_id: str, property_obj: Optional[Property] = None) -> Optional[Dict[str, Any]]:
+        """Get property missing fields for progress tracking (reads the property unless it is given)"""
         logger.info(f"Getting property missing fields for property {property_id}")
-        property_obj = self.get_property_by_id(property_id)
+        if property_obj is None:
+            property_obj = self.get_property_by_id(property_id)
         if not property_obj:
             return None
         
@@ -1,5 +1,7 @@
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -14,6 +16,19 @@ def get_db():
     client = MongoClient(MONGODB_URI, server_api=ServerApi('1'))
     return client[DATABASE_NAME]
 
+_async_client = None
+_async_client_loop = None
+
+def get_async_db() -> AsyncIOMotorDatabase:
+    """Get the async (motor) database, sharing one client and its connection pool per event loop"""
+    global _async_client, _async_client_loop
+    # Motor clients are bound to the loop they first run on
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = AsyncIOMotorClient(MONGODB_URI, server_api=ServerApi('1'))
+        _async_client_loop = loop
+    return _async_client[DATABASE_NAME]
+
 def test_connection():
     """Test MongoDB connection"""
     try:
@@ -0,0 +1,148 @@
+"""
+Rule-based fast path in front of the agents.
+
+Greetings, thanks, "sí"/"no" confirmations and emoji-only messages do not
+need the supervisor to decide anything. They are classified with compiled
+patterns and, depending on the stage of the chat:
+- answered from a template when the reply does not depend on the
+  conversation (a greeting in an ongoing chat, thanks or a positive emoji
+  that do not answer a question of the agent),
+- sent straight to the stage's worker when the worker needs the context to
+  interpret them (confirmations and the rest of emoji-only messages),
+- or left to the full agent pipeline (e.g. the first message of a chat, or
+  thanks after a question, which may decline what the agent offered).
+"""
+
+import re
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+
+from ..models.business_stage import BuyerStage, SellerStage
+from ..models.chat import RoutingContext
+from ..utils.text import is_emoji_only, normalize_text
+
+# Longest message (in words) the fast path considers
+MAX_WORDS = 6
+
+GREETING_PATTERN = re.compile(
+    r"^(hola|holi|hey|ola|saludos|buenas|buen dia|buenos dias|buenas tardes|buenas noches|que tal|que mas)"
+    r"( (a todos|broky|que tal|como estas|como vas))*$"
+)
+THANKS_PATTERN = re.compile(
+    r"^((muchas|mil|muchisimas) )?gracias( (por todo|por la informacion|por la info|muy amable|broky))*$"
+    r"|^(te agradezco|muy amable|super amable|genial gracias|perfecto gracias|ok gracias|listo gracias)$"
+)
+AFFIRMATIVE_PATTERN = re.compile(
+    r"^(si|sii+|sip|claro|claro que si|dale|ok|okay|oki|listo|de acuerdo|perfecto|correcto|exacto|"
+    r"por supuesto|va|vale|aja|si senor|si claro|si por favor|si porfa|me parece bien|esta bien)$"
+)
+NEGATIVE_PATTERN = re.compile(
+    r"^(no|nop|nel|para nada|todavia no|aun no|mejor no|no gracias|no por ahora|por ahora no|no senor)$"
+)
+POSITIVE_EMOJI = set("👍👌🙏🙌👏😊🙂😀😁😃😄❤♥💯✅🤝")
+
+
+class FastPathIntent(str, Enum):
+    GREETING = "greeting"
+    THANKS = "thanks"
+    AFFIRMATIVE = "affirmative"
+    NEGATIVE = "negative"
+    POSITIVE_EMOJI = "positive_emoji"
+    EMOJI = "emoji"
+
+
+class FastPathAction(str, Enum):
+    TEMPLATE = "template"
+    WORKER = "worker"
+    AGENT = "agent"
+
+
+class FastPathDecision(BaseModel):
+    """How a message is handled by the fast path"""
+    intent: Optional[FastPathIntent] = None
+    action: FastPathAction = FastPathAction.AGENT
+    reply: Optional[str] = None
+
+
+THANKS_REPLIES = {
+    "seller": "¡Con gusto! 😊 Si necesitas algo más con tu inmueble, aquí estoy.",
+    "buyer": "¡Con gusto! 😊 Si tienes más preguntas sobre la propiedad, escríbeme.",
+}
+
+GREETING_REPLIES = {
+    SellerStage.REGISTRATION: "¡Hola de nuevo! 👋 Sigamos con el registro de tu inmueble. ¿Me compartes la información que falta?",
+    SellerStage.PUBLISHING: "¡Hola de nuevo! 👋 Sigamos con la publicación de tu inmueble. ¿En qué te puedo ayudar?",
+    SellerStage.VISITS: "¡Hola de nuevo! 👋 ¿Quieres revisar las visitas de tu inmueble o necesitas algo más?",
+    SellerStage.COMPLETED: "¡Hola de nuevo! 👋 ¿En qué te puedo ayudar con el cierre de tu negocio?",
+    BuyerStage.CONTACT: "¡Hola de nuevo! 👋 ¿Qué te gustaría saber de la propiedad?",
+    BuyerStage.QUALIFICATION: "¡Hola de nuevo! 👋 ¿Qué te gustaría saber de la propiedad?",
+    BuyerStage.SCHEDULING: "¡Hola de nuevo! 👋 ¿Seguimos con el agendamiento de tu visita?",
+    BuyerStage.FOLLOW_UP: "¡Hola de nuevo! 👋 ¿Cómo te fue con la visita? ¿Te puedo ayudar en algo más?",
+}
+
+
+def classify(text: str) -> Optional[FastPathIntent]:
+    """
+    Classify a trivial message.
+
+    Args:
+        text: Message sent by the user
+
+    Returns:
+        Optional[FastPathIntent]: The intent, or None if the message is not trivial
+    """
+    if is_emoji_only(text):
+        if all(char in POSITIVE_EMOJI or not char.strip() or ord(char) in (0xFE0F, 0x200D) for char in text):
+            return FastPathIntent.POSITIVE_EMOJI
+        return FastPathIntent.EMOJI
+
+    message = normalize_text(text)
+    if not message or len(message.split()) > MAX_WORDS:
+        return None
+    if THANKS_PATTERN.match(message):
+        return FastPathIntent.THANKS
+    if GREETING_PATTERN.match(message):
+        return FastPathIntent.GREETING
+    if NEGATIVE_PATTERN.match(message):
+        return FastPathIntent.NEGATIVE
+    if AFFIRMATIVE_PATTERN.match(message):
+        return FastPathIntent.AFFIRMATIVE
+    return None
+
+
+def route(text: str, routing: Optional[RoutingContext], has_history: bool, awaiting_answer: bool = False) -> FastPathDecision:
+    """
+    Decide how to handle a message before selecting the agent.
+
+    Args:
+        text: Message sent by the user
+        routing: Routing context of the chat (role and stages)
+        has_history: Whether the chat had messages before this one
+        awaiting_answer: Whether the last agent message asked the user something
+
+    Returns:
+        FastPathDecision: Template reply, direct worker or full agent pipeline
+    """
+    intent = classify(text)
+    # The first message of a chat always goes through the agents, they introduce Broky
+    if intent is None or not has_history or routing is None:
+        return FastPathDecision(intent=intent)
+
+    role = routing.role or "buyer"
+    stage = routing.seller_stage if role == "seller" else routing.buyer_stage
+
+    # "Gracias" after a question may be a polite "no", the agent reads it with the conversation
+    if intent == FastPathIntent.THANKS and awaiting_answer:
+        return FastPathDecision(intent=intent)
+
+    # A 👍 after a question is a confirmation, not a thank-you
+    if intent == FastPathIntent.THANKS or (intent == FastPathIntent.POSITIVE_EMOJI and not awaiting_answer):
+        return FastPathDecision(intent=intent, action=FastPathAction.TEMPLATE, reply=THANKS_REPLIES[role])
+
+    if intent == FastPathIntent.GREETING and stage in GREETING_REPLIES:
+        return FastPathDecision(intent=intent, action=FastPathAction.TEMPLATE, reply=GREETING_REPLIES[stage])
+
+    # Confirmations only make sense with the conversation, the stage's worker handles them
+    return FastPathDecision(intent=intent, action=FastPathAction.WORKER)
@@ -0,0 +1,200 @@
+"""
+Shared chat model clients.
+
+Every configured chat model is built once per process and reused by the
+supervisors and the worker agents. All of them share one pooled, keep-alive
+HTTP client per sync/async flavour, so turns reuse open connections to the
+OpenAI API instead of doing a TCP and TLS handshake for every call.
+
+Every model reports its usage to the turn being processed (see usage.py).
+The agents get their models through route(), from the routing table of
+model_routes.py. Under the "fast" profile, used by stages breaching their
+latency SLO, routes resolve to their fallback model. Under the "economy"
+profile, used for chats over their budget, every model name resolves to the
+cheaper CHAT_BUDGET_DOWNGRADE_MODEL.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_openai import ChatOpenAI
+
+from ..config import settings
+from ..utils.logger import logger
+from .model_routes import model_router
+from .usage import usage_callback
+
+DEFAULT_PROFILE = "default"
+ECONOMY_PROFILE = "economy"
+FAST_PROFILE = "fast"
+
+_profile: ContextVar[str] = ContextVar("model_profile", default=DEFAULT_PROFILE)
+
+
+class ModelRegistry:
+    """Process-wide registry of chat models sharing pooled HTTP clients"""
+
+    def __init__(self):
+        self._models: Dict[Tuple, BaseChatModel] = {}
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
+        self._factory: Optional[Callable[..., BaseChatModel]] = None
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+        )
+
+    @staticmethod
+    def _timeout() -> httpx.Timeout:
+        return httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT)
+
+    def http_client(self) -> httpx.Client:
+        """Get the pooled sync HTTP client used for OpenAI calls"""
+        if self._http_client is None:
+            with self._lock:
+                if self._http_client is None:
+                    self._http_client = httpx.Client(limits=self._limits(), timeout=self._timeout())
+        return self._http_client
+
+    def async_http_client(self) -> httpx.AsyncClient:
+        """Get the pooled async HTTP client used for OpenAI calls"""
+        if self._async_http_client is None:
+            with self._lock:
+                if self._async_http_client is None:
+                    self._async_http_client = httpx.AsyncClient(limits=self._limits(), timeout=self._timeout())
+        return self._async_http_client
+
+    def get(self, model: str, temperature: float = 0, route: Optional[Dict[str, Any]] = None, **kwargs: Any) -> BaseChatModel:
+        """
+        Get the shared chat model for a model name, building it on first use.
+
+        Args:
+            model: OpenAI model name (e.g. "gpt-4.1")
+            temperature: Sampling temperature
+            route: Stage, intent and tier of the route the model serves, reported with its calls
+            kwargs: Extra ChatOpenAI parameters (e.g. max_tokens)
+
+        Returns:
+            BaseChatModel: The shared chat model
+        """
+        resolved = self.resolve(model)
+        if route and resolved != model:
+            route = {**route, "tier": ECONOMY_PROFILE}
+        model = resolved
+        key = (model, temperature, tuple(sorted((route or {}).items())), tuple(sorted(kwargs.items())))
+        chat_model = self._models.get(key)
+        if chat_model is not None:
+            return chat_model
+
+        # Built outside the lock (building takes the lock to get the HTTP clients), a racing build is discarded
+        factory = self._factory or self.build
+        chat_model = factory(model, temperature=temperature, **kwargs)
+        chat_model.callbacks = [*(chat_model.callbacks or []), usage_callback]
+        if route:
+            chat_model.metadata = {**(chat_model.metadata or {}), "model_route": route}
+        with self._lock:
+            chat_model = self._models.setdefault(key, chat_model)
+        return chat_model
+
+    def route(self, stage: str, intent: str, temperature: float = 0) -> BaseChatModel:
+        """
+        Get the chat model of an intent of a stage from the routing table.
+
+        Args:
+            stage: Route stage of the agent (e.g. "seller:registration")
+            intent: "supervisor" or the worker's name
+            temperature: Sampling temperature
+
+        Returns:
+            BaseChatModel: The shared chat model of the route under the current profile
+        """
+        model_route = model_router.route(stage, intent)
+        if _profile.get() == FAST_PROFILE and model_route.fallback:
+            model, tier = model_route.fallback, "fallback"
+        else:
+            model, tier = model_route.model, "primary"
+        return self.get(
+            model,
+            temperature,
+            route={"stage": stage, "intent": intent, "tier": tier},
+            **model_route.model_kwargs(),
+        )
+
+    @staticmethod
+    def resolve(model: str) -> str:
+        """Model actually used for a model name under the current profile"""
+        if _profile.get() == ECONOMY_PROFILE:
+            return settings.CHAT_BUDGET_DOWNGRADE_MODEL
+        return model
+
+    @contextmanager
+    def use_profile(self, profile: Optional[str]) -> Iterator[None]:
+        """
+        Resolve the models got inside the block with a model profile.
+
+        Args:
+            profile: "default", "fast" or "economy"
+        """
+        token = _profile.set(profile or DEFAULT_PROFILE)
+        try:
+            yield
+        finally:
+            _profile.reset(token)
+
+    def build(self, model: str, temperature: float = 0, **kwargs: Any) -> BaseChatModel:
+        """Build a new ChatOpenAI model on the pooled clients, bypassing the cache and any override"""
+        logger.info(f"Building chat model {model} (temperature={temperature}, {kwargs})")
+        if settings.OPENAI_API_KEY:
+            kwargs.setdefault("api_key", settings.OPENAI_API_KEY)
+        if settings.OPENAI_BASE_URL:
+            kwargs.setdefault("base_url", settings.OPENAI_BASE_URL)
+        timeout = kwargs.pop("timeout", None)
+        return ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            timeout=httpx.Timeout(timeout, connect=settings.OPENAI_CONNECT_TIMEOUT) if timeout else self._timeout(),
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            http_client=self.http_client(),
+            http_async_client=self.async_http_client(),
+            **kwargs,
+        )
+
+    def override(self, factory: Optional[Callable[..., BaseChatModel]]) -> None:
+        """
+        Build the chat models with another factory (e.g. a recording or
+        replaying model for the devtools harness), or restore the default
+        one with None. Drops the cached models; graphs already compiled keep
+        the models they were built with, so clear them too.
+
+        Args:
+            factory: Callable taking (model, temperature=..., **kwargs)
+        """
+        with self._lock:
+            self._factory = factory
+            self._models.clear()
+
+    def close(self) -> None:
+        """Close the pooled sync HTTP client and drop the cached models"""
+        with self._lock:
+            self._models.clear()
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+
+    async def aclose(self) -> None:
+        """Close the pooled async HTTP client"""
+        if self._async_http_client is not None:
+            await self._async_http_client.aclose()
+            self._async_http_client = None
+
+
+model_registry = ModelRegistry()
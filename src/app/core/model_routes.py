@@ -0,0 +1,185 @@
+"""
+Stage-aware model routing.
+
+The model each agent calls comes from a routing table
+(resources/model_routes.json, or MODEL_ROUTES_PATH). Each stage has routes
+per intent: "supervisor" or a worker's name, with "*" matching any intent
+of the stage. A route sets the model, its max tokens and timeout, and the
+faster model to fall back to. Seller agents route by their stage
+("seller:registration", ...); the buyer stages share the SchedulerAgent and
+its "buyer" routes.
+
+A stage may set a p95 latency SLO (slo_p95_ms). It is checked over the
+last MODEL_ROUTE_WINDOW calls of its primary models. With
+MODEL_ROUTE_FALLBACK_ENABLED, when the p95 breaches it, the stage's turns
+run under the "fast" model profile, where every
+route resolves to its fallback model, for MODEL_ROUTE_FALLBACK_SECONDS.
+After that the primary models are measured again from scratch.
+
+The latency of every routed call is recorded per stage, intent and model
+(llm.route_latency_ms on /metrics) to tune the table.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+from ..config import settings
+from ..utils.logger import logger
+from ..utils.metrics import metrics, percentile
+
+WILDCARD = "*"
+
+
+class ModelRoute(BaseModel):
+    """Model used for an intent of a stage"""
+    model: str = Field(..., description="OpenAI model name")
+    max_tokens: Optional[int] = Field(default=None, description="Completion token limit")
+    timeout: Optional[float] = Field(default=None, description="Request timeout in seconds (OPENAI_TIMEOUT if unset)")
+    fallback: Optional[str] = Field(default=None, description="Faster model used while the stage breaches its SLO")
+
+    def model_kwargs(self) -> Dict[str, float]:
+        """Extra chat model parameters of the route"""
+        kwargs = {}
+        if self.max_tokens:
+            kwargs["max_tokens"] = self.max_tokens
+        if self.timeout:
+            kwargs["timeout"] = self.timeout
+        return kwargs
+
+
+class StageRoutes(BaseModel):
+    """Routes of a stage and its latency SLO"""
+    slo_p95_ms: Optional[float] = Field(default=None, description="p95 latency of the primary models, no fallback if unset")
+    routes: Dict[str, ModelRoute] = Field(default_factory=dict)
+
+
+class RoutingTable(BaseModel):
+    """Stage x intent -> model"""
+    default: ModelRoute
+    stages: Dict[str, StageRoutes] = Field(default_factory=dict)
+
+
+class ModelRouter:
+    """Resolves the route of a stage and intent, and watches the stages' latency SLOs"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._table: Optional[RoutingTable] = None
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._fallback_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> RoutingTable:
+        """Load the routing table from its JSON file"""
+        with open(self.path, encoding="utf-8") as f:
+            table = RoutingTable(**json.load(f))
+        with self._lock:
+            self._table = table
+            self._latencies.clear()
+            self._fallback_until.clear()
+        logger.info(f"Loaded model routes for stages: {', '.join(table.stages) or 'none'}")
+        return table
+
+    @property
+    def table(self) -> RoutingTable:
+        if self._table is None:
+            self.load()
+        return self._table
+
+    def route(self, stage: str, intent: str) -> ModelRoute:
+        """
+        Get the route of an intent of a stage.
+
+        Args:
+            stage: Route stage of the agent (e.g. "seller:registration")
+            intent: "supervisor" or the worker's name
+
+        Returns:
+            ModelRoute: The intent's route, else the stage's "*" route, else the default one
+        """
+        table = self.table
+        stage_routes = table.stages.get(stage)
+        if stage_routes:
+            route = stage_routes.routes.get(intent) or stage_routes.routes.get(WILDCARD)
+            if route:
+                return route
+        return table.default
+
+    def observe(self, stage: str, intent: str, model: str, latency_ms: float, primary: bool = True) -> None:
+        """
+        Record the latency of a routed call.
+
+        Args:
+            stage: Route stage
+            intent: Route intent
+            model: Model that answered
+            latency_ms: Call latency
+            primary: Whether the route's primary model answered (only those count for the SLO)
+        """
+        metrics.observe("llm.route_latency_ms", latency_ms, stage=stage, intent=intent, model=model)
+        if not primary:
+            return
+        with self._lock:
+            window = self._latencies.setdefault(stage, deque(maxlen=settings.MODEL_ROUTE_WINDOW))
+            window.append(latency_ms)
+
+    def degraded(self, stage: str) -> bool:
+        """
+        Whether the stage's turns should use the fallback models: its primary
+        models' p95 breached its SLO less than MODEL_ROUTE_FALLBACK_SECONDS ago.
+        """
+        if not settings.MODEL_ROUTE_FALLBACK_ENABLED:
+            return False
+        stage_routes = self.table.stages.get(stage)
+        if not stage_routes or not stage_routes.slo_p95_ms:
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            until = self._fallback_until.get(stage)
+            if until is not None:
+                if now < until:
+                    return True
+                # Back to the primary models, measured again from scratch
+                del self._fallback_until[stage]
+                self._latencies.pop(stage, None)
+                logger.info(f"Stage {stage} back to its primary models")
+                return False
+
+            window = self._latencies.get(stage)
+            if not window or len(window) < settings.MODEL_ROUTE_MIN_SAMPLES:
+                return False
+            p95 = percentile(list(window), 95)
+            if p95 <= stage_routes.slo_p95_ms:
+                return False
+            self._fallback_until[stage] = now + settings.MODEL_ROUTE_FALLBACK_SECONDS
+
+        logger.warning(
+            f"Stage {stage} p95 model latency {p95:.0f}ms breaches its {stage_routes.slo_p95_ms:.0f}ms SLO, "
+            f"using the fallback models for {settings.MODEL_ROUTE_FALLBACK_SECONDS}s"
+        )
+        metrics.incr("llm.route_fallbacks", stage=stage)
+        return True
+
+    def status(self) -> Dict[str, dict]:
+        """p95 of the primary models and fallback state of every stage with an SLO"""
+        stages = self.table.stages
+        now = time.monotonic()
+        with self._lock:
+            return {
+                stage: {
+                    "slo_p95_ms": stage_routes.slo_p95_ms,
+                    "p95_ms": percentile(list(self._latencies.get(stage, ())), 95),
+                    "fallback_s": round(max(self._fallback_until.get(stage, now) - now, 0), 1),
+                }
+                for stage, stage_routes in stages.items()
+                if stage_routes.slo_p95_ms
+            }
+
+
+model_router = ModelRouter(settings.MODEL_ROUTES_PATH)
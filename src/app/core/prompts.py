@@ -0,0 +1,181 @@
+"""
+Local prompt registry.
+
+Prompts are versioned text files shipped in resources/prompts and listed in
+its manifest.json ({name: version} -> <name>.<version>.txt), so the service
+starts and runs without reaching LangChain Hub. Prompts that only exist
+locally are listed as {name: {"version": ..., "hub": false}}.
+
+When PROMPT_REFRESH_INTERVAL is set, a background thread pulls the prompts
+that have a Hub counterpart, keeps the ones that changed in memory and
+writes them to PROMPT_CACHE_DIR, which is loaded on top of the shipped
+files at the next start. A Hub template whose placeholders differ from the
+local one (the agents format it with the local ones) is not swapped in.
+"""
+
+import os
+import json
+import string
+import hashlib
+import threading
+from typing import Dict, FrozenSet, Optional
+
+from pydantic import BaseModel, Field
+
+from ..config import settings
+from ..utils.logger import logger
+
+
+class Prompt(BaseModel):
+    """A versioned prompt template"""
+    name: str = Field(..., description="Prompt name")
+    version: str = Field(..., description="Prompt version")
+    template: str = Field(..., description="Template using str.format placeholders")
+    hub: bool = Field(default=True, description="Whether the prompt has a LangChain Hub counterpart to refresh from")
+
+    @property
+    def input_variables(self) -> FrozenSet[str]:
+        """Names of the template placeholders"""
+        return input_variables(self.template)
+
+    def format(self, **kwargs) -> str:
+        """Fill the template placeholders"""
+        return self.template.format(**kwargs)
+
+
+def input_variables(template: str) -> FrozenSet[str]:
+    """Names of the str.format placeholders of a template"""
+    return frozenset(field for _, field, _, _ in string.Formatter().parse(template) if field)
+
+
+class PromptRegistry:
+    """In-memory registry of the prompts used by the agents"""
+
+    def __init__(self, prompts_dir: str, cache_dir: Optional[str] = None):
+        self.prompts_dir = prompts_dir
+        self.cache_dir = cache_dir
+        self._prompts: Dict[str, Prompt] = {}
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stop_refresh = threading.Event()
+
+    def load(self) -> None:
+        """Load the shipped prompts, then the prompts warmed in the cache directory"""
+        with open(os.path.join(self.prompts_dir, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        prompts = {}
+        for name, entry in manifest.items():
+            entry = entry if isinstance(entry, dict) else {"version": entry}
+            version = entry["version"]
+            with open(os.path.join(self.prompts_dir, f"{name}.{version}.txt"), encoding="utf-8") as f:
+                prompts[name] = Prompt(name=name, version=version, template=f.read(), hub=entry.get("hub", True))
+
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            for file_name in os.listdir(self.cache_dir):
+                if not file_name.endswith(".json"):
+                    continue
+                with open(os.path.join(self.cache_dir, file_name), encoding="utf-8") as f:
+                    cached = Prompt(**json.load(f))
+                shipped = prompts.get(cached.name)
+                # A cache written before the shipped prompt changed its placeholders is stale
+                if shipped is not None and shipped.hub and cached.input_variables == shipped.input_variables:
+                    prompts[cached.name] = cached
+
+        with self._lock:
+            self._prompts = prompts
+        logger.info(f"Loaded prompts: {', '.join(f'{p.name}@{p.version}' for p in prompts.values())}")
+
+    def get(self, name: str) -> Prompt:
+        """Get a prompt by name, loading the registry on first use"""
+        if not self._prompts:
+            self.load()
+        try:
+            return self._prompts[name]
+        except KeyError:
+            raise ValueError(f"Unknown prompt: {name}")
+
+    def version(self, *names: str) -> str:
+        """Get a combined version string for the given prompts"""
+        return ",".join(f"{name}@{self.get(name).version}" for name in names)
+
+    def refresh_from_hub(self) -> list[str]:
+        """
+        Pull the registered prompts that have a Hub counterpart and keep the
+        ones that changed, as long as they have the same placeholders.
+
+        Returns:
+            list[str]: Names of the prompts that changed
+        """
+        from langchain import hub
+
+        changed = []
+        for name, current in list(self._prompts.items()):
+            if not current.hub:
+                continue
+            try:
+                template = self._template_from_hub(hub.pull(name))
+            except Exception as e:
+                logger.warning(f"Could not refresh prompt {name} from hub: {e}")
+                continue
+
+            if template is None or template == current.template:
+                continue
+            if input_variables(template) != current.input_variables:
+                logger.warning(
+                    f"Keeping the local prompt {name}: the hub template has placeholders "
+                    f"{sorted(input_variables(template))}, expected {sorted(current.input_variables)}"
+                )
+                continue
+
+            digest = hashlib.sha256(template.encode("utf-8")).hexdigest()[:8]
+            prompt = Prompt(name=name, version=f"hub-{digest}", template=template)
+            with self._lock:
+                self._prompts = {**self._prompts, name: prompt}
+            self._write_cache(prompt)
+            changed.append(name)
+
+        if changed:
+            logger.info(f"Refreshed prompts from hub: {changed}")
+        return changed
+
+    def start_refresh(self, interval: int) -> None:
+        """Refresh the prompts from the hub in a background thread every interval seconds"""
+        if interval <= 0 or self._refresh_thread is not None:
+            return
+
+        def run():
+            while not self._stop_refresh.wait(interval):
+                self.refresh_from_hub()
+
+        self._refresh_thread = threading.Thread(target=run, name="prompt-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop_refresh(self) -> None:
+        """Stop the background refresh thread"""
+        self._stop_refresh.set()
+        self._refresh_thread = None
+
+    def _write_cache(self, prompt: Prompt) -> None:
+        """Persist a refreshed prompt so the next start can use it offline"""
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(os.path.join(self.cache_dir, f"{prompt.name}.json"), "w", encoding="utf-8") as f:
+                json.dump(prompt.model_dump(), f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"Could not write prompt cache for {prompt.name}: {e}")
+
+    @staticmethod
+    def _template_from_hub(hub_prompt) -> Optional[str]:
+        """Extract the template text of a prompt pulled from the hub"""
+        if hasattr(hub_prompt, "template"):
+            return hub_prompt.template
+        messages = getattr(hub_prompt, "messages", None)
+        if messages:
+            return "\n\n".join(m.prompt.template for m in messages if hasattr(m, "prompt"))
+        return None
+
+
+prompt_registry = PromptRegistry(settings.PROMPTS_DIR, settings.PROMPT_CACHE_DIR or None)
@@ -0,0 +1,79 @@
+"""
+Business stage transition events.
+
+StageService emits a StageTransition whenever a seller's property or a
+buyer's chat moves to another stage. Subscribers run in a background thread,
+so the turn that changed the stage does not wait for them; the agents
+factory subscribes to pre-build the next stage's graph and load the chat's
+entities before its next message (see AgentsFactory.warm_stage).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Union
+
+from pydantic import BaseModel
+
+from ..config import settings
+from ..models.business_stage import BuyerStage, SellerStage
+from ..utils.logger import logger
+from ..utils.metrics import metrics
+
+
+class StageTransition(BaseModel):
+    """A chat moved to another business stage"""
+    chat_id: str
+    role: str
+    stage: Union[SellerStage, BuyerStage]
+
+
+StageHandler = Callable[[StageTransition], None]
+
+
+class StageEventBus:
+    """Runs the subscribed handlers of every stage transition in a background thread"""
+
+    def __init__(self, max_workers: int = 2):
+        self._handlers: List[StageHandler] = []
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, handler: StageHandler) -> StageHandler:
+        """Register a handler for every transition, usable as a decorator"""
+        with self._lock:
+            if handler not in self._handlers:
+                self._handlers.append(handler)
+        return handler
+
+    def _run(self, handler: StageHandler, event: StageTransition) -> None:
+        try:
+            handler(event)
+        except Exception as e:
+            logger.error(f"Error handling stage transition of chat {event.chat_id} to {event.stage.value}: {e}")
+
+    def emit(self, event: StageTransition) -> None:
+        """
+        Notify a transition to the subscribers, without waiting for them.
+
+        Args:
+            event: The transition
+        """
+        metrics.incr("stage.transitions", role=event.role, stage=event.stage.value)
+        if not settings.STAGE_WARMUP_ENABLED:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="stage-events")
+            for handler in self._handlers:
+                self._executor.submit(self._run, handler, event)
+
+    def wait(self) -> None:
+        """Wait for the handlers already submitted (scripts and shutdown)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+stage_events = StageEventBus()
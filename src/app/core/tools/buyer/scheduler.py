@@ -5,15 +5,15 @@ Defines the tools for the buyer scheduler agent
 from typing import Annotated, Optional, List, Dict, Any
 from langchain.tools import tool
 from langgraph.prebuilt import InjectedState
-from ....services.chat_service import ChatService
 from ....services.user_service import UserService, BuyerInfo, BuyerProgress
 from ....services.visit_service import VisitService, VisitInfo
-from ....services.property_service import PropertyService
 from ....models.user import AvailabilitySlot
 from pydantic import BaseModel
 from datetime import datetime
 from ....models.visit import VisitStatus
 from ....utils.logger import logger
+from ...agent.turn_context import TurnContext
+from ...agent.tool_executor import read_only
 
 
 class VisitRequest(BaseModel):
@@ -29,17 +29,17 @@ def save_buyer_info(info: BuyerInfo, state: Annotated[dict, InjectedState]) -> s
     Herramienta útil para registrar la información del comprador.
     """
     logger.info("Saving buyer info")
-    chat_id = state.get("chat_id")
+    turn = TurnContext.from_state(state)
     user_service = UserService()
-    chat_service = ChatService()
     
     # Get user from chat to use as buyer
-    user = chat_service.get_user_from_chat(chat_id)
+    user = turn.user
     if not user:
         return "Error: No se pudo encontrar el usuario"
     
     # Update buyer info
     success = user_service.update_buyer_info(user.id, info)
+    turn.invalidate("user")
     
     if success:
         return "Información del comprador registrada correctamente"
@@ -47,17 +47,15 @@ def save_buyer_info(info: BuyerInfo, state: Annotated[dict, InjectedState]) -> s
         return "Error: No se pudo guardar la información del comprador"
 
 
+@read_only
 @tool
 def get_remaining_buyer_info(state: Annotated[dict, InjectedState]) -> Optional[BuyerProgress]:
     """
     Herramienta útil para obtener la información que se necesita del posible comprador.
     """
     logger.info("Getting remaining buyer info")
-    chat_id = state.get("chat_id")
-    
-    # Get user from chat service
-    chat_service = ChatService()
-    user = chat_service.get_user_from_chat(chat_id)
+    # Get user from the turn context
+    user = TurnContext.from_state(state).user
     
     if not user:
         # Return progress indicating all BuyerInfo fields are missing
@@ -72,6 +70,7 @@ def get_remaining_buyer_info(state: Annotated[dict, InjectedState]) -> Optional[
     return user_service.get_buyer_progress(user.id)
 
 
+@read_only
 @tool
 def get_seller_availability(state: Annotated[dict, InjectedState]) -> List[AvailabilitySlot]:
     """
@@ -82,15 +81,14 @@ def get_seller_availability(state: Annotated[dict, InjectedState]) -> List[Avail
     
     try:
         # Get the property associated with the chat
-        chat_service = ChatService()
-        property_service = PropertyService()
+        turn = TurnContext.from_state(state)
         
-        chat = chat_service.get_chat_by_id(chat_id)
+        chat = turn.chat
         if not chat or not chat.property_id:
             logger.warning(f"No chat_id found for chat_id: {chat_id}")
             return []
         
-        property_obj = property_service.get_property_full_info(chat.property_id)
+        property_obj = turn.linked_property
         
         if not property_obj:
             logger.warning(f"No property found for property_id: {chat.property_id}")
@@ -135,12 +133,11 @@ def notify_seller(state: Annotated[dict, InjectedState]) -> str:
     Herramienta útil para notificar al vendedor sobre la visita.
     """
     logger.info("Notifying seller")
-    from src.app.services.infobip_service import InfobipService
+    from src.app.services.outbound_dispatcher import outbound_dispatcher
 
-    chat_id = state.get("chat_id")
-    chat_service = ChatService()
-    user = chat_service.get_user_from_chat(chat_id)
-    property = chat_service.get_property_from_buyer_chat_id(chat_id)
+    turn = TurnContext.from_state(state)
+    user = turn.user
+    property = turn.linked_property
 
     if not property or not user:
         return "No se encontró la propiedad o el usuario"
@@ -159,7 +156,7 @@ def notify_seller(state: Annotated[dict, InjectedState]) -> str:
     template_data = visit_service.get_visit_template_data(visit)
     
     # Enviar plantilla de la cita con datos reales
-    InfobipService().send_template_message(
+    outbound_dispatcher.send_template_message(
         to=seller.phone,
         template_name="schedule_buyer_notification",
         language="es",
@@ -170,7 +167,9 @@ def notify_seller(state: Annotated[dict, InjectedState]) -> str:
                 template_data.visit_date,
                 template_data.visit_time,
             ]
-        }
+        },
+        chat_id=turn.chat_id,
+        turn_id=turn.turn_id
     )
 
     return "Notificación enviada correctamente"
@@ -14,7 +14,7 @@ from langgraph.prebuilt import InjectedState
 
 from src.app.utils.logger import logger
 from src.app.utils.s3_utils import upload_file_to_s3
-from src.app.services.chat_service import ChatService
+from src.app.core.agent.turn_context import TurnContext
 from src.app.services.infobip_service import InfobipService
 
 
@@ -30,9 +30,7 @@ def generate_sales_contract(buyer_info: str, state: Annotated[dict, InjectedStat
     logger.info("Generating sales contract PDF")
     
     try:
-        chat_id = state.get("chat_id")
-        chat_service = ChatService()
-        user_data = chat_service.get_user_from_chat(chat_id)
+        user_data = TurnContext.from_state(state).user
         phone_number = user_data.phone
         
         # Get local PDF contract path (same pattern as QR tool)
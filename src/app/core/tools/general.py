@@ -6,18 +6,19 @@ from typing import Annotated, Dict, Any, Optional, List
 from langchain.tools import tool
 from langgraph.prebuilt import InjectedState
 
-from src.app.core.crud.chat_crud import ChatCRUD
 from src.app.core.crud.visit_crud import VisitCRUD
 from src.app.core.crud.user_crud import UserCRUD
-from src.app.core.database import get_db
 from ...models.business_stage import SellerStage, BuyerStage
 from ...models.user import AvailabilitySlot
 from ...models.visit import VisitStatus
 from ...services.stage_service import StageService
 from ...services.user_service import UserService
 from ...utils.logger import logger
+from ..agent.turn_context import TurnContext
+from ..agent.tool_executor import read_only
 
 
+@read_only
 @tool
 def get_business_stage(user_type: str, state: Annotated[dict, InjectedState]) -> Dict[str, Any]:
     """
@@ -32,16 +33,14 @@ def get_business_stage(user_type: str, state: Annotated[dict, InjectedState]) ->
     """
     logger.info(f"Getting business stage for user type {user_type}")
     try:
-        chat_id = state.get("chat_id")
-
-        stage_service = StageService()
+        turn = TurnContext.from_state(state)
 
         if user_type.lower() == "seller":
-            stage = stage_service.get_seller_stage(chat_id)
+            stage = turn.seller_stage
             return {"success": True, "stage": stage.value}
 
         if user_type.lower() == "buyer":
-            stage = stage_service.get_buyer_stage(chat_id)
+            stage = turn.buyer_stage
             return {"success": True, "stage": stage.value if stage else None}
         return {
             "success": False,
@@ -73,15 +72,14 @@ def save_availability(
     """
     logger.info("Saving availability")
     try:
-        chat_id = state.get("chat_id")
-
-        chat_crud = ChatCRUD(get_db())
-        chat = chat_crud.get_chat_by_id(chat_id)
+        turn = TurnContext.from_state(state)
+        chat = turn.chat
         if not chat:
             return {"success": False, "error": "No chat_id found in state", "message": "Error: Usuario no identificado"}
 
         user_service = UserService()
         success = user_service.add_availability(chat.user_id, availability_slots)
+        turn.invalidate("user")
 
         if success:
             return {"success": True, "message": "Horario de disponibilidad almacenado correctamente"}
@@ -105,8 +103,12 @@ def update_business_stage(
     try:
         chat_id = state.get("chat_id")
         stage_service = StageService()
+        turn = TurnContext.from_state(state)
 
+        # Dropped before the write: the transition starts warming the chat's
+        # next turn, which an invalidation after it would discard
         if user_type.lower() == "seller":
+            turn.invalidate("property")
             success = stage_service.update_seller_stage(chat_id, stage)
             return {
                 "success": success,
@@ -114,6 +116,7 @@ def update_business_stage(
             }
 
         if user_type.lower() == "buyer":
+            turn.invalidate("chat")
             success = stage_service.update_buyer_stage(chat_id, stage)
             return {
                 "success": success,
@@ -8,13 +8,13 @@ from langgraph.prebuilt import InjectedState
 
 
 from ...config import settings
+from ...models.whatsapp import idempotency_key
 from ...services.image_integration_service import ImageIntegrationService
-from ...services.property_service import PropertyService
-from ...services.chat_service import ChatService
 from ...services.qr_service import QRResponse
 from ...utils.logger import logger
 from ...utils.s3_utils import upload_file_to_s3
-from ...services.infobip_service import InfobipService
+from ...services.outbound_dispatcher import outbound_dispatcher
+from ..agent.turn_context import TurnContext
 
 
 
@@ -24,13 +24,10 @@ def generate_qr(state: Annotated[dict, InjectedState]) -> Optional[QRResponse]:
     Herramienta útil para generar el código QR asociado a la propiedad.
     """
     logger.info("Generating QR")
-    chat_id = state.get("chat_id")
-    chat_service = ChatService()
-    user_data = chat_service.get_user_from_chat(chat_id)
-    property_id = chat_service.get_property_id_from_chat(chat_id)
+    turn = TurnContext.from_state(state)
+    user_data = turn.user
     phone_number = user_data.phone
-    property_service = PropertyService()
-    property_obj = property_service.get_property_full_info(property_id)
+    property_obj = turn.owned_property
     address = property_obj.address
     integration_service = ImageIntegrationService()
     qr_position = None
@@ -43,13 +40,16 @@ def generate_qr(state: Annotated[dict, InjectedState]) -> Optional[QRResponse]:
         qr_size=qr_size,
     )
     url_public = upload_file_to_s3(path)
-    InfobipService().send_template_message(
+    outbound_dispatcher.send_template_message(
         to=phone_number,
         template_name="banner_qr_broky",
         language="es",
         template_data={
             "image": url_public
-        }
+        },
+        chat_id=turn.chat_id,
+        # The QR is uploaded under a new name every time, the key is the property's banner in this turn
+        idempotency_key=idempotency_key(turn.chat_id, turn.turn_id, "banner_qr_broky", property_obj.id) if turn.turn_id else None
     )
     return {
         "success": True,
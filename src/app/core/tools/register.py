@@ -12,6 +12,8 @@ from langgraph.prebuilt import InjectedState
 from ...services.property_service import PropertyService, PropertyInfo, PropertyProgress
 
 from ...services.chat_service import ChatService
+from ..agent.turn_context import TurnContext
+from ..agent.tool_executor import read_only
 
 from ...models.property import Property
 from ...models.user import User
@@ -19,6 +21,7 @@ from ...models.user import User
 from ...utils.logger import logger
 
 
+@read_only
 @tool
 def get_user_info(state: Annotated[dict, InjectedState]) -> str:
     """
@@ -27,9 +30,7 @@ def get_user_info(state: Annotated[dict, InjectedState]) -> str:
     Usa esta herramienta para crear mensajes más personalizados para el usuario.
     """
     logger.info("Getting user info")
-    chat_id = state.get("chat_id")
-    chat_service = ChatService()
-    user = chat_service.get_user_from_chat(chat_id)
+    user = TurnContext.from_state(state).user
     return user.name
 
 
@@ -41,46 +42,49 @@ def save_property_info(info: PropertyInfo, state: Annotated[dict, InjectedState]
     """
     logger.info("Saving property info")
     chat_id = state.get("chat_id")
+    turn = TurnContext.from_state(state)
     property_service = PropertyService()
     chat_service = ChatService()
     
     # Get user from chat to use as owner
-    user = chat_service.get_user_from_chat(chat_id)
+    user = turn.user
     owner_id = user.id
     
     # Check if user already has a property
-    existing_property_id = chat_service.get_property_id_from_chat(chat_id)
+    existing_property_id = turn.owned_property_id
+    # The chat's routing is only rewritten when the linked property changes
+    chat = turn.chat
+    routing = chat.routing if chat else None
     
     if existing_property_id:
         # Update existing property with new info
         property_service.update_property(existing_property_id, info)
         
         # Ensure chat.property_id is set
-        chat_service.update_chat(chat_id, {"property_id": existing_property_id})
+        chat_service.update_chat(chat_id, {"property_id": existing_property_id}, routing=routing)
+        turn.invalidate("chat", "property")
         
-        return property_service.get_property_full_info(existing_property_id)
+        return turn.get_property(existing_property_id)
     else:
         # Create new property
         property_obj = property_service.create_property(info, owner_id)
         
         # Set chat.property_id to link chat to property
-        chat_service.update_chat(chat_id, {"property_id": property_obj.id})
+        chat_service.update_chat(chat_id, {"property_id": property_obj.id}, routing=routing)
+        turn.invalidate("chat", "owned_property_id")
         
         return property_obj
 
 
+@read_only
 @tool
 def get_remaining_info(state: Annotated[dict, InjectedState]) -> Optional[PropertyProgress]:
     """
     Herramienta útil para obtener la información que falta para completar el registro de la propiedad.
     """
     logger.info("Getting remaining info")
-    # cast to str chat_id
-    chat_id = state.get("chat_id") or ""
-    
-    # Try to get property_id from state first, then from chat service
-    chat_service = ChatService()
-    property_id = chat_service.get_property_id_from_chat(chat_id) 
+    turn = TurnContext.from_state(state)
+    property_id = turn.owned_property_id
     
     if not property_id:
         # Return progress indicating all PropertyInfo fields are missing
@@ -92,4 +96,4 @@ def get_remaining_info(state: Annotated[dict, InjectedState]) -> Optional[Proper
         )
     
     property_service = PropertyService()
-    return property_service.get_progress_info(property_id)
+    return property_service.get_progress_info(property_id, turn.get_property(property_id))
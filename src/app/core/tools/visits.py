@@ -7,6 +7,7 @@ import random
 from typing import Annotated
 from langchain.tools import tool
 from langgraph.prebuilt import InjectedState
+from ..agent.tool_executor import read_only
 
 
 @tool
@@ -18,6 +19,7 @@ def create_property_card(state: Annotated[dict, InjectedState]) -> str:
     return "Ficha de la propiedad creada correctamente"
 
 
+@read_only
 @tool
 def get_appraisal_info(_: Annotated[dict, InjectedState]) -> str:
     """
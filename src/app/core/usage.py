@@ -0,0 +1,276 @@
+"""
+Per-turn accounting of AI model calls, tokens, latency and cost.
+
+The webhook starts a UsageTracker for every turn. It lives in a context
+variable, so every model call of the turn adds to it wherever it happens:
+- chat models (supervisors, workers, the conversation summary) through the
+  UsageCallbackHandler the model registry attaches to every chat model,
+- Whisper transcriptions and DALL·E edits, recorded by the OpenAI utils.
+LangGraph and the tool executors copy the context into their worker
+threads, which all share the same tracker.
+
+The turn's usage is stored on the agent's reply and accumulated on the chat
+document, per business stage. The BudgetPolicy reads the chat totals to
+switch a chat that spent most of its budget to a cheaper model and, once
+the budget is spent, to a shorter context.
+"""
+
+import threading
+import time
+from contextvars import ContextVar
+from enum import Enum
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from ..config import settings
+from ..models.chat import RoutingContext
+from ..models.usage import ChatUsage, ModelUsage, TurnUsage
+from ..utils.logger import logger
+from ..utils.metrics import metrics
+from .model_routes import model_router
+
+# USD per million tokens (input, cached input, output)
+TOKEN_PRICES: Dict[str, tuple] = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+# USD per unit: audio second for Whisper, generated image for DALL·E
+UNIT_PRICES: Dict[str, float] = {
+    "whisper-1": 0.006 / 60,
+    "dall-e-2": 0.020,
+}
+
+
+def estimate_cost(
+    model: str,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    units: float = 0,
+    cached_input_tokens: int = 0,
+) -> float:
+    """
+    Estimate the cost of a model call.
+
+    Args:
+        model: Model name (dated snapshots such as gpt-4.1-2025-04-14 use the base price)
+        input_tokens: Prompt tokens, cached ones included
+        output_tokens: Completion tokens
+        units: Audio seconds or images
+        cached_input_tokens: Prompt tokens read from the prompt cache, billed at the cached price
+
+    Returns:
+        float: Cost in USD, 0 for unknown models
+    """
+    name = next((known for known in sorted(TOKEN_PRICES, key=len, reverse=True) if model.startswith(known)), None)
+    cost = 0.0
+    if name:
+        input_price, cached_price, output_price = TOKEN_PRICES[name]
+        cost += (
+            (input_tokens - cached_input_tokens) * input_price
+            + cached_input_tokens * cached_price
+            + output_tokens * output_price
+        ) / 1_000_000
+    cost += units * UNIT_PRICES.get(model, 0)
+    return cost
+
+
+def stage_of(routing: Optional[RoutingContext]) -> str:
+    """Business stage a turn is accounted to: the property's stage for sellers, the chat's for buyers"""
+    if routing is None:
+        return "unknown"
+    stage = routing.seller_stage if routing.role == "seller" else routing.buyer_stage
+    return f"{routing.role or 'buyer'}:{stage.value if stage else 'new'}"
+
+
+class UsageTracker:
+    """Accumulates the model usage of one turn, shared by every thread of the turn"""
+
+    def __init__(self):
+        self.usage = TurnUsage()
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        model: str,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        units: float = 0,
+        latency_ms: float = 0,
+        cached_input_tokens: int = 0,
+    ) -> None:
+        """
+        Add a model call to the turn.
+
+        Args:
+            model: Model name
+            input_tokens: Prompt tokens
+            output_tokens: Completion tokens
+            units: Audio seconds or images
+            latency_ms: Time spent waiting for the model
+            cached_input_tokens: Prompt tokens read from the prompt cache
+        """
+        call = ModelUsage(
+            calls=1,
+            input_tokens=input_tokens,
+            cached_input_tokens=cached_input_tokens,
+            output_tokens=output_tokens,
+            units=units,
+            latency_ms=latency_ms,
+            cost_usd=estimate_cost(model, input_tokens, output_tokens, units, cached_input_tokens),
+        )
+        with self._lock:
+            self.usage.add(call)
+            self.usage.models.setdefault(model, ModelUsage()).add(call)
+
+        metrics.observe("llm.latency_ms", latency_ms, model=model)
+        metrics.incr("llm.input_tokens", input_tokens, model=model)
+        metrics.incr("llm.cached_input_tokens", cached_input_tokens, model=model)
+        metrics.incr("llm.output_tokens", output_tokens, model=model)
+        metrics.incr("llm.cost_usd", call.cost_usd, model=model)
+
+    def snapshot(self, stage: str = "") -> TurnUsage:
+        """Copy of the usage of the turn, labelled with the stage that handled it"""
+        with self._lock:
+            usage = self.usage.model_copy(deep=True)
+        usage.stage = stage
+        return usage
+
+
+_current_tracker: ContextVar[Optional[UsageTracker]] = ContextVar("usage_tracker", default=None)
+
+
+def start_turn() -> UsageTracker:
+    """Start tracking the model usage of a new turn in the current context"""
+    tracker = UsageTracker()
+    _current_tracker.set(tracker)
+    return tracker
+
+
+def current_tracker() -> Optional[UsageTracker]:
+    """Tracker of the turn being processed, if any"""
+    return _current_tracker.get()
+
+
+def record_usage(
+    model: str,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    units: float = 0,
+    latency_ms: float = 0,
+    cached_input_tokens: int = 0,
+) -> None:
+    """Add a model call to the current turn; calls outside a turn only go to the metrics"""
+    tracker = current_tracker() or UsageTracker()
+    tracker.add(
+        model,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        units=units,
+        latency_ms=latency_ms,
+        cached_input_tokens=cached_input_tokens,
+    )
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Records the tokens and latency of every chat model call to the current turn"""
+
+    # Cheap bookkeeping: async runs call it in place, in the turn's context, instead of in an executor thread
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: list, *, run_id: UUID, **kwargs: Any) -> None:
+        params = kwargs.get("invocation_params") or {}
+        metadata = kwargs.get("metadata") or {}
+        model = params.get("model_name") or params.get("model") or metadata.get("ls_model_name") or "unknown"
+        self._started[run_id] = (model, time.perf_counter(), metadata.get("model_route"))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        model, started, route = self._started.pop(run_id, ("unknown", time.perf_counter(), None))
+        latency_ms = (time.perf_counter() - started) * 1000
+        input_tokens = cached_input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                cached_input_tokens += (usage.get("input_token_details") or {}).get("cache_read") or 0
+                output_tokens += usage.get("output_tokens", 0)
+        record_usage(
+            model,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            latency_ms=latency_ms,
+            cached_input_tokens=cached_input_tokens,
+        )
+        if route:
+            model_router.observe(route["stage"], route["intent"], model, latency_ms, primary=route["tier"] == "primary")
+            # Prompt cache hits per route stage, to check the prompt layout
+            metrics.incr("llm.stage_input_tokens", input_tokens, stage=route["stage"])
+            metrics.incr("llm.stage_cached_input_tokens", cached_input_tokens, stage=route["stage"])
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started.pop(run_id, None)
+
+
+usage_callback = UsageCallbackHandler()
+
+
+class BudgetAction(str, Enum):
+    NONE = "none"
+    DOWNGRADE = "downgrade"
+    TRIM = "trim"
+
+
+class BudgetPolicy:
+    """Decides how to run a chat's turn from what the chat already spent"""
+
+    def __init__(self, budget_usd: Optional[float] = None, downgrade_at: Optional[float] = None):
+        self.budget_usd = settings.CHAT_BUDGET_USD if budget_usd is None else budget_usd
+        self.downgrade_at = settings.CHAT_BUDGET_DOWNGRADE_AT if downgrade_at is None else downgrade_at
+
+    def decide(self, chat_usage: Optional[ChatUsage]) -> BudgetAction:
+        """
+        Decide the budget action for the next turn of a chat.
+
+        Args:
+            chat_usage: Usage accumulated by the chat
+
+        Returns:
+            BudgetAction: NONE, DOWNGRADE (cheaper model) or TRIM (cheaper model and shorter context)
+        """
+        if self.budget_usd <= 0 or chat_usage is None:
+            return BudgetAction.NONE
+        spent = chat_usage.cost_usd / self.budget_usd
+        if spent >= 1:
+            return BudgetAction.TRIM
+        if spent >= self.downgrade_at:
+            return BudgetAction.DOWNGRADE
+        return BudgetAction.NONE
+
+    def apply(self, action: BudgetAction, agent_context: dict) -> dict:
+        """
+        Set the model profile and context size of the turn in the agent context.
+
+        Args:
+            action: Budget action for the turn
+            agent_context: Context of the agent, updated in place
+
+        Returns:
+            dict: The agent context
+        """
+        if action == BudgetAction.NONE:
+            return agent_context
+        logger.info(f"Chat {agent_context.get('chat_id')} over budget: {action.value}")
+        metrics.incr("budget.actions", action=action.value)
+        agent_context["model_profile"] = "economy"
+        if action == BudgetAction.TRIM:
+            agent_context["keep_turns"] = settings.CHAT_BUDGET_KEEP_TURNS
+        return agent_context
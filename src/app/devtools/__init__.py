@@ -0,0 +1 @@
+# Local stand-ins and harnesses for benchmarking and offline testing
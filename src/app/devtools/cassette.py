@@ -0,0 +1,241 @@
+"""
+LLM cassettes: record real chat model exchanges and replay them offline.
+
+A cassette is a JSON file holding, in call order, every request sent to a
+chat model during a session (the messages and the tools bound to the model)
+and the response it got, plus the tool calls run by the agents and the
+replies sent to the user. The RecordingChatModel wraps the real models and
+writes the cassette, the ReplayChatModel answers from it deterministically
+without any network call.
+
+Replayed responses are matched by a hash of the request; system messages
+are left out of the hash because they carry volatile content (the current
+date). When the request changed (e.g. a prompt or tool edit), replay falls
+back to the next unplayed response of the same model, in recording order.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict
+
+from ..utils.logger import logger
+
+
+class CassetteMiss(Exception):
+    """Raised when a replayed model has no recorded response left"""
+
+
+def _tool_names(tools: Sequence[Any]) -> tuple:
+    return tuple(sorted(convert_to_openai_tool(tool)["function"]["name"] for tool in tools))
+
+
+def request_key(model: str, messages: List[BaseMessage], tool_names: tuple) -> str:
+    """Stable hash of a model request, ignoring system messages and message IDs"""
+    payload = {
+        "model": model,
+        "tools": list(tool_names),
+        "messages": [
+            {
+                "type": message.type,
+                "content": message.content,
+                "tool_calls": [
+                    {"name": call["name"], "args": call["args"]}
+                    for call in getattr(message, "tool_calls", None) or []
+                ],
+            }
+            for message in messages
+            if not isinstance(message, SystemMessage)
+        ],
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded model and tool exchanges of a session"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.interactions: List[Dict[str, Any]] = []
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.replies: List[List[str]] = []
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Deque[int]] = defaultdict(deque)
+        self._by_key: Dict[str, Deque[int]] = defaultdict(deque)
+        self._played: set = set()
+        self.model_calls = 0
+        self.model_ms = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        """Load a recorded cassette for replay"""
+        cassette = cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        cassette.interactions = data.get("interactions", [])
+        cassette.tool_calls = data.get("tool_calls", [])
+        cassette.replies = data.get("replies", [])
+        cassette.rewind()
+        return cassette
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the cassette to disk"""
+        path = path or self.path
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"interactions": self.interactions, "tool_calls": self.tool_calls, "replies": self.replies}, f, ensure_ascii=False, indent=2)
+        logger.info(f"Cassette saved to {path} ({len(self.interactions)} model calls)")
+
+    def rewind(self) -> None:
+        """Mark every recorded response as unplayed"""
+        with self._lock:
+            self._pending.clear()
+            self._by_key.clear()
+            self._played.clear()
+            for index, interaction in enumerate(self.interactions):
+                self._pending[interaction["model"]].append(index)
+                self._by_key[interaction["key"]].append(index)
+
+    def record(self, model: str, key: str, messages: List[BaseMessage], response: AIMessage, latency_ms: float) -> None:
+        """Append a model exchange"""
+        with self._lock:
+            self.interactions.append({
+                "model": model,
+                "key": key,
+                "request": [message_to_dict(message) for message in messages],
+                "response": message_to_dict(response),
+                "latency_ms": round(latency_ms, 3),
+            })
+
+    def count(self, response: AIMessage, latency_ms: float) -> None:
+        """Add a model call, its latency and its token usage to the session totals"""
+        usage = response.usage_metadata or {}
+        with self._lock:
+            self.model_calls += 1
+            self.model_ms += latency_ms
+            self.input_tokens += usage.get("input_tokens", 0)
+            self.output_tokens += usage.get("output_tokens", 0)
+
+    def record_tool_call(self, name: str, tool_input: Any, output: Any) -> None:
+        """Append a tool exchange"""
+        with self._lock:
+            self.tool_calls.append({"name": name, "input": tool_input, "output": str(output)})
+
+    def next_response(self, model: str, key: str) -> AIMessage:
+        """
+        Get the recorded response for a request.
+
+        Args:
+            model: Model name
+            key: Request hash (see request_key)
+
+        Returns:
+            AIMessage: The recorded response
+
+        Raises:
+            CassetteMiss: No unplayed response is left for the model
+        """
+        with self._lock:
+            index = None
+            while self._by_key[key]:
+                candidate = self._by_key[key].popleft()
+                if candidate not in self._played:
+                    index = candidate
+                    break
+            if index is None:
+                while self._pending[model]:
+                    candidate = self._pending[model].popleft()
+                    if candidate not in self._played:
+                        index = candidate
+                        logger.warning(f"Cassette: request changed, replaying call #{index} of {model} in order")
+                        break
+            if index is None:
+                raise CassetteMiss(f"No recorded response left for {model}")
+            self._played.add(index)
+            return messages_from_dict([self.interactions[index]["response"]])[0]
+
+
+class RecordingChatModel(BaseChatModel):
+    """Wraps a real chat model and records its exchanges to a cassette"""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    inner: BaseChatModel
+    cassette: Any
+    model_name: str
+    bound: Optional[Runnable] = None
+    tool_names: tuple = ()
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def bind_tools(self, tools: Sequence[Any], *, parallel_tool_calls: Optional[bool] = None, **kwargs: Any) -> "RecordingChatModel":
+        if parallel_tool_calls is not None:
+            kwargs["parallel_tool_calls"] = parallel_tool_calls
+        return self.model_copy(update={
+            "bound": self.inner.bind_tools(tools, **kwargs),
+            "tool_names": _tool_names(tools),
+        })
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        runnable = self.bound or self.inner
+        start = time.perf_counter()
+        response = runnable.invoke(messages, stop=stop, **kwargs)
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.cassette.count(response, latency_ms)
+        self.cassette.record(self.model_name, request_key(self.model_name, messages, self.tool_names), messages, response, latency_ms)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+
+class ReplayChatModel(BaseChatModel):
+    """Deterministic fake chat model answering from a cassette"""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    cassette: Any
+    model_name: str
+    tool_names: tuple = ()
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools: Sequence[Any], *, parallel_tool_calls: Optional[bool] = None, **kwargs: Any) -> "ReplayChatModel":
+        return self.model_copy(update={"tool_names": _tool_names(tools)})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        response = self.cassette.next_response(self.model_name, request_key(self.model_name, messages, self.tool_names))
+        self.cassette.count(response, (time.perf_counter() - start) * 1000)
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+
+class ToolCallRecorder(BaseCallbackHandler):
+    """Callback handler recording the tool calls of a run to a cassette"""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self._inputs: Dict[Any, tuple] = {}
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id, **kwargs: Any) -> None:
+        self._inputs[run_id] = ((serialized or {}).get("name", "unknown"), kwargs.get("inputs") or input_str)
+
+    def on_tool_end(self, output: Any, *, run_id, **kwargs: Any) -> None:
+        name, tool_input = self._inputs.pop(run_id, ("unknown", None))
+        self.cassette.record_tool_call(name, tool_input, getattr(output, "content", output))
+
+    def on_tool_error(self, error: BaseException, *, run_id, **kwargs: Any) -> None:
+        name, tool_input = self._inputs.pop(run_id, ("unknown", None))
+        self.cassette.record_tool_call(name, tool_input, f"Error: {error}")
@@ -0,0 +1,287 @@
+"""
+Record/replay harness for the agent pipeline.
+
+Drives full webhook-to-reply turns (POST /webhook through FastAPI's test
+client, so AgentsFactory, the agents, the tools and the CRUD layer all run
+for real) against a local MongoDB, with the chat models either recording to
+a cassette (real OpenAI), replaying from it (no network), or playing the
+tool calls and replies scripted on the scenario messages (see scripted.py).
+Outbound WhatsApp messages are captured instead of being sent to Infobip,
+once the outbound dispatcher hands them over.
+
+For every turn it measures our own overhead, excluding model latency:
+supervisor graph construction, MongoDB round trips (count and time as seen
+by the driver) and the rest of the turn (graph execution, BSON/JSON/pydantic
+(de)serialisation and Python glue).
+
+The database named by DATABASE_NAME is dropped before every run, point it at
+a scratch database.
+"""
+
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+from pymongo import monitoring
+
+from ..config import settings
+from ..core.agent.context import summary_folds
+from ..core.agent.main import Agent
+from ..core.answer_cache import answer_cache
+from ..core.database import DATABASE_NAME, get_db
+from ..core.llm import model_registry
+from ..models.whatsapp import MessageStatus, TemplateSendResult, WhatsAppResponse
+from ..services.infobip_service import InfobipService
+from ..services.outbound_dispatcher import outbound_dispatcher
+from ..utils.logger import logger
+from ..utils.metrics import metrics
+from .cassette import Cassette, RecordingChatModel, ReplayChatModel, ToolCallRecorder
+from .scripted import ScriptedChatModel, TurnScript
+
+
+class DbCommandCounter(monitoring.CommandListener):
+    """pymongo command listener counting round trips and their duration"""
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self) -> None:
+        self.round_trips = 0
+        self.duration_ms = 0.0
+        self.commands: Dict[str, int] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._add(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._add(event)
+
+    def _add(self, event) -> None:
+        if not self.enabled:
+            return
+        self.round_trips += 1
+        self.duration_ms += event.duration_micros / 1000
+        self.commands[event.command_name] = self.commands.get(event.command_name, 0) + 1
+
+
+# Listeners only apply to clients created after registering them, get_db builds a new client per call
+db_counter = DbCommandCounter()
+monitoring.register(db_counter)
+
+
+class TurnResult(BaseModel):
+    """Measurements of one webhook-to-reply turn"""
+    turn: int
+    text: str
+    replies: List[str]
+    turn_ms: float
+    model_calls: int
+    model_ms: float
+    input_tokens: int
+    output_tokens: int
+    graph_build_ms: float
+    db_round_trips: int
+    db_ms: float
+    db_commands: Dict[str, int]
+    other_ms: float
+    overhead_ms: float
+
+
+class AgentHarness:
+    """
+    Runs scenarios through the webhook with recorded, replayed or scripted chat models.
+
+    A scenario is a dict with an optional "seed" (collection name -> list of
+    documents inserted before the run) and "messages", a list of inbound
+    WhatsApp messages ({"from": phone, "text": text}). In scripted mode a
+    message may also carry the "tools" ([{"name": ..., "args": {...}}]) and
+    the "reply" the fake models play for its turn.
+    """
+
+    def __init__(self, cassette: Cassette, mode: str = "replay"):
+        if mode not in ("record", "replay", "scripted"):
+            raise ValueError(f"Invalid harness mode: {mode}")
+        self.cassette = cassette
+        self.mode = mode
+        self.script = TurnScript()
+        self.sent: List[Dict[str, Any]] = []
+        self._tool_recorder = ToolCallRecorder(cassette)
+        self._patched: Dict[str, Any] = {}
+        self._client = None
+
+    def _model_factory(self, model: str, temperature: float = 0, **kwargs: Any):
+        if self.mode == "record":
+            inner = model_registry.build(model, temperature=temperature, **kwargs)
+            return RecordingChatModel(inner=inner, cassette=self.cassette, model_name=model)
+        if self.mode == "scripted":
+            return ScriptedChatModel(script=self.script, cassette=self.cassette, model_name=model)
+        return ReplayChatModel(cassette=self.cassette, model_name=model)
+
+    def _capture(self, kind: str):
+        sent = self.sent
+
+        def send(service, to: str, content: Any = None, *args, **kwargs) -> WhatsAppResponse:
+            sent.append({"kind": kind, "to": to, "content": content})
+            return WhatsAppResponse(
+                to=to,
+                messageCount=1,
+                messageId=f"harness-{len(sent)}",
+                status=MessageStatus(groupId=1, groupName="PENDING", id=7, name="PENDING_ENROUTE", description="Captured by the harness"),
+            )
+        return send
+
+    def _capture_batch(self):
+        send = self._capture("template")
+
+        def send_batch(service, messages: List[Dict[str, Any]]) -> List[TemplateSendResult]:
+            return [
+                TemplateSendResult(to=message["to"], response=send(service, message["to"], message["template_name"]))
+                for message in messages
+            ]
+        return send_batch
+
+    def _acapture(self, kind: str):
+        send = self._capture(kind)
+
+        async def asend(service, to: str, content: Any = None, *args, **kwargs) -> WhatsAppResponse:
+            return send(service, to, content, *args, **kwargs)
+        return asend
+
+    def install(self) -> None:
+        """Swap the chat models, capture outbound WhatsApp messages and start counting DB commands"""
+        from fastapi.testclient import TestClient
+        from ..main import app
+
+        model_registry.override(self._model_factory)
+        Agent.clear_graph_cache()
+        if self.mode == "record":
+            Agent.callbacks.append(self._tool_recorder)
+
+        for name in ("send_text_message", "send_image_message", "send_template_message"):
+            self._patched[name] = getattr(InfobipService, name)
+            setattr(InfobipService, name, self._capture(name.replace("send_", "").replace("_message", "")))
+        self._patched["send_template_messages"] = InfobipService.send_template_messages
+        InfobipService.send_template_messages = self._capture_batch()
+        for name in ("asend_text_message", "asend_image_message"):
+            self._patched[name] = getattr(InfobipService, name)
+            setattr(InfobipService, name, self._acapture(name.replace("asend_", "").replace("_message", "")))
+        self._patched["mark_as_read"] = InfobipService.mark_as_read
+        InfobipService.mark_as_read = lambda service, message_id: True
+        self._patched["amark_as_read"] = InfobipService.amark_as_read
+
+        async def amark_as_read(service, message_id: str) -> bool:
+            return True
+        InfobipService.amark_as_read = amark_as_read
+
+        # Entered once, so every turn runs on the same event loop (the async MongoDB and HTTP clients are bound to it)
+        self._client = TestClient(app)
+        self._client.__enter__()
+
+    def uninstall(self) -> None:
+        """Restore the real chat models and Infobip client"""
+        if self._client is not None:
+            self._client.__exit__(None, None, None)
+            self._client = None
+        for name, method in self._patched.items():
+            setattr(InfobipService, name, method)
+        self._patched.clear()
+        if self._tool_recorder in Agent.callbacks:
+            Agent.callbacks.remove(self._tool_recorder)
+        model_registry.override(None)
+        Agent.clear_graph_cache()
+        db_counter.enabled = False
+
+    def __enter__(self) -> "AgentHarness":
+        self.install()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.uninstall()
+
+    def reset_db(self, seed: Optional[Dict[str, List[dict]]] = None) -> None:
+        """Drop the scratch database and insert the scenario seed"""
+        db = get_db()
+        db.client.drop_database(DATABASE_NAME)
+        for collection, documents in (seed or {}).items():
+            if documents:
+                db[collection].insert_many([dict(document) for document in documents])
+        answer_cache.clear()
+
+    @staticmethod
+    def webhook_payload(turn: int, message: Dict[str, str]) -> dict:
+        """Infobip inbound webhook payload for a scenario message"""
+        return {
+            "results": [{
+                # Unique per run: replayed scenarios reuse their chats, a repeated ID would make the replies duplicates
+                "messageId": f"harness-in-{turn}-{uuid.uuid4().hex[:8]}",
+                "sender": message["from"],
+                "destination": settings.INFOBIP_WHATSAPP_FROM,
+                "receivedAt": datetime.now(timezone.utc).isoformat(),
+                "event": "MO",
+                "channel": "WHATSAPP",
+                "content": [{"type": "TEXT", "text": message["text"]}],
+            }]
+        }
+
+    def run_turn(self, turn: int, message: Dict[str, Any]) -> TurnResult:
+        """Post one inbound message to the webhook and measure the turn"""
+        calls_before, model_ms_before = self.cassette.model_calls, self.cassette.model_ms
+        input_before, output_before = self.cassette.input_tokens, self.cassette.output_tokens
+        graph_build_before = metrics.total("agent.graph_build_ms")
+        sent_before = len(self.sent)
+        self.script.set(message.get("tools"), message.get("reply"))
+        db_counter.reset()
+        db_counter.enabled = True
+
+        start = time.perf_counter()
+        response = self._client.post("/webhook", json=self.webhook_payload(turn, message))
+        turn_ms = (time.perf_counter() - start) * 1000
+        # The turn ends once its reply is queued, wait for the dispatcher to hand it to the capture
+        outbound_dispatcher.flush()
+        # Streamed runs finish their checkpoint after the reply, before the next turn's model calls
+        self._client.portal.call(Agent.finish_streams)
+        summary_folds.wait()
+        db_counter.enabled = False
+        response.raise_for_status()
+
+        graph_build_ms = metrics.total("agent.graph_build_ms") - graph_build_before
+        model_ms = self.cassette.model_ms - model_ms_before
+        overhead_ms = turn_ms - model_ms
+        return TurnResult(
+            turn=turn,
+            text=message["text"],
+            replies=[str(sent["content"]) for sent in self.sent[sent_before:]],
+            turn_ms=round(turn_ms, 3),
+            model_calls=self.cassette.model_calls - calls_before,
+            model_ms=round(model_ms, 3),
+            input_tokens=self.cassette.input_tokens - input_before,
+            output_tokens=self.cassette.output_tokens - output_before,
+            graph_build_ms=round(graph_build_ms, 3),
+            db_round_trips=db_counter.round_trips,
+            db_ms=round(db_counter.duration_ms, 3),
+            db_commands=dict(db_counter.commands),
+            other_ms=round(overhead_ms - graph_build_ms - db_counter.duration_ms, 3),
+            overhead_ms=round(overhead_ms, 3),
+        )
+
+    def run(self, scenario: Dict[str, Any]) -> List[TurnResult]:
+        """
+        Run a scenario from a clean database.
+
+        Args:
+            scenario: Seed documents and inbound messages
+
+        Returns:
+            List[TurnResult]: Measurements of every turn
+        """
+        self.reset_db(scenario.get("seed"))
+        self.cassette.rewind()
+        results = [self.run_turn(turn, message) for turn, message in enumerate(scenario["messages"])]
+        logger.info(f"Harness {self.mode} run: {len(results)} turns, {self.cassette.model_calls} model calls")
+        return results
@@ -0,0 +1,279 @@
+"""
+Local Infobip WhatsApp stand-in for load and integration testing.
+
+Implements the endpoints InfobipService uses:
+- POST /whatsapp/1/message/text, /image and /template (template requests
+  carry several messages and get a result per message);
+- POST /whatsapp/1/senders/{sender}/message/{message_id}/read;
+- GET /whatsapp/1/senders/{sender}/media/{media_id}, the media download of
+  inbound audio and images.
+
+Every request waits MOCK_INFOBIP_LATENCY_MS (plus up to
+MOCK_INFOBIP_JITTER_MS). A share MOCK_INFOBIP_ERROR_RATE of the send
+requests fails with MOCK_INFOBIP_ERROR_STATUS (429 by default, 5xx for
+server errors). A share MOCK_INFOBIP_REJECT_RATE of the messages of
+template requests is answered as REJECTED. The accepted messages are kept
+per recipient (GET /messages/{to}), GET /stats counts the requests and
+POST /reset clears both.
+
+inbound_payload builds webhook payloads as Infobip posts them (text, image
+and audio, the media pointing at this stand-in), and scripts/load_webhook.py
+sends them to the webhook at a target rate. report_payload builds the
+delivery and seen reports of sent messages.
+
+Run it with:
+    MOCK_INFOBIP_LATENCY_MS=100 uvicorn src.app.devtools.mock_infobip:app --port 8101
+and point the service at it with INFOBIP_BASE_URL=http://localhost:8101
+"""
+
+import os
+import time
+import uuid
+import base64
+import random
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+
+config = {
+    "latency_ms": float(os.getenv("MOCK_INFOBIP_LATENCY_MS", "0")),
+    "jitter_ms": float(os.getenv("MOCK_INFOBIP_JITTER_MS", "0")),
+    "error_rate": float(os.getenv("MOCK_INFOBIP_ERROR_RATE", "0")),
+    "error_status": int(os.getenv("MOCK_INFOBIP_ERROR_STATUS", "429")),
+    "reject_rate": float(os.getenv("MOCK_INFOBIP_REJECT_RATE", "0")),
+}
+
+app = FastAPI(title="Mock Infobip", version="1.0.0")
+stats = {"requests": 0, "errors": 0, "messages": 0, "rejected": 0, "reads": 0, "media": 0}
+# Accepted messages per recipient, in the order they arrived
+outbox: Dict[str, List[Dict[str, Any]]] = {}
+
+PENDING = {"groupId": 1, "groupName": "PENDING", "id": 7, "name": "PENDING_ENROUTE", "description": "Message sent to next instance"}
+REJECTED = {"groupId": 5, "groupName": "REJECTED", "id": 12, "name": "REJECTED_NOT_ENOUGH_CREDITS", "description": "Not enough credits"}
+
+# 1x1 transparent PNG, served for inbound images
+IMAGE_BYTES = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==")
+# Silent OGG page header padded to a few KB, served for inbound audio (the transcription is mocked too)
+AUDIO_BYTES = b"OggS" + bytes(4092)
+
+TEXTS = [
+    "Hola, vi el apartamento en venta, ¿sigue disponible?",
+    "¿Cuánto es la administración?",
+    "¿Tiene parqueadero?",
+    "Quiero vender mi casa en Chapinero",
+    "Son 3 habitaciones y 2 baños, 85 metros",
+    "¿Puedo visitarlo el sábado en la mañana?",
+    "Perfecto, gracias",
+    "¿Aceptan crédito hipotecario?",
+]
+
+
+def configure(**kwargs: Any) -> None:
+    """Change the latency and error injection of a running stand-in (latency_ms, jitter_ms, error_rate, error_status, reject_rate)"""
+    unknown = set(kwargs) - set(config)
+    if unknown:
+        raise ValueError(f"Unknown mock Infobip settings: {', '.join(sorted(unknown))}")
+    config.update(kwargs)
+
+
+def reset() -> None:
+    """Clear the counters and the accepted messages"""
+    for key in stats:
+        stats[key] = 0
+    outbox.clear()
+
+
+def start(port: int, host: str = "127.0.0.1", **kwargs: Any):
+    """
+    Run the stand-in in a background thread, for benchmarks in one process
+
+    Args:
+        port: Port to listen on
+        host: Interface to listen on
+        **kwargs: Initial latency and error injection, as for configure
+
+    Returns:
+        uvicorn.Server: The started server
+    """
+    import uvicorn
+
+    configure(**kwargs)
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def inbound_payload(
+    sender: str,
+    kind: str = "text",
+    text: Optional[str] = None,
+    media_base_url: str = "http://127.0.0.1:8101",
+    destination: Optional[str] = None,
+    message_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Webhook payload of an inbound WhatsApp message, as Infobip posts it
+
+    Args:
+        sender: Phone number of the user
+        kind: text, image or audio
+        text: Text of the message (a random one if not given) or caption of the image
+        media_base_url: Base URL of the stand-in serving the image or audio
+        destination: Business number the message was sent to
+        message_id: ID of the message (a random one if not given)
+
+    Returns:
+        Dict: The webhook payload
+    """
+    message_id = message_id or uuid.uuid4().hex
+    destination = destination or os.getenv("INFOBIP_WHATSAPP_FROM", "573000000000")
+    media_url = f"{media_base_url.rstrip('/')}/whatsapp/1/senders/{destination}/media/{kind}-{message_id}"
+    if kind == "text":
+        content = {"type": "TEXT", "text": text or random.choice(TEXTS)}
+    elif kind == "image":
+        content = {"type": "IMAGE", "url": media_url, "caption": text or ""}
+    elif kind == "audio":
+        content = {"type": "AUDIO", "url": media_url}
+    else:
+        raise ValueError(f"Invalid inbound message kind: {kind}")
+    return {
+        "results": [{
+            "messageId": message_id,
+            "sender": sender,
+            "destination": destination,
+            "receivedAt": datetime.now(timezone.utc).isoformat(),
+            "event": "MO",
+            "channel": "WHATSAPP",
+            "content": [content],
+        }],
+        "messageCount": 1,
+        "pendingMessageCount": 0,
+    }
+
+
+def report_payload(message_ids: List[str], group_name: str = "DELIVERED", permanent: bool = False) -> Dict[str, Any]:
+    """
+    Delivery (or seen) report webhook payload of sent messages, as Infobip posts it
+
+    Args:
+        message_ids: Infobip IDs of the messages
+        group_name: DELIVERED, UNDELIVERABLE, EXPIRED, REJECTED or PENDING; SEEN for a seen report
+        permanent: Whether the error of a failed delivery is permanent
+
+    Returns:
+        Dict: The webhook payload
+    """
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "+0000"
+    if group_name == "SEEN":
+        return {"results": [{"messageId": message_id, "sentAt": now, "seenAt": now} for message_id in message_ids]}
+    group_ids = {"PENDING": 1, "UNDELIVERABLE": 2, "DELIVERED": 3, "EXPIRED": 4, "REJECTED": 5}
+    failed = group_name in ("UNDELIVERABLE", "EXPIRED", "REJECTED")
+    error = (
+        {"groupId": 1, "groupName": "HANDSET_ERRORS", "id": 27, "name": "EC_ABSENT_SUBSCRIBER", "description": "Absent subscriber", "permanent": permanent}
+        if failed else
+        {"groupId": 0, "groupName": "OK", "id": 0, "name": "NO_ERROR", "description": "No Error", "permanent": False}
+    )
+    return {"results": [{
+        "bulkId": None,
+        "messageId": message_id,
+        "to": None,
+        "sentAt": now,
+        "doneAt": now,
+        "messageCount": 1,
+        "status": {"groupId": group_ids[group_name], "groupName": group_name, "id": 5, "name": f"{group_name}_STATUS", "description": group_name.capitalize()},
+        "error": error,
+        "channel": "WHATSAPP",
+    } for message_id in message_ids]}
+
+
+async def _wait() -> None:
+    latency_ms = config["latency_ms"] + random.uniform(0, config["jitter_ms"])
+    if latency_ms:
+        await asyncio.sleep(latency_ms / 1000)
+
+
+async def _send_error() -> Optional[JSONResponse]:
+    """Count the send request, wait its latency and return the injected error, if any"""
+    stats["requests"] += 1
+    await _wait()
+    if random.random() >= config["error_rate"]:
+        return None
+    stats["errors"] += 1
+    status = config["error_status"]
+    message_id = "TOO_MANY_REQUESTS" if status == 429 else "GENERAL_ERROR"
+    return JSONResponse({"requestError": {"serviceException": {"messageId": message_id, "text": f"Injected error {status}"}}}, status_code=status)
+
+
+def _accept(to: str, kind: str, content: Any) -> Dict[str, Any]:
+    stats["messages"] += 1
+    outbox.setdefault(to, []).append({"kind": kind, "content": content})
+    return {"to": to, "messageCount": 1, "messageId": uuid.uuid4().hex, "status": PENDING}
+
+
+@app.post("/whatsapp/1/message/text")
+async def send_text(payload: dict):
+    error = await _send_error()
+    if error:
+        return error
+    return _accept(payload["to"], "text", payload["content"]["text"])
+
+
+@app.post("/whatsapp/1/message/image")
+async def send_image(payload: dict):
+    error = await _send_error()
+    if error:
+        return error
+    return _accept(payload["to"], "image", payload["content"]["mediaUrl"])
+
+
+@app.post("/whatsapp/1/message/template")
+async def send_template(payload: dict):
+    error = await _send_error()
+    if error:
+        return error
+    messages = []
+    for message in payload["messages"]:
+        if random.random() < config["reject_rate"]:
+            stats["rejected"] += 1
+            messages.append({"to": message["to"], "messageCount": 1, "messageId": uuid.uuid4().hex, "status": REJECTED})
+        else:
+            messages.append(_accept(message["to"], "template", message["content"]["templateName"]))
+    return {"messages": messages, "bulkId": uuid.uuid4().hex}
+
+
+@app.post("/whatsapp/1/senders/{sender}/message/{message_id}/read")
+async def mark_as_read(sender: str, message_id: str):
+    stats["reads"] += 1
+    await _wait()
+    return {}
+
+
+@app.get("/whatsapp/1/senders/{sender}/media/{media_id}")
+async def download_media(sender: str, media_id: str):
+    stats["media"] += 1
+    await _wait()
+    if media_id.startswith("audio-"):
+        return Response(AUDIO_BYTES, media_type="audio/ogg")
+    return Response(IMAGE_BYTES, media_type="image/png")
+
+
+@app.get("/messages/{to}")
+async def get_messages(to: str):
+    return outbox.get(to, [])
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "recipients": len(outbox), "config": config}
+
+
+@app.post("/reset")
+async def post_reset():
+    reset()
+    return {"status": "ok"}
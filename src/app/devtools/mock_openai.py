@@ -0,0 +1,126 @@
+"""
+Local OpenAI-compatible stand-in for benchmarking.
+
+Implements POST /v1/chat/completions with a configurable latency and a
+canned reply, so the agent pipeline and the model clients can be
+benchmarked without calling OpenAI. Requests asking for a JSON schema
+response (structured output) get a JSON document matching AgentResponse.
+
+MOCK_OPENAI_MODEL_LATENCY_MS ({"model": ms} as JSON) sets the latency of
+specific models, e.g. to make a primary model slower than its fallback.
+
+MOCK_OPENAI_PROMPT_CACHE=true simulates OpenAI's prompt caching: the usage
+reports as cached the longest prefix of the request (tools, then messages)
+already seen, from 1024 tokens on and in steps of 128 tokens, with tokens
+estimated as 4 characters of the serialised request.
+
+POST /v1/audio/transcriptions answers Whisper requests with
+MOCK_OPENAI_TRANSCRIPTION (verbose_json) after the same latency, for the
+audio messages of the mock Infobip stand-in.
+
+Run it with:
+    MOCK_OPENAI_LATENCY_MS=50 uvicorn src.app.devtools.mock_openai:app --port 8100
+and point the service at it with OPENAI_BASE_URL=http://localhost:8100/v1
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+
+from fastapi import FastAPI, Request
+
+LATENCY_MS = float(os.getenv("MOCK_OPENAI_LATENCY_MS", "0"))
+MODEL_LATENCY_MS = json.loads(os.getenv("MOCK_OPENAI_MODEL_LATENCY_MS") or "{}")
+PROMPT_CACHE = os.getenv("MOCK_OPENAI_PROMPT_CACHE", "false").lower() == "true"
+REPLY = os.getenv("MOCK_OPENAI_REPLY", "¡Hola! Soy Broky, ¿en qué te puedo ayudar?")
+TRANSCRIPTION = os.getenv("MOCK_OPENAI_TRANSCRIPTION", "Hola, quiero agendar una visita al apartamento")
+
+app = FastAPI(title="Mock OpenAI", version="1.0.0")
+stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "transcriptions": 0}
+
+CACHE_MIN_CHARS = 1024 * 4
+CACHE_STEP_CHARS = 128 * 4
+_cached_prefixes: set = set()
+
+
+def _count_tokens(messages: list) -> int:
+    """Rough token count (4 characters per token) used for the usage block"""
+    return sum(len(str(message.get("content") or "")) for message in messages) // 4 + 1
+
+
+def _prompt_cache(body: dict) -> tuple:
+    """Prompt tokens of the serialised request and how many of them a previous request already cached"""
+    serialised = json.dumps(body.get("tools") or [], sort_keys=True, ensure_ascii=False) + "".join(
+        json.dumps(message, sort_keys=True, ensure_ascii=False) for message in body.get("messages", [])
+    )
+    digest = hashlib.sha1()
+    cached_chars = 0
+    position = 0
+    for end in range(CACHE_MIN_CHARS, len(serialised) + 1, CACHE_STEP_CHARS):
+        digest.update(serialised[position:end].encode("utf-8"))
+        position = end
+        key = digest.hexdigest()
+        # Every boundary of a request is stored, so the hits are contiguous from the start
+        if key in _cached_prefixes:
+            cached_chars = end
+        _cached_prefixes.add(key)
+    return len(serialised) // 4, cached_chars // 4
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    latency_ms = MODEL_LATENCY_MS.get(body.get("model"), LATENCY_MS)
+    if latency_ms:
+        await asyncio.sleep(latency_ms / 1000)
+
+    if body.get("response_format", {}).get("type") == "json_schema":
+        content = json.dumps({"type": "text", "message": REPLY}, ensure_ascii=False)
+    else:
+        content = REPLY
+
+    prompt_tokens = _count_tokens(body.get("messages", []))
+    cached_tokens = 0
+    if PROMPT_CACHE:
+        prompt_tokens, cached_tokens = _prompt_cache(body)
+    stats["prompt_tokens"] += prompt_tokens
+    stats["cached_tokens"] += cached_tokens
+    completion_tokens = len(content) // 4 + 1
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        },
+    }
+
+
+@app.post("/v1/audio/transcriptions")
+async def audio_transcriptions(request: Request):
+    # The audio itself is not read, only the multipart body is consumed
+    await request.body()
+    stats["transcriptions"] += 1
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+    return {"task": "transcribe", "language": "spanish", "duration": 3.0, "text": TRANSCRIPTION, "segments": []}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
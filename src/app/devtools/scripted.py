@@ -0,0 +1,112 @@
+"""
+Scripted fake chat model for benchmarks.
+
+Answers every request at once and deterministically, without a cassette or
+any network call, following the script of the current turn:
+- a worker calls the turn's scripted tools it has (all of them in one
+  step), then replies;
+- a supervisor hands the turn to its first worker, then replies once the
+  worker is done;
+- structured output requests (AgentResponse) get the reply.
+
+The harness sets the script from each scenario message ("tools" and
+"reply") before posting it. Synthetic conversations then exercise the
+agents, tools and CRUD layer of every stage without recording them first.
+"""
+
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ConfigDict
+
+from .cassette import _tool_names
+
+DEFAULT_REPLY = "¡Listo! ¿Te puedo ayudar con algo más?"
+STRUCTURED_RESPONSE = "AgentResponse"
+HANDOFF_PREFIX = "transfer_to_"
+
+
+class TurnScript:
+    """Tool calls and reply the scripted models play for the current turn"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tool_calls: List[Dict[str, Any]] = []
+        self.reply = DEFAULT_REPLY
+
+    def set(self, tool_calls: Optional[List[Dict[str, Any]]] = None, reply: Optional[str] = None) -> None:
+        """
+        Script the next turn.
+
+        Args:
+            tool_calls: Tool calls ({"name": ..., "args": {...}}) made by the worker that has the tools
+            reply: Reply of the turn
+        """
+        with self._lock:
+            self.tool_calls = list(tool_calls or [])
+            self.reply = reply or DEFAULT_REPLY
+
+
+def _estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(len(str(message.content)) for message in messages) // 4 + 1
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic fake chat model playing a TurnScript"""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    script: Any
+    cassette: Any
+    model_name: str
+    tool_names: tuple = ()
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Sequence[Any], *, parallel_tool_calls: Optional[bool] = None, **kwargs: Any) -> "ScriptedChatModel":
+        return self.model_copy(update={"tool_names": _tool_names(tools)})
+
+    @staticmethod
+    def _call(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        return {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:24]}", "type": "tool_call"}
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        last_human = max((index for index, message in enumerate(messages) if isinstance(message, HumanMessage)), default=-1)
+        answered = {message.name for message in messages[last_human + 1:] if isinstance(message, ToolMessage)}
+        reply = self.script.reply
+
+        if self.tool_names == (STRUCTURED_RESPONSE,):
+            return AIMessage(content="", tool_calls=[self._call(STRUCTURED_RESPONSE, {"type": "text", "message": reply})])
+
+        handoffs = [name for name in self.tool_names if name.startswith(HANDOFF_PREFIX)]
+        if handoffs:
+            if not any(name.startswith(HANDOFF_PREFIX) for name in answered if name):
+                return AIMessage(content="", tool_calls=[self._call(handoffs[0], {})])
+            return AIMessage(content=reply)
+
+        pending = [
+            call for call in self.script.tool_calls
+            if call["name"] in self.tool_names and call["name"] not in answered
+        ]
+        if pending:
+            return AIMessage(content="", tool_calls=[self._call(call["name"], call.get("args") or {}) for call in pending])
+        return AIMessage(content=reply)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        response = self._respond(messages)
+        input_tokens = _estimate_tokens(messages)
+        output_tokens = _estimate_tokens([response])
+        response.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        response.response_metadata = {"model_name": self.model_name}
+        self.cassette.count(response, 0)
+        return ChatResult(generations=[ChatGeneration(message=response)])
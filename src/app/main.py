@@ -1,11 +1,26 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI
 from pydantic import BaseModel
 from .utils.whatsapp_qr import WhatsAppQRGenerator
 from .services.infobip_service import InfobipService
+from .services.outbound_dispatcher import outbound_dispatcher
 from .services.chat_service import ChatService
 from .core.agents_factory import AgentsFactory
-from .core.agent.main import Agent, AgentResponse
+from .core.agent.main import Agent, AgentResponse, MessageType
+from .core.agent.context import summary_folds
+from .core.agent.turn_context import TurnContext, warm_entities
+from .core.answer_cache import answer_cache, is_cacheable_question
+from .core.stage_events import stage_events
+from .core.usage import BudgetPolicy, stage_of, start_turn
+from .core.fast_path import FastPathAction, FastPathDecision, route as fast_path_route
+from .core.prompts import prompt_registry
+from .core.llm import model_registry
+from .core.model_routes import model_router
+from .config import settings
 from .utils.logger import logger
+from .utils.metrics import metrics
 
 app = FastAPI(
     title="IA Hackaton Broky API",
@@ -13,6 +28,41 @@ app = FastAPI(
     version="1.0.0"
 )
 
+@app.on_event("startup")
+def load_prompts():
+    # Prompts are loaded from the files shipped with the service, the hub is only used to refresh them
+    prompt_registry.load()
+    prompt_registry.start_refresh(settings.PROMPT_REFRESH_INTERVAL)
+
+
+@app.on_event("startup")
+async def configure_blocking_io():
+    # asyncio.to_thread and LangGraph's sync tools use the loop's default executor, sized for many concurrent turns
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.BLOCKING_IO_THREADS, thread_name_prefix="blocking-io")
+    )
+
+
+@app.on_event("startup")
+def start_outbound_resends():
+    # Messages that failed to deliver (per the delivery reports) are sent again in the background
+    outbound_dispatcher.start_resends(settings.OUTBOUND_RESEND_INTERVAL)
+
+
+@app.on_event("shutdown")
+async def close_model_clients():
+    # Streamed runs finish their hand-back hops (and checkpoints) before the model clients close
+    await Agent.finish_streams()
+    model_registry.close()
+    await model_registry.aclose()
+    # Queued replies go out before the Infobip clients close
+    await asyncio.to_thread(outbound_dispatcher.shutdown, settings.OUTBOUND_SHUTDOWN_TIMEOUT)
+    InfobipService.close()
+    await InfobipService.aclose()
+    stage_events.wait()
+    summary_folds.wait()
+
+
 class MessageResponse(BaseModel):
     message: str
     status: str
@@ -32,6 +82,16 @@ async def test_mongo():
         return {"status": "error", "message": f"MongoDB error: {str(e)}"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        **metrics.snapshot(),
+        "model_routes": model_router.status(),
+        "infobip_connections": InfobipService.connection_stats(),
+        "outbound": outbound_dispatcher.stats(),
+    }
+
+
 @app.get("/")
 async def root():
     return {"status": "healthy", "message": "Broky API is running", "version": "1.0.0"}
@@ -40,42 +100,115 @@ async def root():
 @app.post("/webhook")
 async def infobip_webhook(webhook_data: dict):
     logger.info(f"Event received: {webhook_data}")
+    started = time.perf_counter()
+    # Every model call of the turn (Whisper included) is accounted to it
+    usage = start_turn()
     # recibir mensaje de infobip este es el webhook
     infobip_service = InfobipService()
     chat_service = ChatService()
+    # Every blocking step of the turn runs off the event loop, so one worker serves many turns at once
     # Receive message from Infobip
-    message_data = infobip_service.receive_webhook_message(webhook_data)
+    message_data = await infobip_service.areceive_webhook_message(webhook_data)
+    # Let the user know the message is being processed before anything else of the turn
+    await infobip_service.asend_processing_indicator(message_data.get("from"), message_data.get("id"))
+    metrics.observe("webhook.ack_ms", (time.perf_counter() - started) * 1000)
     # Process chat message (5 steps: create chat, get user type, process message type, store message)
-    chat_data = chat_service.process_chat_message(message_data)
+    chat_data = await chat_service.aprocess_chat_message(message_data)
     
     # Extract processed data
     user_type = chat_data["user_type"]
     conversation_history = chat_data["conversation_history"]
     chat_id = chat_data["chat_id"]
+    to = message_data.get("from")
+    # A redelivered webhook or retried turn carries the same message ID, its replies are not sent twice
+    turn_id = message_data.get("id")
+    question = chat_data["latest_message"]
     
-    # Get agent
     context = {"chat_id": chat_id}
-    agent = AgentsFactory.get_agent(user_type, context)
+
+    # Greetings, thanks, confirmations and emoji skip the supervisor
+    fast_path = FastPathDecision()
+    if settings.FAST_PATH_ENABLED:
+        has_history = len(conversation_history) > 1 or bool(chat_data.get("summary"))
+        agent_messages = [message["content"] for message in conversation_history if message["sender"] == "system"]
+        awaiting_answer = bool(agent_messages) and str(agent_messages[-1]).rstrip().endswith("?")
+        fast_path = fast_path_route(question, await AgentsFactory.aget_routing_context(context), has_history, awaiting_answer)
+        if fast_path.intent:
+            metrics.incr("fast_path.decisions", intent=fast_path.intent.value, action=fast_path.action.value)
+    if fast_path.action == FastPathAction.TEMPLATE:
+        await outbound_dispatcher.asend_message(to, AgentResponse(type=MessageType.TEXT, message=fast_path.reply), chat_id, turn_id)
+        await chat_service.asave_agent_response(chat_id, fast_path.reply, usage.snapshot(stage_of(context.get("routing"))))
+        metrics.observe("agent.ttfb_ms", (time.perf_counter() - started) * 1000, agent="FastPath")
+        return MessageResponse(message=fast_path.reply, status="success")
+
+    # Get agent
+    agent = await AgentsFactory.aget_agent(user_type, context)
     # print(f"Using agent: {agent.__class__.__name__}")
 
+    # Buyers' fact questions about the property are answered from the cache without the agent
+    property_id = context["routing"].property_id if context.get("routing") else None
+    use_answer_cache = settings.ANSWER_CACHE_ENABLED and user_type == "buyer" and property_id
+    if use_answer_cache:
+        cached_answer = answer_cache.lookup(property_id, question)
+        if cached_answer:
+            await outbound_dispatcher.asend_message(to, AgentResponse(type=MessageType.TEXT, message=cached_answer), chat_id, turn_id)
+            await chat_service.asave_agent_response(chat_id, cached_answer, usage.snapshot(stage_of(context.get("routing"))))
+            metrics.observe("agent.ttfb_ms", (time.perf_counter() - started) * 1000, agent="AnswerCache")
+            return MessageResponse(message=cached_answer, status="success")
+
     # # Process message with complete conversation context
     agent_context = {
         "conversation_history": conversation_history,
-        "chat_id": chat_id
+        "summary": chat_data.get("summary"),
+        "chat_id": chat_id,
+        # The chat was just loaded and the rest may have been warmed by a stage transition, the tools reuse them
+        "turn": TurnContext(chat_id=chat_id, turn_id=turn_id).prime(chat=chat_data.get("chat"), entries=warm_entities.pop(chat_id))
     }
-    agent_response: AgentResponse = agent.process(agent_context)
+    # Chats over their budget get cheaper models and a shorter context
+    chat = chat_data.get("chat")
+    budget = BudgetPolicy()
+    budget.apply(budget.decide(chat.usage if chat else None), agent_context)
+    agent_name = agent.__class__.__name__
 
-    # # Send response to Infobip
-    infobip_service.send_message(message_data.get("from"), agent_response)
+    async def send_reply(response: AgentResponse):
+        # Queue the response for Infobip, the turn does not wait for the send
+        await outbound_dispatcher.asend_message(to, response, chat_id, turn_id)
+        metrics.observe("agent.ttfb_ms", (time.perf_counter() - started) * 1000, agent=agent_name)
+
+    if agent.has_single_worker() and (fast_path.action == FastPathAction.WORKER or agent.uses_direct_mode()):
+        # Confirmations and single-worker stages go straight to the worker, no routing needed
+        agent_name = f"{agent_name}.direct"
+        agent_response: AgentResponse = await agent.aprocess_direct(agent_context)
+        await send_reply(agent_response)
+    elif settings.AGENT_STREAMING:
+        agent_response = await agent.aprocess_stream(agent_context, on_reply=send_reply)
+    else:
+        agent_response = await agent.aprocess(agent_context)
+        await send_reply(agent_response)
     
     # Save agent response to chat history
-    chat_service.save_agent_response(chat_id, agent_response.message)
+    await chat_service.asave_agent_response(chat_id, agent_response.message, usage.snapshot(stage_of(context.get("routing"))))
+    # The reply is out, older messages that left the window are summarised off the turn
+    summary_folds.start(chat_id)
+    if use_answer_cache and is_cacheable_question(question):
+        # The next buyers asking the same get an answer built from the property, never this (maybe personal) reply
+        # Same property as the lookup, from the routing context
+        cached_property = await asyncio.to_thread(agent_context["turn"].get_property, property_id)
+        answer_cache.store(property_id, question, cached_property)
+    metrics.observe("agent.turn_ms", (time.perf_counter() - started) * 1000, agent=agent_name)
 
     return MessageResponse(
         message=agent_response.message,
         status="success"
     )
 
+# Delivery and seen reports of the messages we sent, configured as the report URL on Infobip
+@app.post("/webhook/delivery-reports")
+async def delivery_reports_webhook(report_data: dict):
+    transitions = InfobipService().parse_delivery_reports(report_data)
+    applied = await asyncio.to_thread(outbound_dispatcher.apply_reports, transitions)
+    return {"status": "success", "reports": len(report_data.get("results") or []), "applied": applied}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
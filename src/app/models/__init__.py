@@ -2,9 +2,10 @@
 
 from .user import User, UserRole, AvailabilitySlot
 from .property import Property, LegalDocument
-from .chat import Chat
+from .chat import Chat, RoutingContext, ConversationSummary
 from .message import Message, MessageType, MessageSender
 from .visit import Visit, VisitStatus
+from .usage import ModelUsage, TurnUsage, ChatUsage
 
 __all__ = [
     "User",
@@ -13,9 +14,14 @@ __all__ = [
     "Property",
     "LegalDocument",
     "Chat",
+    "RoutingContext",
+    "ConversationSummary",
     "Message",
     "MessageType",
     "MessageSender",
     "Visit",
-    "VisitStatus"
+    "VisitStatus",
+    "ModelUsage",
+    "TurnUsage",
+    "ChatUsage"
 ]
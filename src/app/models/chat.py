@@ -1,7 +1,24 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
-from .business_stage import BuyerStage
+from .business_stage import BuyerStage, SellerStage
+from .usage import ChatUsage
+
+
+class RoutingContext(BaseModel):
+    """Denormalised routing data kept on the chat document for agent selection"""
+    role: Optional[str] = Field(None, description="User type used for routing: seller or buyer")
+    property_id: Optional[str] = Field(None, description="Property linked to the chat")
+    seller_stage: Optional[SellerStage] = Field(None, description="Business stage of the linked property")
+    buyer_stage: Optional[BuyerStage] = Field(None, description="Business stage for buyer interactions")
+    version: int = Field(default=0, description="Incremented on every routing update")
+
+
+class ConversationSummary(BaseModel):
+    """Rolling summary of the oldest messages of a chat"""
+    text: str = Field(default="", description="Summary of the folded messages")
+    message_count: int = Field(default=0, description="Number of messages, from the start of the chat, folded into the summary")
+    updated_at: Optional[datetime] = Field(None)
 
 
 class Chat(BaseModel):
@@ -11,6 +28,9 @@ class Chat(BaseModel):
     user_phone: Optional[str] = Field(None, description="User's phone number for quick lookup")
     property_id: Optional[str] = Field(None, description="Related property ID (if applicable)")
     business_stage: Optional[BuyerStage] = Field(None, description="Business stage for buyer interactions")
+    routing: Optional[RoutingContext] = Field(None, description="Denormalised routing context")
+    summary: Optional[ConversationSummary] = Field(None, description="Rolling summary of older messages")
+    usage: Optional[ChatUsage] = Field(None, description="AI model usage accumulated by the chat")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = Field(None)
     is_active: bool = Field(default=True, description="Chat is active")
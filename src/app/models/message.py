@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 from enum import Enum
+from .usage import TurnUsage
 
 
 class MessageType(str, Enum):
@@ -24,6 +25,7 @@ class Message(BaseModel):
     content: str = Field(..., description="Message content")
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     is_read: bool = Field(default=False, description="Message read status")
+    usage: Optional[TurnUsage] = Field(None, description="AI model usage of the turn (agent replies)")
 
     class Config:
         populate_by_name = True
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from typing import Dict
+
+
+class ModelUsage(BaseModel):
+    """Calls, tokens, latency and cost spent on AI models"""
+    calls: int = Field(default=0, description="Number of model calls")
+    input_tokens: int = Field(default=0, description="Prompt tokens")
+    cached_input_tokens: int = Field(default=0, description="Prompt tokens read from the provider's prompt cache")
+    output_tokens: int = Field(default=0, description="Completion tokens")
+    units: float = Field(default=0, description="Non-token units billed (audio seconds, images)")
+    latency_ms: float = Field(default=0, description="Time spent waiting for the models")
+    cost_usd: float = Field(default=0, description="Estimated cost in USD")
+
+    def add(self, other: "ModelUsage") -> None:
+        """Add another usage to this one"""
+        for field in ModelUsage.model_fields:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+
+class TurnUsage(ModelUsage):
+    """Model usage of one turn, stored on the agent's reply"""
+    stage: str = Field(default="", description="Business stage (or agent) that handled the turn")
+    models: Dict[str, ModelUsage] = Field(default_factory=dict, description="Usage per model")
+
+
+class ChatUsage(ModelUsage):
+    """Model usage accumulated by a chat, stored on the chat document"""
+    turns: int = Field(default=0, description="Turns that used a model")
+    stages: Dict[str, ModelUsage] = Field(default_factory=dict, description="Usage per business stage")
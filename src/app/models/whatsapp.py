@@ -1,5 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from enum import Enum, IntEnum
+import hashlib
+import json
 
 class MessageStatus(BaseModel):
     """Model for message status"""
@@ -16,15 +20,122 @@ class WhatsAppResponse(BaseModel):
     messageId: str = Field(..., description="Unique message identifier")
     status: MessageStatus = Field(..., description="Message status information")
 
+    @property
+    def rejected(self) -> bool:
+        """Whether Infobip refused the message instead of accepting it for delivery"""
+        return self.status.groupName in ("REJECTED", "UNDELIVERABLE")
+
 
 class WhatsAppTemplateResponse(BaseModel):
     """Model for WhatsApp template message response from Infobip"""
     messages: List[WhatsAppResponse] = Field(..., description="List of sent messages")
+    bulkId: Optional[str] = Field(None, description="ID of the request when it had several messages")
+
+
+class TemplateSendResult(BaseModel):
+    """Result of one message of a batched template request"""
+    to: str = Field(..., description="Recipient phone number")
+    response: Optional[WhatsAppResponse] = Field(None, description="Infobip's result for the message")
+    error: Optional[str] = Field(None, description="Why the message was not accepted")
+    retryable: bool = Field(default=False, description="Whether sending the message again may work")
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 
 class WhatsAppError(Exception):
     """Exception for WhatsApp errors"""
-    def __init__(self, **kwargs):
+    def __init__(self, status_code: Optional[int] = None, **kwargs):
+        self.status_code = status_code
         self.request_error = kwargs.get('requestError', kwargs)
         error_message = f"WhatsApp API Error: {self.request_error}"
         super().__init__(error_message)
+
+    @property
+    def retryable(self) -> bool:
+        """Whether Infobip may accept the same request later (throttled or server error)"""
+        return self.status_code is not None and (self.status_code == 429 or self.status_code >= 500)
+
+
+class OutboundKind(str, Enum):
+    TEXT = "text"
+    IMAGE = "image"
+    TEMPLATE = "template"
+
+
+class DeliveryStatus(IntEnum):
+    """
+    Delivery status of a sent message, stored as its int. Statuses only move
+    up, so a report arriving late never moves a message back.
+    """
+    SENT = 1
+    FAILED = 2
+    DELIVERED = 3
+    SEEN = 4
+
+    @property
+    def timestamp_field(self) -> str:
+        """Field of the message record holding when it reached this status"""
+        return f"{self.name.lower()}_at"
+
+    @classmethod
+    def from_group(cls, group_name: str) -> Optional["DeliveryStatus"]:
+        """Status of an Infobip status group, None for PENDING (no news)"""
+        if group_name == "DELIVERED":
+            return cls.DELIVERED
+        if group_name in ("UNDELIVERABLE", "EXPIRED", "REJECTED"):
+            return cls.FAILED
+        return None
+
+
+class StatusTransition(BaseModel):
+    """Status change of a sent message, from a delivery or seen report"""
+    message_id: str = Field(..., description="Infobip message ID")
+    status: DeliveryStatus = Field(..., description="New status")
+    at: datetime = Field(..., description="When the message reached the status (UTC)")
+    error_code: Optional[int] = Field(None, description="Infobip error ID of a failed message")
+    permanent: bool = Field(default=False, description="Whether sending the message again cannot work")
+
+
+class OutboundMessage(BaseModel):
+    """WhatsApp message queued for the outbound dispatcher"""
+    to: str = Field(..., description="Recipient phone number")
+    kind: OutboundKind = Field(..., description="Message type")
+    content: Optional[str] = Field(None, description="Text, or media URL of an image message")
+    template_name: Optional[str] = Field(None, description="Template name of a template message")
+    language: str = Field(default="es", description="Template language")
+    template_data: Optional[Dict[str, Any]] = Field(None, description="Data to fill the template")
+    chat_id: Optional[str] = Field(None, description="Chat the message belongs to, if any")
+    turn_id: Optional[str] = Field(None, description="Inbound message the turn that sent it answered, if any")
+    idempotency_key: Optional[str] = Field(None, description="Key given by the sender, messages with the same key are sent once")
+    resend_of: Optional[str] = Field(None, description="Infobip message ID of the undelivered message this one resends")
+    resends: int = Field(default=0, description="Times the message was resent after failing to deliver")
+    attempts: int = Field(default=0, description="Send attempts so far")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    @property
+    def key(self) -> Optional[str]:
+        """Idempotency key: the given one or, for a message sent by a turn, one derived from its content"""
+        if self.idempotency_key or not self.turn_id:
+            return self.idempotency_key
+        return idempotency_key(
+            self.chat_id or self.to, self.turn_id,
+            self.kind.value, self.content, self.template_name, self.language, self.template_data,
+        )
+
+
+def idempotency_key(scope: str, turn_id: str, *content: Any) -> str:
+    """
+    Deterministic idempotency key of an outbound message
+
+    Args:
+        scope: Chat (or recipient) the message belongs to
+        turn_id: Inbound message the turn answered
+        *content: What identifies the message within the turn
+
+    Returns:
+        str: The key, the same for the same scope, turn and content
+    """
+    serialised = json.dumps([scope, turn_id, *content], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serialised.encode("utf-8")).hexdigest()
@@ -1,15 +1,18 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
+import asyncio
 import re
 from ..models.user import User
 from ..models.property import Property
 from ..models.message import MessageSender, MessageType, Message
-from ..models.chat import Chat
-from ..core.database import get_db
-from ..core.crud.chat_crud import ChatCRUD
+from ..models.chat import Chat, RoutingContext
+from ..models.usage import TurnUsage
+from ..core.database import get_db, get_async_db
+from ..core.crud.chat_crud import ChatCRUD, AsyncChatCRUD
 from ..core.crud.user_crud import UserCRUD
-from ..core.crud.message_crud import MessageCRUD
+from ..core.crud.message_crud import MessageCRUD, AsyncMessageCRUD, to_message
 from ..core.crud.property_crud import PropertyCRUD
+from .stage_service import StageService
 from ..utils.logger import logger
 
 
@@ -46,9 +49,49 @@ class ChatService:
             }
             
         Returns:
-            Dict containing user_type, latest message, and conversation history
+            Dict containing user_type, latest message, conversation history and the chat
         """
         logger.info("Processing chat message")
+        user_type, chat = self.resolve_chat(message_data)
+        
+        # Step 5: Store the message
+        stored_message = self.message_crud.add_message(chat.id, message_data)
+        
+        # Step 6: Get full conversation history for agent context with sender info
+        messages = self.message_crud.get_messages_by_chat(chat.id)
+        return self._chat_context(user_type, chat, stored_message, messages)
+    
+    async def aprocess_chat_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async version of process_chat_message for the webhook: the user and
+        chat lookups run in a worker thread, the message is stored and the
+        conversation history read with the async driver
+        
+        Args:
+            message_data: Processed message data from Infobip
+            
+        Returns:
+            Dict containing user_type, latest message, conversation history and the chat
+        """
+        logger.info("Processing chat message (async)")
+        user_type, chat = await asyncio.to_thread(self.resolve_chat, message_data)
+        
+        message_crud = AsyncMessageCRUD(get_async_db())
+        stored_message = await message_crud.add_message(chat.id, message_data)
+        messages = await message_crud.get_messages_by_chat(chat.id)
+        return self._chat_context(user_type, chat, stored_message, messages)
+    
+    def resolve_chat(self, message_data: Dict[str, Any]) -> Tuple[str, Chat]:
+        """
+        Steps 1 to 4 of process_chat_message: get or create the user and the
+        chat, and resolve the user type and routing context of the chat
+        
+        Args:
+            message_data: Processed message data from Infobip
+            
+        Returns:
+            Tuple[str, Chat]: The user type and the chat
+        """
         # Step 1: Get or create user first
         user_phone = message_data.get("from", "")
         user = self.user_crud.get_or_create_user(user_phone)
@@ -71,6 +114,7 @@ class ChatService:
         message_content = message_data.get("content", {}).get("text", "")
         property_inquiry_pattern = r"¡Hola! 🏠 Me gustaría obtener información sobre la propiedad ubicada en (.+)"
         match = re.search(property_inquiry_pattern, message_content, re.IGNORECASE)
+        routing_update = {}
         
         if match:
             # Extract property address
@@ -84,13 +128,23 @@ class ChatService:
                 update_data = {"property_id": property_obj.id}
                 self.chat_crud.update_chat(chat.id, update_data)
                 user_type = "buyer"
+                chat.property_id = property_obj.id
+                routing_update["property_id"] = property_obj.id
         
+        # Keep the denormalised routing context in sync with the role and property
+        routing_update["role"] = user_type
+        # The chat primes the turn context, it keeps the routing just stored
+        if chat.routing is None:
+            chat.routing = StageService().rebuild_routing_context(chat.id, role=user_type)
+        elif any(getattr(chat.routing, key) != value for key, value in routing_update.items()):
+            self.chat_crud.update_routing_context(chat.id, **routing_update)
+            chat.routing = chat.routing.model_copy(update={**routing_update, "version": chat.routing.version + 1})
         
-        # Step 5: Store the message
-        stored_message = self.message_crud.add_message(chat.id, message_data)
-        
-        # Step 6: Get full conversation history for agent context with sender info
-        messages = self.message_crud.get_messages_by_chat(chat.id)
+        return user_type, chat
+    
+    @staticmethod
+    def _chat_context(user_type: str, chat: Chat, stored_message: Message, messages: List[Message]) -> Dict[str, Any]:
+        """Structured data with the full context for agent processing"""
         conversation_history = [
             {
                 "content": msg.content,
@@ -99,13 +153,13 @@ class ChatService:
             }
             for msg in messages
         ]
-
-        
         return {
             "user_type": user_type,
             "latest_message": stored_message.content,
             "conversation_history": conversation_history,
-            "chat_id": chat.id
+            "summary": chat.summary,
+            "chat_id": chat.id,
+            "chat": chat
         }
 
     
@@ -146,19 +200,41 @@ class ChatService:
         }
 
     
-    def save_agent_response(self, chat_id: str, agent_response: str) -> Message:
+    def save_agent_response(self, chat_id: str, agent_response: str, usage: Optional[TurnUsage] = None) -> Message:
         """
         Save the agent's response to the chat
         
         Args:
             chat_id: ID of the chat to save the response to
             agent_response: The agent's response text
+            usage: Model usage of the turn, also added to the chat totals
             
         Returns:
             Message: The saved message object
         """
         logger.info(f"Saving agent response to chat {chat_id}")
-        # Create message document for agent response
+        message_doc = self._agent_message(chat_id, agent_response, usage)
+        if "usage" in message_doc:
+            self.chat_crud.add_usage(chat_id, usage)
+        
+        # Insert into MongoDB
+        result = self.message_crud.collection.insert_one(message_doc)
+        return to_message({**message_doc, "_id": result.inserted_id})
+    
+    async def asave_agent_response(self, chat_id: str, agent_response: str, usage: Optional[TurnUsage] = None) -> Message:
+        """
+        Async version of save_agent_response for the webhook
+        """
+        logger.info(f"Saving agent response to chat {chat_id}")
+        db = get_async_db()
+        message_doc = self._agent_message(chat_id, agent_response, usage)
+        if "usage" in message_doc:
+            await AsyncChatCRUD(db).add_usage(chat_id, usage)
+        return await AsyncMessageCRUD(db).insert_message(message_doc)
+    
+    @staticmethod
+    def _agent_message(chat_id: str, agent_response: str, usage: Optional[TurnUsage] = None) -> Dict[str, Any]:
+        """Message document of an agent reply"""
         message_doc = {
             "chat_id": chat_id,
             "sender": MessageSender.SYSTEM.value,
@@ -166,21 +242,10 @@ class ChatService:
             "content": agent_response,
             "timestamp": datetime.utcnow()
         }
-        
-        # Insert into MongoDB
-        result = self.message_crud.collection.insert_one(message_doc)
-        
-        # Return Message object with generated ID
-        message = Message(
-            id=str(result.inserted_id),
-            chat_id=chat_id,
-            sender=MessageSender.SYSTEM,
-            type=MessageType.TEXT,
-            content=agent_response,
-            timestamp=message_doc["timestamp"]
-        )
-        
-        return message
+        # Turns answered without any model (templates, cached answers) carry no usage
+        if usage is not None and usage.calls:
+            message_doc["usage"] = usage.model_dump()
+        return message_doc
 
 
     
@@ -278,16 +343,29 @@ class ChatService:
         logger.info(f"Getting chat by id {chat_id}")
         return self.chat_crud.get_chat_by_id(chat_id)
     
-    def update_chat(self, chat_id: str, update_data: Dict[str, Any]) -> bool:
+    def update_chat(self, chat_id: str, update_data: Dict[str, Any], routing: Optional[RoutingContext] = None) -> bool:
         """
         Update chat with arbitrary fields
         
         Args:
             chat_id: ID of the chat
             update_data: Dictionary with fields to update
+            routing: Routing context currently stored on the chat, if the caller has it;
+                the routing is then only updated when the linked property changes
             
         Returns:
             bool: True if updated successfully, False otherwise
         """
         logger.info(f"Updating chat {chat_id} with {update_data}")
-        return self.chat_crud.update_chat(chat_id, update_data)
+        success = self.chat_crud.update_chat(chat_id, update_data)
+        
+        # Linking a property changes the seller stage used for routing
+        property_id = update_data.get("property_id")
+        if success and property_id and (routing is None or routing.property_id != property_id):
+            seller_stage = self.property_crud.get_property_stage(property_id)
+            routing_update = {"property_id": property_id, "seller_stage": seller_stage}
+            if routing is not None:
+                routing_update = {key: value for key, value in routing_update.items() if getattr(routing, key) != value}
+            self.chat_crud.update_routing_context(chat_id, **routing_update)
+        
+        return success
@@ -1,25 +1,83 @@
+"""
+Infobip WhatsApp API client.
+
+Every request goes through one pooled, keep-alive HTTP client per process
+(and one async client per event loop). So outbound messages, read receipts
+and media downloads reuse open connections to Infobip instead of doing a TCP
+and TLS handshake each time. The auth headers are set once on the clients.
+Connection failures are retried by the transport (INFOBIP_CONNECT_RETRIES),
+so a request is never repeated once it reached Infobip.
+
+Every request and every new connection is counted (infobip.http_requests
+and infobip.http_connections on /metrics), connection_stats() reports the
+share of requests served on a reused connection.
+"""
+
 import os
-import requests
+import asyncio
+import threading
+import httpx
 import logging
 import tempfile
-from typing import Dict, Any, Optional
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
 from urllib.parse import urlparse
 from ..config import settings
 from ..models.whatsapp import (
     WhatsAppResponse,
     WhatsAppTemplateResponse,
-    WhatsAppError
+    WhatsAppError,
+    TemplateSendResult,
+    DeliveryStatus,
+    StatusTransition
 )
 from ..utils.openai import OpenIA
 
 from ..utils.logger import logger
+from ..utils.metrics import metrics
+
+CONNECT_EVENT = "connection.connect_tcp.complete"
+
+
+def _base_url() -> str:
+    """Infobip base URL, https unless the configured one has a scheme (e.g. a local stand-in)"""
+    base_url = settings.INFOBIP_BASE_URL.rstrip("/")
+    return base_url if urlparse(base_url).scheme else f"https://{base_url}"
+
+
+def _trace(kind: str):
+    def trace(event: str, info: Dict[str, Any]) -> None:
+        if event == CONNECT_EVENT:
+            metrics.incr("infobip.http_connections", client=kind)
+    return trace
+
+
+async def _atrace(event: str, info: Dict[str, Any]) -> None:
+    if event == CONNECT_EVENT:
+        metrics.incr("infobip.http_connections", client="async")
+
+
+def _on_request(request: httpx.Request) -> None:
+    metrics.incr("infobip.http_requests", client="sync")
+    request.extensions["trace"] = _trace("sync")
+
+
+async def _aon_request(request: httpx.Request) -> None:
+    metrics.incr("infobip.http_requests", client="async")
+    request.extensions["trace"] = _atrace
+
 
 class InfobipService:
     """Service for interacting with Infobip WhatsApp API"""
     
+    _client: Optional[httpx.Client] = None
+    _client_lock = threading.Lock()
+    _async_client: Optional[httpx.AsyncClient] = None
+    _async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+    
     def __init__(self):
         self.api_key = settings.INFOBIP_API_KEY
-        self.base_url = f"https://{settings.INFOBIP_BASE_URL}"
+        self.base_url = _base_url()
         self.whatsapp_from = settings.INFOBIP_WHATSAPP_FROM
         self.mapper_send_message = {
             "text": self.send_text_message,
@@ -36,14 +94,116 @@ class InfobipService:
         if not self.whatsapp_from:
             raise ValueError("INFOBIP_WHATSAPP_FROM is not configured")
     
-    def _get_headers(self) -> Dict[str, str]:
+    @staticmethod
+    def _get_headers() -> Dict[str, str]:
         """Get the necessary headers for Infobip requests"""
         return {
-            "Authorization": f"App {self.api_key}",
+            "Authorization": f"App {settings.INFOBIP_API_KEY}",
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
 
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.INFOBIP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.INFOBIP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.INFOBIP_KEEPALIVE_EXPIRY,
+        )
+
+    @classmethod
+    def _client_kwargs(cls) -> Dict[str, Any]:
+        return {
+            "base_url": _base_url(),
+            "headers": cls._get_headers(),
+            "timeout": httpx.Timeout(settings.INFOBIP_TIMEOUT, connect=settings.INFOBIP_CONNECT_TIMEOUT),
+        }
+
+    @classmethod
+    def client(cls) -> httpx.Client:
+        """Shared sync HTTP client, pooled and keep-alive, used by every instance"""
+        if cls._client is None or cls._client.is_closed:
+            with cls._client_lock:
+                if cls._client is None or cls._client.is_closed:
+                    cls._client = httpx.Client(
+                        transport=httpx.HTTPTransport(limits=cls._limits(), retries=settings.INFOBIP_CONNECT_RETRIES),
+                        event_hooks={"request": [_on_request]},
+                        **cls._client_kwargs(),
+                    )
+        return cls._client
+
+    @classmethod
+    def async_client(cls) -> httpx.AsyncClient:
+        """Shared async HTTP client, so concurrent turns reuse its connection pool (one per event loop)"""
+        loop = asyncio.get_running_loop()
+        if cls._async_client is None or cls._async_client.is_closed or cls._async_client_loop is not loop:
+            cls._async_client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(limits=cls._limits(), retries=settings.INFOBIP_CONNECT_RETRIES),
+                event_hooks={"request": [_aon_request]},
+                **cls._client_kwargs(),
+            )
+            cls._async_client_loop = loop
+        return cls._async_client
+
+    @classmethod
+    def close(cls) -> None:
+        """Close the shared sync HTTP client"""
+        with cls._client_lock:
+            if cls._client is not None:
+                cls._client.close()
+                cls._client = None
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close the shared async HTTP client"""
+        if cls._async_client is not None:
+            await cls._async_client.aclose()
+            cls._async_client = None
+
+    @staticmethod
+    def connection_stats() -> Dict[str, Dict[str, Any]]:
+        """Requests, new connections and share of requests on a reused connection, per client"""
+        stats = {}
+        for kind in ("sync", "async"):
+            requests = metrics.counter("infobip.http_requests", client=kind)
+            connections = metrics.counter("infobip.http_connections", client=kind)
+            stats[kind] = {
+                "requests": int(requests),
+                "connections": int(connections),
+                "reuse_ratio": round(max(requests - connections, 0) / requests, 3) if requests else None,
+            }
+        return stats
+
+    def _text_payload(self, to: str, text: str) -> Dict[str, Any]:
+        return {
+            "from": self.whatsapp_from,
+            "to": to,
+            "content": {
+                "text": text
+            }
+        }
+
+    def _image_payload(self, to: str, image_url: str) -> Dict[str, Any]:
+        return {
+            "from": self.whatsapp_from,
+            "to": to,
+            "content": {
+                "mediaUrl": image_url,
+            }
+        }
+
+    @staticmethod
+    def _parse_send_response(response: httpx.Response, error_message: str) -> WhatsAppResponse:
+        """Parse the response of a send request, raising WhatsAppError on failure"""
+        if response.status_code == 200:
+            return WhatsAppResponse(**response.json())
+        try:
+            error_data = response.json()
+        except:
+            error_data = {"error": f"HTTP {response.status_code}: {response.text}"}
+        logger.error(f"{error_message}: {error_data}")
+        raise WhatsAppError(status_code=response.status_code, **error_data)
+
     def send_message(self, to: str, message: Dict[str, Any]) -> WhatsAppResponse:
         """
         Send a message according to the type of message
@@ -64,34 +224,120 @@ class InfobipService:
         """
         logger.info(f"Sending text message to {to}")
         try:
-            message_data = {
-                "from": self.whatsapp_from,
-                "to": to,
-                "content": {
-                    "text": text
-                }
-            }
-
-            response = requests.post(
-                f"{self.base_url}/whatsapp/1/message/text",
-                headers=self._get_headers(),
-                json=message_data,
-                timeout=30.0
+            response = self.client().post(
+                "/whatsapp/1/message/text",
+                json=self._text_payload(to, text)
             )
-            if response.status_code == 200:
-                return WhatsAppResponse(**response.json())
-            else:
-                try:
-                    error_data = response.json()
-                except:
-                    error_data = {"error": f"HTTP {response.status_code}: {response.text}"}
-                logger.error(f"Error sending message: {error_data}")
-                raise WhatsAppError(**error_data)
+            return self._parse_send_response(response, "Error sending message")
                 
         except Exception as e:
             logger.error(f"Error in send_text_message: {str(e)}")
             raise
     
+    def mark_as_read(self, message_id: str) -> bool:
+        """
+        Mark an inbound message as read, so the user sees it is being processed
+        
+        Args:
+            message_id: ID of the inbound message
+            
+        Returns:
+            bool: True if Infobip accepted the request, False otherwise
+        """
+        logger.info(f"Marking message {message_id} as read")
+        try:
+            response = self.client().post(
+                f"/whatsapp/1/senders/{self.whatsapp_from}/message/{message_id}/read",
+                timeout=10.0
+            )
+            return response.status_code < 300
+        except Exception as e:
+            logger.error(f"Error in mark_as_read: {str(e)}")
+            return False
+    
+    def send_processing_indicator(self, to: str, message_id: Optional[str]) -> None:
+        """
+        Let the user know the message is being processed: mark it as read and,
+        if PROCESSING_MESSAGE is configured, send it as a short text
+        
+        Args:
+            to: Recipient phone number
+            message_id: ID of the inbound message being processed
+        """
+        if message_id:
+            self.mark_as_read(message_id)
+        if settings.PROCESSING_MESSAGE:
+            try:
+                self.send_text_message(to, settings.PROCESSING_MESSAGE)
+            except Exception as e:
+                logger.error(f"Error sending processing message: {str(e)}")
+    
+    async def asend_message(self, to: str, message: Dict[str, Any]) -> WhatsAppResponse:
+        """
+        Async version of send_message, for the webhook
+        """
+        logger.info(f"Sending message to {to}")
+        if message.type == "image":
+            return await self.asend_image_message(to, message.message)
+        return await self.asend_text_message(to, message.message)
+    
+    async def asend_text_message(self, to: str, text: str) -> WhatsAppResponse:
+        """
+        Async version of send_text_message
+        """
+        logger.info(f"Sending text message to {to}")
+        try:
+            response = await self.async_client().post(
+                "/whatsapp/1/message/text",
+                json=self._text_payload(to, text)
+            )
+            return self._parse_send_response(response, "Error sending message")
+        except Exception as e:
+            logger.error(f"Error in asend_text_message: {str(e)}")
+            raise
+    
+    async def asend_image_message(self, to: str, image_url: str) -> WhatsAppResponse:
+        """
+        Async version of send_image_message
+        """
+        logger.info(f"Sending image message to {to}")
+        try:
+            response = await self.async_client().post(
+                "/whatsapp/1/message/image",
+                json=self._image_payload(to, image_url)
+            )
+            return self._parse_send_response(response, "Error sending image")
+        except Exception as e:
+            logger.error(f"Error in asend_image_message: {str(e)}")
+            raise
+    
+    async def amark_as_read(self, message_id: str) -> bool:
+        """
+        Async version of mark_as_read
+        """
+        logger.info(f"Marking message {message_id} as read")
+        try:
+            response = await self.async_client().post(
+                f"/whatsapp/1/senders/{self.whatsapp_from}/message/{message_id}/read",
+                timeout=10.0
+            )
+            return response.status_code < 300
+        except Exception as e:
+            logger.error(f"Error in amark_as_read: {str(e)}")
+            return False
+    
+    async def asend_processing_indicator(self, to: str, message_id: Optional[str]) -> None:
+        """
+        Async version of send_processing_indicator
+        """
+        if message_id:
+            await self.amark_as_read(message_id)
+        if settings.PROCESSING_MESSAGE:
+            try:
+                await self.asend_text_message(to, settings.PROCESSING_MESSAGE)
+            except Exception as e:
+                logger.error(f"Error sending processing message: {str(e)}")
+    
     def send_image_message(self, to: str, image_url: str) -> WhatsAppResponse:
         """
         Send an image message via WhatsApp
@@ -106,35 +352,67 @@ class InfobipService:
         """
         logger.info(f"Sending image message to {to}")
         try:
-            message_data = {
-                "from": self.whatsapp_from,
-                "to": to,
-                "content": {
-                    "mediaUrl": image_url,
-                }
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/whatsapp/1/message/image",
-                headers=self._get_headers(),
-                json=message_data,
-                timeout=30.0
+            response = self.client().post(
+                "/whatsapp/1/message/image",
+                json=self._image_payload(to, image_url)
             )
             
-            if response.status_code == 200:
-                return WhatsAppResponse(**response.json())
-            else:
-                try:
-                    error_data = response.json()
-                except:
-                    error_data = {"error": f"HTTP {response.status_code}: {response.text}"}
-                logger.error(f"Error sending image: {error_data}")
-                raise WhatsAppError(**error_data)
+            return self._parse_send_response(response, "Error sending image")
                 
         except Exception as e:
             logger.error(f"Error in send_image_message: {str(e)}")
             raise
     
+    def _template_message(
+        self,
+        to: str,
+        template_name: str,
+        language: str = "es",
+        template_data: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Build one entry of the template endpoint's messages array, raising ValueError on invalid placeholders"""
+        template_data = template_data or {}
+        header = {}
+        template_request = {}
+        if template_data.get("image"):
+            header = {"type": "IMAGE", "mediaUrl": template_data.get("image")}
+
+        placeholders = template_data.get("placeholders", [])
+        if not all(plh for plh in placeholders):
+            raise ValueError("Placeholders not valid and/or empty")
+        
+        template_request["body"] = {"placeholders": placeholders}
+        if header:
+            template_request["header"] = header
+
+        if template_data.get("buttons"):
+            buttons = template_data.get("buttons")
+            template_request["buttons"] = buttons
+
+        return {
+            "from": self.whatsapp_from,
+            "to": to,
+            "content": {
+                "templateName": template_name,
+                "language": language,
+                "templateData": template_request
+            }
+        }
+
+    def _post_templates(self, messages: List[Dict[str, Any]]) -> WhatsAppTemplateResponse:
+        response = self.client().post(
+            "/whatsapp/1/message/template",
+            json={"messages": messages}
+        )
+        if response.status_code == 200:
+            return WhatsAppTemplateResponse(**response.json())
+        try:
+            error_data = response.json()
+        except:
+            error_data = {"error": f"HTTP {response.status_code}: {response.text}"}
+        logger.error(f"Error sending template: {error_data}")
+        raise WhatsAppError(status_code=response.status_code, **error_data)
+
     def send_template_message(
         self, 
         to: str, 
@@ -156,58 +434,64 @@ class InfobipService:
         """
         logger.info(f"Sending template message to {to}")
         try:
-            header = {}
-            template_request = {}
-            if template_data.get("image"):
-                header = {"type": "IMAGE", "mediaUrl": template_data.get("image")}
-
-            placeholders = template_data.get("placeholders", [])
-            if not all(plh for plh in placeholders):
-                raise ValueError("Placeholders not valid and/or empty")
-            
-            template_request["body"] = {"placeholders": placeholders}
-            if header:
-                template_request["header"] = header
-
-            if template_data.get("buttons"):
-                buttons = template_data.get("buttons")
-                template_request["buttons"] = buttons
-
-            message_data = {
-                "messages": [
-                    {
-                        "from": self.whatsapp_from,
-                        "to": to,
-                        "content": {
-                            "templateName": template_name,
-                            "language": language,
-                            "templateData": template_request
-                        }
-                    }
-                ]
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/whatsapp/1/message/template",
-                headers=self._get_headers(),
-                json=message_data,
-                timeout=30.0
-            )
-            if response.status_code == 200:
-                return WhatsAppTemplateResponse(**response.json())
-            else:
-                try:
-                    error_data = response.json()
-                except:
-                    error_data = {"error": f"HTTP {response.status_code}: {response.text}"}
-                logger.error(f"Error sending template: {error_data}")
-                raise WhatsAppError(**error_data)
-                
+            return self._post_templates([self._template_message(to, template_name, language, template_data)])
         except Exception as e:
             logger.error(f"Error in send_template_message: {str(e)}")
             raise
 
-    
+    def send_template_messages(self, messages: List[Dict[str, Any]]) -> List[TemplateSendResult]:
+        """
+        Send several template messages in one request (up to INFOBIP_TEMPLATE_BATCH_SIZE)
+        
+        Args:
+            messages: Messages with "to", "template_name", "language" and "template_data"
+            
+        Returns:
+            List[TemplateSendResult]: Result of every message, in the same order. Messages with
+            invalid placeholders are not sent, the ones Infobip rejected or left out are retryable.
+            Raises WhatsAppError if the whole request fails.
+        """
+        logger.info(f"Sending {len(messages)} template messages")
+        results: List[Optional[TemplateSendResult]] = [None] * len(messages)
+        entries, positions = [], []
+        for index, message in enumerate(messages):
+            try:
+                entries.append(self._template_message(
+                    message["to"], message["template_name"], message.get("language", "es"), message.get("template_data")
+                ))
+                positions.append(index)
+            except ValueError as e:
+                results[index] = TemplateSendResult(to=message["to"], error=str(e))
+        if not entries:
+            return results
+
+        try:
+            sent = self._post_templates(entries).messages
+        except Exception as e:
+            logger.error(f"Error in send_template_messages: {str(e)}")
+            raise
+
+        # Infobip answers in request order, matched by recipient in case it does not
+        by_recipient: Dict[str, List[WhatsAppResponse]] = {}
+        for reply in sent:
+            by_recipient.setdefault(reply.to, []).append(reply)
+        for position, index in enumerate(positions):
+            to = messages[index]["to"]
+            reply = sent[position] if position < len(sent) and sent[position].to == to else None
+            if reply is not None:
+                by_recipient[to].remove(reply)
+            elif by_recipient.get(to):
+                reply = by_recipient[to].pop(0)
+            if reply is None:
+                results[index] = TemplateSendResult(to=to, error="No result returned for the message", retryable=True)
+            elif reply.rejected:
+                results[index] = TemplateSendResult(
+                    to=to, response=reply, error=f"{reply.status.name}: {reply.status.description}", retryable=True
+                )
+            else:
+                results[index] = TemplateSendResult(to=to, response=reply)
+        return results
+
     def receive_webhook_message(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Receive and validate message from Infobip webhook
@@ -238,6 +522,49 @@ class InfobipService:
             logger.error(f"Error processing webhook message: {str(e)}")
             return {"valid": False, "error": str(e)}
     
+    @staticmethod
+    def _report_time(value: Optional[str]) -> datetime:
+        """UTC time of a report field ("2024-05-01T10:00:00.000+0000"), now if missing or invalid"""
+        try:
+            return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z").astimezone(timezone.utc).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return datetime.utcnow()
+
+    def parse_delivery_reports(self, report_data: Dict[str, Any]) -> List[StatusTransition]:
+        """
+        Status changes of sent messages from an Infobip delivery or seen report webhook
+        
+        Args:
+            report_data: Raw report webhook data, with the reports in "results"
+            
+        Returns:
+            List[StatusTransition]: One per report that changes a status (PENDING reports do not)
+        """
+        transitions = []
+        for result in report_data.get("results") or []:
+            message_id = result.get("messageId")
+            if not message_id:
+                logger.warning(f"Report without messageId: {result}")
+                continue
+            # Seen reports only carry seenAt, delivery reports a status group
+            if result.get("seenAt"):
+                transitions.append(StatusTransition(
+                    message_id=message_id, status=DeliveryStatus.SEEN, at=self._report_time(result.get("seenAt"))
+                ))
+                continue
+            status = DeliveryStatus.from_group((result.get("status") or {}).get("groupName", ""))
+            if status is None:
+                continue
+            error = result.get("error") or {}
+            transitions.append(StatusTransition(
+                message_id=message_id,
+                status=status,
+                at=self._report_time(result.get("doneAt")),
+                error_code=error.get("id") if status == DeliveryStatus.FAILED else None,
+                permanent=bool(error.get("permanent")) if status == DeliveryStatus.FAILED else False,
+            ))
+        return transitions
+
     def _process_single_message(self, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Process a single message result from Infobip webhook
@@ -342,22 +669,34 @@ class InfobipService:
         """
         Save a file from a URL to specified path or temp directory
         """    
-        response = requests.get(url, timeout=30.0, headers=self._get_headers())
+        response = self.client().get(url)
         with open(path, "wb") as file:
             file.write(response.content)
         
         logger.info(f"File saved to: {path}")
         return path
 
+    async def areceive_webhook_message(self, webhook_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async version of receive_webhook_message: audio messages are downloaded
+        and transcribed in a worker thread
+        """
+        return await asyncio.to_thread(self.receive_webhook_message, webhook_data)
+
     def process_audio_message(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Process audio message
         """
         logger.info("Processing audio message")
-        temp_file_path = os.path.join(tempfile.gettempdir(), "audio_whatsapp.mp3")
-        file_path = self.save_file(message_data.get("url"), temp_file_path)
-        openia = OpenIA()
-        return openia.extract_text_audio(file_path)
+        # One file per call: audio turns run concurrently in worker threads
+        fd, temp_file_path = tempfile.mkstemp(suffix=".mp3")
+        os.close(fd)
+        try:
+            file_path = self.save_file(message_data.get("url"), temp_file_path)
+            openia = OpenIA()
+            return openia.extract_text_audio(file_path)
+        finally:
+            os.remove(temp_file_path)
     
     def process_message_type(self, message_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -0,0 +1,602 @@
+"""
+Outbound WhatsApp message dispatcher.
+
+Replies and notifications are queued instead of sent inline, so a turn
+finishes as soon as its reply is enqueued. A pool of OUTBOUND_WORKERS
+threads sends them through InfobipService:
+- a token bucket keeps the send rate under OUTBOUND_RATE_PER_SECOND, the
+  throughput Infobip allows the sender, with bursts of OUTBOUND_BURST;
+- the messages of a recipient go out one at a time and in order, so a
+  message waiting for a retry holds back the ones queued after it;
+- template messages that are due for different recipients are packed into
+  one request, up to INFOBIP_TEMPLATE_BATCH_SIZE (send_template_messages
+  queues a fan-out to many recipients);
+- throttling (429), server errors and connection failures are retried with
+  jittered exponential backoff, up to OUTBOUND_MAX_ATTEMPTS attempts. Of a
+  batched request, only the messages Infobip rejected or left out are;
+- the messages that fail for good, or are still queued at shutdown, are
+  stored in the outbound_dead_letters collection;
+- a message sent by a turn has an idempotency key derived from its chat,
+  the turn (the inbound message it answers) and its content. The key is
+  claimed in the outbound_sent_keys collection (TTL'd) before the first
+  attempt, so the same message queued again by a redelivered or retried
+  turn is skipped. Keys this process sent are also remembered in memory;
+- sent messages are recorded in outbound_messages under their Infobip
+  message ID. Delivery and seen reports (apply_reports) move their status
+  forward, and the messages that failed to deliver in the last
+  OUTBOUND_RESEND_WINDOW_MINUTES are sent again by a background thread.
+
+With OUTBOUND_QUEUE_ENABLED off, messages are sent inline as before and
+errors reach the caller.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from ..config import settings
+from ..core.crud.outbound_crud import OutboundCRUD
+from ..core.database import get_db
+from ..models.whatsapp import (
+    OutboundKind,
+    OutboundMessage,
+    StatusTransition,
+    TemplateSendResult,
+    WhatsAppError,
+)
+from ..utils.logger import logger
+from ..utils.metrics import metrics
+from .infobip_service import InfobipService
+
+# Idempotency keys sent by this process remembered in memory, checked before the database
+RECENT_KEYS = 10000
+
+
+class TokenBucket:
+    """Thread-safe token bucket, rate tokens per second up to capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1) -> float:
+        """
+        Take tokens, waiting while the bucket is short of them. Taking more
+        than the capacity leaves the bucket in debt, paid by later callers.
+
+        Args:
+            tokens: Tokens to take (messages in the request)
+
+        Returns:
+            float: Seconds waited
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                needed = min(tokens, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _retryable(error: Any) -> bool:
+    if isinstance(error, (WhatsAppError, TemplateSendResult)):
+        return error.retryable
+    return isinstance(error, httpx.TransportError)
+
+
+def _message_id(response: Any) -> Optional[str]:
+    """Infobip message ID of a send response (a template response lists its messages)"""
+    messages = getattr(response, "messages", None)
+    if messages:
+        return messages[0].messageId
+    return getattr(response, "messageId", None)
+
+
+def backoff(attempt: int) -> float:
+    """Delay before the next attempt: exponential, capped, half of it jittered"""
+    delay = min(settings.OUTBOUND_BACKOFF_MAX, settings.OUTBOUND_BACKOFF_BASE * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class OutboundDispatcher:
+    """Per-recipient ordered queues of outbound messages, drained by a pool of worker threads"""
+
+    def __init__(self):
+        self._lanes: Dict[str, Deque[OutboundMessage]] = {}
+        # Recipients with a message ready to go (not being sent), by the time it is due
+        self._schedule: List[Tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._sending: set = set()
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._bucket: Optional[TokenBucket] = None
+        self._stopping = False
+        self._db = None
+        self._sent_keys: "OrderedDict[str, None]" = OrderedDict()
+        self._keys_lock = threading.Lock()
+        self._resend_thread: Optional[threading.Thread] = None
+        self._stop_resends = threading.Event()
+
+    def _start(self) -> None:
+        if self._workers:
+            return
+        self._stopping = False
+        self._bucket = TokenBucket(settings.OUTBOUND_RATE_PER_SECOND, settings.OUTBOUND_BURST)
+        for index in range(settings.OUTBOUND_WORKERS):
+            worker = threading.Thread(target=self._work, name=f"outbound-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _schedule_lane(self, to: str, due: float) -> None:
+        heapq.heappush(self._schedule, (due, next(self._sequence), to))
+
+    def enqueue(self, message: OutboundMessage) -> None:
+        """
+        Queue a message behind the ones already queued for its recipient.
+
+        Args:
+            message: The message
+        """
+        with self._condition:
+            self._start()
+            lane = self._lanes.setdefault(message.to, deque())
+            lane.append(message)
+            self._pending += 1
+            # A lane is scheduled while it has messages and none of them is being sent
+            if len(lane) == 1 and message.to not in self._sending:
+                self._schedule_lane(message.to, time.monotonic())
+            self._condition.notify()
+        metrics.incr("outbound.enqueued", kind=message.kind.value)
+
+    def _next(self) -> Optional[List[OutboundMessage]]:
+        """Wait for the next message that is due, with the other due template messages if it is one; None when stopping"""
+        with self._condition:
+            while not self._stopping:
+                if not self._schedule:
+                    self._condition.wait()
+                    continue
+                due, _, to = self._schedule[0]
+                now = time.monotonic()
+                if due > now:
+                    self._condition.wait(due - now)
+                    continue
+                heapq.heappop(self._schedule)
+                self._sending.add(to)
+                batch = [self._lanes[to].popleft()]
+                if batch[0].kind == OutboundKind.TEMPLATE:
+                    self._fill_batch(batch, now)
+                return batch
+        return None
+
+    def _fill_batch(self, batch: List[OutboundMessage], now: float) -> None:
+        """Add the due template messages at the head of other lanes to the batch"""
+        skipped = []
+        while self._schedule and self._schedule[0][0] <= now and len(batch) < settings.INFOBIP_TEMPLATE_BATCH_SIZE:
+            entry = heapq.heappop(self._schedule)
+            lane = self._lanes[entry[2]]
+            if lane[0].kind != OutboundKind.TEMPLATE:
+                skipped.append(entry)
+                continue
+            self._sending.add(entry[2])
+            batch.append(lane.popleft())
+        for entry in skipped:
+            heapq.heappush(self._schedule, entry)
+
+    def _work(self) -> None:
+        while True:
+            batch = self._next()
+            if batch is None:
+                return
+            retries = self._attempt(batch)
+            with self._condition:
+                for message, retry_in in zip(batch, retries):
+                    self._sending.discard(message.to)
+                    lane = self._lanes[message.to]
+                    if retry_in is not None:
+                        lane.appendleft(message)
+                        self._schedule_lane(message.to, time.monotonic() + retry_in)
+                    else:
+                        self._pending -= 1
+                        if lane:
+                            self._schedule_lane(message.to, time.monotonic())
+                        else:
+                            del self._lanes[message.to]
+                self._condition.notify_all()
+
+    def _attempt(self, batch: List[OutboundMessage]) -> List[Optional[float]]:
+        """Send the batch once; returns per message the delay before retrying it, None when done with it"""
+        sending = self._claim(batch)
+        if not sending:
+            return [None] * len(batch)
+        waited = self._bucket.acquire(len(sending))
+        if waited:
+            metrics.observe("outbound.throttle_wait_ms", waited * 1000)
+        for message in sending:
+            message.attempts += 1
+        kind = sending[0].kind.value
+        start = time.perf_counter()
+        message_ids: List[Optional[str]] = [None] * len(sending)
+        if sending[0].kind != OutboundKind.TEMPLATE:
+            try:
+                message_ids = [_message_id(self._deliver(sending[0]))]
+                errors = [None]
+            except Exception as e:
+                errors = [e]
+        else:
+            # Through the batch endpoint even when alone, so a message Infobip rejects is retried
+            metrics.observe("outbound.batch_size", len(sending))
+            try:
+                results = InfobipService().send_template_messages([
+                    message.model_dump(include={"to", "template_name", "language", "template_data"}) for message in sending
+                ])
+                errors = [None if result.ok else result for result in results]
+                message_ids = [result.response.messageId if result.response else None for result in results]
+            except Exception as e:
+                errors = [e] * len(sending)
+        metrics.observe("outbound.send_ms", (time.perf_counter() - start) * 1000, kind=kind)
+        sent = [(message, message_id) for message, message_id, error in zip(sending, message_ids, errors) if error is None]
+        self._mark_sent([message for message, _ in sent])
+        self._record(sent)
+        retries = {id(message): self._settle(message, error) for message, error in zip(sending, errors)}
+        # Duplicates are done with, as if sent
+        return [retries.get(id(message)) for message in batch]
+
+    def _crud(self) -> OutboundCRUD:
+        # get_db opens a client, the dispatcher keeps one for its writes
+        if self._db is None:
+            self._db = get_db()
+        return OutboundCRUD(self._db)
+
+    def _claim(self, messages: List[OutboundMessage]) -> List[OutboundMessage]:
+        """Claim the idempotency keys of the messages on their first attempt; returns the messages to send"""
+        if not settings.OUTBOUND_IDEMPOTENCY_ENABLED:
+            return messages
+        candidates: Dict[str, OutboundMessage] = {}
+        duplicates = []
+        with self._keys_lock:
+            for message in messages:
+                key = message.key
+                if key is None or message.attempts:
+                    continue
+                if key in self._sent_keys or key in candidates:
+                    duplicates.append(message)
+                else:
+                    candidates[key] = message
+        if candidates:
+            try:
+                claimed = self._crud().claim_keys([(key, message.to) for key, message in candidates.items()])
+                duplicates.extend(message for key, message in candidates.items() if key not in claimed)
+            except Exception as e:
+                # Sending a duplicate beats not sending at all
+                logger.error(f"Error claiming idempotency keys, sending anyway: {e}")
+        for message in duplicates:
+            logger.info(f"Skipping duplicate outbound {message.kind.value} to {message.to}")
+            metrics.incr("outbound.duplicates", kind=message.kind.value)
+        skipped = {id(message) for message in duplicates}
+        return [message for message in messages if id(message) not in skipped]
+
+    def _mark_sent(self, messages: List[OutboundMessage]) -> None:
+        keys = [message.key for message in messages if message.key]
+        if not keys or not settings.OUTBOUND_IDEMPOTENCY_ENABLED:
+            return
+        with self._keys_lock:
+            for key in keys:
+                self._sent_keys[key] = None
+            while len(self._sent_keys) > RECENT_KEYS:
+                self._sent_keys.popitem(last=False)
+        try:
+            self._crud().mark_keys_sent(keys)
+        except Exception as e:
+            logger.error(f"Error marking idempotency keys as sent: {e}")
+
+    def _record(self, sent: List[Tuple[OutboundMessage, Optional[str]]]) -> None:
+        """Record sent messages for their delivery reports"""
+        sent = [(message, message_id) for message, message_id in sent if message_id]
+        if not sent or not settings.OUTBOUND_TRACKING_ENABLED:
+            return
+        try:
+            self._crud().add_records(sent)
+        except Exception as e:
+            logger.error(f"Error recording {len(sent)} sent messages: {e}")
+
+    def _release(self, message: OutboundMessage) -> None:
+        if not message.key or not settings.OUTBOUND_IDEMPOTENCY_ENABLED:
+            return
+        try:
+            self._crud().release_key(message.key)
+        except Exception as e:
+            logger.error(f"Error releasing idempotency key of {message.to}: {e}")
+
+    def _settle(self, message: OutboundMessage, error: Any) -> Optional[float]:
+        if error is None:
+            metrics.observe("outbound.delivery_ms", (datetime.utcnow() - message.created_at).total_seconds() * 1000)
+            metrics.incr("outbound.sent", kind=message.kind.value)
+            return None
+        if isinstance(error, TemplateSendResult):
+            error_text = error.error
+        else:
+            error_text = str(error)
+        if _retryable(error) and message.attempts < settings.OUTBOUND_MAX_ATTEMPTS:
+            retry_in = backoff(message.attempts)
+            logger.warning(f"Outbound {message.kind.value} to {message.to} failed (attempt {message.attempts}), retrying in {retry_in:.1f}s: {error_text}")
+            metrics.incr("outbound.retries", kind=message.kind.value)
+            return retry_in
+        self._dead_letter(message, error_text)
+        return None
+
+    @staticmethod
+    def _deliver(message: OutboundMessage) -> Any:
+        service = InfobipService()
+        if message.kind == OutboundKind.TEXT:
+            return service.send_text_message(message.to, message.content)
+        if message.kind == OutboundKind.IMAGE:
+            return service.send_image_message(message.to, message.content)
+        return service.send_template_message(message.to, message.template_name, message.language, message.template_data)
+
+    @staticmethod
+    async def _adeliver(message: OutboundMessage) -> Any:
+        service = InfobipService()
+        if message.kind == OutboundKind.TEXT:
+            return await service.asend_text_message(message.to, message.content)
+        if message.kind == OutboundKind.IMAGE:
+            return await service.asend_image_message(message.to, message.content)
+        return await asyncio.to_thread(service.send_template_message, message.to, message.template_name, message.language, message.template_data)
+
+    def _dead_letter(self, message: OutboundMessage, error: Any) -> None:
+        logger.error(f"Giving up on outbound {message.kind.value} to {message.to} after {message.attempts} attempts: {error}")
+        metrics.incr("outbound.dead_letters", kind=message.kind.value)
+        self._release(message)
+        try:
+            self._crud().add_dead_letter(message, str(error))
+        except Exception as e:
+            logger.error(f"Error storing dead letter for {message.to}: {e}")
+
+    def send(self, message: OutboundMessage) -> None:
+        """Queue a message, or send it right away with the queue disabled"""
+        if settings.OUTBOUND_QUEUE_ENABLED:
+            self.enqueue(message)
+            return
+        if not self._claim([message]):
+            return
+        try:
+            response = self._deliver(message)
+        except Exception:
+            self._release(message)
+            raise
+        self._mark_sent([message])
+        self._record([(message, _message_id(response))])
+
+    async def asend(self, message: OutboundMessage) -> None:
+        """Async version of send, for the webhook"""
+        if settings.OUTBOUND_QUEUE_ENABLED:
+            self.enqueue(message)
+            return
+        if not await asyncio.to_thread(self._claim, [message]):
+            return
+        try:
+            response = await self._adeliver(message)
+        except Exception:
+            await asyncio.to_thread(self._release, message)
+            raise
+        await asyncio.to_thread(self._mark_sent, [message])
+        await asyncio.to_thread(self._record, [(message, _message_id(response))])
+
+    async def asend_message(self, to: str, message: Any, chat_id: Optional[str] = None, turn_id: Optional[str] = None) -> None:
+        """
+        Send an agent response (text or image) to a user.
+
+        Args:
+            to: Recipient phone number
+            message: Response with a type and a message
+            chat_id: Chat the response belongs to
+            turn_id: Inbound message the response answers, the same response is sent once per turn
+        """
+        await self.asend(OutboundMessage(
+            to=to, kind=OutboundKind(message.type), content=message.message, chat_id=chat_id, turn_id=turn_id
+        ))
+
+    def send_template_message(
+        self,
+        to: str,
+        template_name: str,
+        language: str = "es",
+        template_data: Optional[Dict[str, Any]] = None,
+        chat_id: Optional[str] = None,
+        turn_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> None:
+        """
+        Send a template message (see InfobipService.send_template_message).
+
+        Args:
+            to: Recipient phone number
+            template_name: Template name
+            language: Template language
+            template_data: Data to fill the template
+            chat_id: Chat the message belongs to
+            turn_id: Inbound message of the turn sending it, the same message is sent once per turn
+            idempotency_key: Key to use instead of the one derived from the content (when it changes on retries)
+        """
+        self.send(OutboundMessage(
+            to=to,
+            kind=OutboundKind.TEMPLATE,
+            template_name=template_name,
+            language=language,
+            template_data=template_data or {},
+            chat_id=chat_id,
+            turn_id=turn_id,
+            idempotency_key=idempotency_key,
+        ))
+
+    def send_template_messages(
+        self,
+        template_name: str,
+        recipients: Dict[str, Dict[str, Any]],
+        language: str = "es",
+    ) -> List[TemplateSendResult]:
+        """
+        Send a template to many recipients (reminders, alerts), packed into
+        requests of up to INFOBIP_TEMPLATE_BATCH_SIZE messages.
+
+        Args:
+            template_name: Template name
+            recipients: Recipient phone number -> data to fill the template for them
+            language: Template language
+
+        Returns:
+            List[TemplateSendResult]: Result per recipient when sent right away (queue disabled),
+            empty when queued (failures end up in the dead letters)
+        """
+        messages = [
+            OutboundMessage(to=to, kind=OutboundKind.TEMPLATE, template_name=template_name, language=language, template_data=data or {})
+            for to, data in recipients.items()
+        ]
+        if settings.OUTBOUND_QUEUE_ENABLED:
+            for message in messages:
+                self.enqueue(message)
+            return []
+
+        service = InfobipService()
+        size = settings.INFOBIP_TEMPLATE_BATCH_SIZE
+        results = []
+        for offset in range(0, len(messages), size):
+            results.extend(service.send_template_messages([
+                message.model_dump(include={"to", "template_name", "language", "template_data"})
+                for message in messages[offset:offset + size]
+            ]))
+        return results
+
+    def apply_reports(self, transitions: List[StatusTransition]) -> int:
+        """
+        Apply the status changes of a delivery or seen report webhook to the
+        message records, in one bulk write.
+
+        Args:
+            transitions: Status changes (see InfobipService.parse_delivery_reports)
+
+        Returns:
+            int: Records they were applied to (the others were not sent by us, expired,
+            or were delivered before a late failure report)
+        """
+        if not transitions or not settings.OUTBOUND_TRACKING_ENABLED:
+            return 0
+        start = time.perf_counter()
+        matched = self._crud().apply_transitions(transitions)
+        metrics.observe("outbound.reports_ms", (time.perf_counter() - start) * 1000)
+        for transition in transitions:
+            metrics.incr("outbound.reports", status=transition.status.name.lower())
+        return matched
+
+    def resend_undelivered(self) -> int:
+        """
+        Queue again the messages that failed to deliver in the last
+        OUTBOUND_RESEND_WINDOW_MINUTES, for a reason that may pass.
+
+        Returns:
+            int: Messages queued
+        """
+        crud = self._crud()
+        since = datetime.utcnow() - timedelta(minutes=settings.OUTBOUND_RESEND_WINDOW_MINUTES)
+        records = crud.get_resendable(since, settings.OUTBOUND_MAX_RESENDS)
+        if not records:
+            return 0
+        crud.mark_resent([record["_id"] for record in records])
+        for record in records:
+            self.enqueue(OutboundMessage(
+                to=record["to"],
+                kind=OutboundKind(record["kind"]),
+                content=record.get("content"),
+                template_name=record.get("template_name"),
+                language=record.get("language", "es"),
+                template_data=record.get("template_data"),
+                chat_id=record.get("chat_id"),
+                resend_of=record["_id"],
+                resends=record.get("resends", 0) + 1,
+            ))
+        logger.info(f"Resending {len(records)} undelivered messages")
+        metrics.incr("outbound.resends", len(records))
+        return len(records)
+
+    def start_resends(self, interval: int) -> None:
+        """Resend the undelivered messages in a background thread every interval seconds"""
+        if interval <= 0 or not settings.OUTBOUND_TRACKING_ENABLED or self._resend_thread is not None:
+            return
+        self._stop_resends.clear()
+
+        def run():
+            while not self._stop_resends.wait(interval):
+                try:
+                    self.resend_undelivered()
+                except Exception as e:
+                    logger.error(f"Error resending undelivered messages: {e}")
+
+        self._resend_thread = threading.Thread(target=run, name="outbound-resend", daemon=True)
+        self._resend_thread.start()
+
+    def stop_resends(self) -> None:
+        """Stop the background resend thread"""
+        self._stop_resends.set()
+        self._resend_thread = None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued message was sent or dead-lettered.
+
+        Returns:
+            bool: False if messages were still queued after the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Drain the queue for up to timeout seconds, stop the workers and dead-letter what is left"""
+        self.stop_resends()
+        self.flush(timeout)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.join()
+        with self._condition:
+            left = [message for lane in self._lanes.values() for message in lane]
+            self._lanes.clear()
+            self._schedule.clear()
+            self._pending = 0
+        for message in left:
+            self._dead_letter(message, "Not sent before shutdown")
+
+    def stats(self) -> Dict[str, int]:
+        """Queued messages, recipients with queued messages and workers"""
+        with self._condition:
+            return {"queued": self._pending, "recipients": len(self._lanes), "workers": len(self._workers)}
+
+
+outbound_dispatcher = OutboundDispatcher()
@@ -70,9 +70,9 @@ class PropertyService:
             return self.property_crud.update_property_partial(property_id, update_data)
         return True
     
-    def get_progress_info(self, property_id: str) -> Optional[PropertyProgress]:
+    def get_progress_info(self, property_id: str, property_obj: Optional[Property] = None) -> Optional[PropertyProgress]:
         """Get property progress info with missing fields"""
-        progress_data = self.property_crud.get_property_missing_fields(property_id)
+        progress_data = self.property_crud.get_property_missing_fields(property_id, property_obj)
         
         if progress_data:
             return PropertyProgress(
@@ -1,10 +1,12 @@
-from typing import Optional
+from typing import Optional, Dict, Any
 
 from bson import ObjectId
 from ..core.database import get_db
 from ..core.crud.property_crud import PropertyCRUD
 from ..core.crud.chat_crud import ChatCRUD
+from ..core.stage_events import StageTransition, stage_events
 from ..models.business_stage import SellerStage, BuyerStage
+from ..models.chat import RoutingContext
 from ..utils.logger import logger
 
 
@@ -42,9 +44,108 @@ class StageService:
             logger.warning(f"No property_id found for chat {chat_id}")
             return False
         
-        return self.property_crud.update_property_stage(chat_doc["property_id"], new_stage)
+        success = self.property_crud.update_property_stage(chat_doc["property_id"], new_stage)
+        if success:
+            self.chat_crud.update_routing_context(chat_id, seller_stage=new_stage)
+            stage_events.emit(StageTransition(chat_id=chat_id, role="seller", stage=new_stage))
+        return success
     
     def update_buyer_stage(self, chat_id: str, new_stage: BuyerStage) -> bool:
         """Update buyer business stage in chat"""
         logger.info(f"Updating buyer business stage for chat {chat_id} to {new_stage}")
-        return self.chat_crud.update_chat_stage(chat_id, new_stage)
\ No newline at end of file
+        success = self.chat_crud.update_chat_stage(chat_id, new_stage)
+        if success:
+            stage_events.emit(StageTransition(chat_id=chat_id, role="buyer", stage=new_stage))
+        return success
+    
+    def get_routing_context(self, chat_id: str) -> RoutingContext:
+        """
+        Get the routing context used to select the agent of a chat.
+        
+        Chats created before the routing context existed are backfilled
+        from the source collections the first time they are routed.
+        """
+        routing = self.chat_crud.get_routing_context(chat_id)
+        if routing is None:
+            logger.info(f"Chat {chat_id} has no routing context, rebuilding it")
+            routing = self.rebuild_routing_context(chat_id)
+        return routing
+    
+    def build_routing_context(self, chat_id: str, role: Optional[str] = None) -> RoutingContext:
+        """
+        Build the routing context of a chat from the source collections
+        (users, chats and properties) without persisting it.
+        
+        Args:
+            chat_id: Chat ID
+            role: Role to use instead of the one stored on the user
+        """
+        chat_doc = self.db.chats.find_one({"_id": ObjectId(chat_id)})
+        if not chat_doc:
+            return RoutingContext(role=role)
+        
+        if role is None:
+            user_doc = self.db.users.find_one({"phone": chat_doc.get("user_phone")}, {"role": 1})
+            role = "seller" if user_doc and user_doc.get("role") == "seller" else "buyer"
+        
+        property_id = chat_doc.get("property_id")
+        seller_stage = None
+        if role == "seller":
+            seller_stage = (
+                self.property_crud.get_property_stage(property_id)
+                if property_id else SellerStage.REGISTRATION
+            )
+        
+        buyer_stage = chat_doc.get("business_stage")
+        return RoutingContext(
+            role=role,
+            property_id=property_id,
+            seller_stage=seller_stage,
+            buyer_stage=BuyerStage(buyer_stage) if buyer_stage else None,
+            version=chat_doc.get("routing", {}).get("version", 0),
+        )
+    
+    def rebuild_routing_context(self, chat_id: str, role: Optional[str] = None) -> RoutingContext:
+        """Rebuild the routing context of a chat from the source collections and persist it"""
+        routing = self.build_routing_context(chat_id, role)
+        self.chat_crud.update_routing_context(
+            chat_id,
+            role=routing.role,
+            property_id=routing.property_id,
+            seller_stage=routing.seller_stage,
+            buyer_stage=routing.buyer_stage,
+        )
+        routing.version += 1
+        return routing
+    
+    def check_routing_consistency(self, chat_id: str) -> Dict[str, Any]:
+        """
+        Compare the stored routing context of a chat with the source collections.
+        
+        Args:
+            chat_id: Chat ID
+        
+        Returns:
+            Dict with the chat_id, a consistent flag and the mismatched fields
+            as {field: {"stored": ..., "expected": ...}}
+        """
+        logger.info(f"Checking routing consistency for chat {chat_id}")
+        stored = self.chat_crud.get_routing_context(chat_id)
+        expected = self.build_routing_context(chat_id)
+        
+        if stored is None:
+            return {"chat_id": chat_id, "consistent": False, "missing": True, "mismatches": {}}
+        
+        mismatches = {}
+        for field in ("role", "property_id", "seller_stage", "buyer_stage"):
+            stored_value = getattr(stored, field)
+            expected_value = getattr(expected, field)
+            if stored_value != expected_value:
+                mismatches[field] = {"stored": stored_value, "expected": expected_value}
+        
+        return {
+            "chat_id": chat_id,
+            "consistent": not mismatches,
+            "missing": False,
+            "mismatches": mismatches,
+        }
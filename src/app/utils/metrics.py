@@ -0,0 +1,113 @@
+"""
+In-process metrics.
+
+Keeps a bounded window of recent observations per metric (and label set)
+and counters, and reports percentiles over them. Exposed by the /metrics
+endpoint.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, object]) -> MetricKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_key(key: MetricKey) -> str:
+    name, labels = key
+    if not labels:
+        return name
+    return f"{name}{{{','.join(f'{k}={v}' for k, v in labels)}}}"
+
+
+def percentile(values: list, q: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of values, q in [0, 100]"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Metrics:
+    """Thread-safe registry of histograms (recent window) and counters"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._observations: Dict[MetricKey, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._counters: Dict[MetricKey, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record an observation (e.g. a latency in ms)"""
+        with self._lock:
+            self._observations[_key(name, labels)].append(value)
+
+    def incr(self, name: str, value: float = 1, **labels) -> None:
+        """Increment a counter"""
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Observe the duration of the block in milliseconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000, **labels)
+
+    def values(self, name: str, **labels) -> list:
+        """Recent observations of a metric"""
+        with self._lock:
+            return list(self._observations.get(_key(name, labels), ()))
+
+    def total(self, name: str) -> float:
+        """Sum of the recent observations of a metric across every label set"""
+        with self._lock:
+            return sum(sum(values) for key, values in self._observations.items() if key[0] == name)
+
+    def percentile(self, name: str, q: float, **labels) -> Optional[float]:
+        """Percentile of the recent observations of a metric"""
+        return percentile(self.values(name, **labels), q)
+
+    def counter(self, name: str, **labels) -> float:
+        """Current value of a counter"""
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def snapshot(self) -> dict:
+        """Summary of every metric: count and p50/p95/p99/max of histograms, and counters"""
+        with self._lock:
+            observations = {key: list(values) for key, values in self._observations.items()}
+            counters = dict(self._counters)
+
+        histograms = {}
+        for key, values in observations.items():
+            histograms[_format_key(key)] = {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": max(values) if values else None,
+            }
+        return {
+            "histograms": histograms,
+            "counters": {_format_key(key): value for key, value in counters.items()},
+        }
+
+    def reset(self) -> None:
+        """Drop every observation and counter"""
+        with self._lock:
+            self._observations.clear()
+            self._counters.clear()
+
+
+metrics = Metrics()
@@ -5,6 +5,7 @@ import os
 import sys
 import base64
 import io
+import time
 from typing import Optional
 
 try:
@@ -22,13 +23,16 @@ except ImportError:
 # Handle imports based on execution context
 try:
     from ..config import settings
+    from ..core.usage import record_usage
 except ImportError:
     # For direct execution or testing
     sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
     try:
         from app.config import settings
+        from app.core.usage import record_usage
     except ImportError:
         from src.app.config import settings
+        from src.app.core.usage import record_usage
 
 
 class OpenIA:
@@ -41,9 +45,17 @@ class OpenIA:
         """Extract text from an audio file"""
         with open(audio_path, "rb") as f:
             try:
+                start = time.perf_counter()
+                # verbose_json reports the audio duration, Whisper is billed per second
                 transcription = self.openai_client.audio.transcriptions.create(
                     file=f,
                     model="whisper-1",
+                    response_format="verbose_json",
+                )
+                record_usage(
+                    "whisper-1",
+                    units=getattr(transcription, "duration", 0) or 0,
+                    latency_ms=(time.perf_counter() - start) * 1000,
                 )
                 text = transcription.text
                 print(f"Text extracted from audio: {text}")
@@ -128,6 +140,7 @@ class OpenIA:
             base_image.save(temp_base_path, "PNG")
             
             # 4. Usar OpenAI Images Edit API para integrar inteligentemente
+            start = time.perf_counter()
             with open(temp_base_path, "rb") as base_file:
                 response = self.openai_client.images.edit(
                     model="dall-e-2",
@@ -137,6 +150,7 @@ class OpenIA:
                     size="1024x1024",
                     response_format="b64_json"
                 )
+            record_usage("dall-e-2", units=len(response.data or []), latency_ms=(time.perf_counter() - start) * 1000)
             
             # 5. Procesar respuesta de OpenAI
             if response.data and len(response.data) > 0:
@@ -0,0 +1,25 @@
+"""
+Text normalisation helpers for matching user messages.
+"""
+
+import re
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation and collapse whitespace"""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    # NFKD turned ñ into n and a combining tilde, dropped above
+    text = re.sub(r"[^a-z0-9 ]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def is_emoji_only(text: str) -> bool:
+    """Whether a message only has emoji (and whitespace or punctuation)"""
+    stripped = "".join(char for char in (text or "") if not char.isspace())
+    if not stripped:
+        return False
+    return not any(char.isalnum() for char in stripped) and any(
+        unicodedata.category(char) == "So" for char in stripped
+    )
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# InfobipService refuses to start without them, nothing is sent in the tests
+os.environ.setdefault("INFOBIP_API_KEY", "test-placeholder")
+os.environ.setdefault("INFOBIP_WHATSAPP_FROM", "573000000000")
+os.environ.setdefault("OPENAI_API_KEY", "test-placeholder")
+
+
+class AsyncCursor:
+    """motor-like cursor over a mongomock cursor"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, *args, **kwargs):
+        self.cursor = self.cursor.limit(*args, **kwargs)
+        return self
+
+    def __aiter__(self):
+        self.iterator = iter(self.cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        return list(self.cursor)
+
+
+class AsyncCollection:
+    """motor-like collection over a mongomock collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def run(*args, **kwargs):
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+        return run
+
+
+class AsyncDatabase:
+    """motor-like database over a mongomock database"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __getattr__(self, name):
+        return AsyncCollection(self.db[name])
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.db[name])
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """One in-memory MongoDB behind get_db and get_async_db for the test"""
+    from src.app.core import database
+    from src.app.services import chat_service
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(database, "MongoClient", lambda *args, **kwargs: client)
+    monkeypatch.setattr(chat_service, "get_async_db", lambda: AsyncDatabase(client[database.DATABASE_NAME]))
+    return client[database.DATABASE_NAME]
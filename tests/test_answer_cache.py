@@ -0,0 +1,62 @@
+from src.app.core.answer_cache import AnswerCache, fact_type, is_cacheable_question
+from src.app.models.property import Property
+
+PROPERTY_ID = "64f000000000000000000001"
+PROPERTY = Property(
+    address="Calle 63 # 10-20, Chapinero",
+    type="apartamento",
+    value=350_000_000,
+    amenities=["piscina", "gimnasio"],
+    owner_id="owner",
+)
+
+
+def test_exact_question_hits_with_answer_from_property():
+    cache = AnswerCache()
+    assert cache.store(PROPERTY_ID, "¿Cuánto cuesta el apartamento?", PROPERTY)
+
+    answer = cache.lookup(PROPERTY_ID, "cuanto cuesta el apartamento")
+
+    assert answer == "El precio de la propiedad es $350.000.000."
+
+
+def test_near_miss_question_does_not_hit():
+    cache = AnswerCache()
+    cache.store(PROPERTY_ID, "¿Cuánto cuesta el apartamento?", PROPERTY)
+
+    assert cache.lookup(PROPERTY_ID, "¿cuánto cuesta con descuento?") is None
+    assert cache.lookup(PROPERTY_ID, "¿Cuánto cuesta la casa?") is None
+    assert cache.lookup("64f000000000000000000002", "¿Cuánto cuesta el apartamento?") is None
+
+
+def test_property_nouns_are_content_words():
+    cache = AnswerCache()
+    assert fact_type("¿es casa o apartamento?") == "type"
+    assert cache.store(PROPERTY_ID, "¿es casa o apartamento?", PROPERTY)
+
+    assert cache.lookup(PROPERTY_ID, "Es casa o apartamento") == "La propiedad es de tipo apartamento."
+
+
+def test_personal_and_unknown_questions_are_not_cached():
+    cache = AnswerCache()
+
+    assert not is_cacheable_question("¿Cuánto cuesta? Soy Juan, mi presupuesto es 300")
+    assert not is_cacheable_question("¿Puedo visitarlo el sábado?")
+    assert not is_cacheable_question("¿cuánto mide?")
+    assert not cache.store(PROPERTY_ID, "¿cuánto mide?", PROPERTY)
+
+
+def test_fact_missing_on_the_property_is_not_cached():
+    cache = AnswerCache()
+
+    assert not cache.store(PROPERTY_ID, "¿Qué hay cerca?", PROPERTY)
+    assert cache.lookup(PROPERTY_ID, "¿Qué hay cerca?") is None
+
+
+def test_invalidate_drops_the_property_answers():
+    cache = AnswerCache()
+    cache.store(PROPERTY_ID, "¿Dónde queda?", PROPERTY)
+
+    cache.invalidate(PROPERTY_ID)
+
+    assert cache.lookup(PROPERTY_ID, "¿Dónde queda?") is None
@@ -0,0 +1,37 @@
+import pytest
+
+from src.app.config import settings
+from src.app.core.usage import BudgetAction, BudgetPolicy
+from src.app.models.usage import ChatUsage
+
+
+def spent(cost_usd):
+    return ChatUsage(cost_usd=cost_usd)
+
+
+def test_zero_budget_never_downgrades():
+    assert BudgetPolicy(budget_usd=0).decide(spent(1000)) == BudgetAction.NONE
+
+
+@pytest.mark.parametrize("cost_usd, action", [
+    (0.0, BudgetAction.NONE),
+    (0.79, BudgetAction.NONE),
+    (0.8, BudgetAction.DOWNGRADE),
+    (1.0, BudgetAction.TRIM),
+    (3.0, BudgetAction.TRIM),
+])
+def test_decide_from_the_share_spent(cost_usd, action):
+    assert BudgetPolicy(budget_usd=1, downgrade_at=0.8).decide(spent(cost_usd)) == action
+
+
+def test_new_chat_is_never_downgraded():
+    assert BudgetPolicy(budget_usd=1).decide(None) == BudgetAction.NONE
+
+
+@pytest.mark.parametrize("action, context", [
+    (BudgetAction.NONE, {"chat_id": "c1"}),
+    (BudgetAction.DOWNGRADE, {"chat_id": "c1", "model_profile": "economy"}),
+    (BudgetAction.TRIM, {"chat_id": "c1", "model_profile": "economy", "keep_turns": settings.CHAT_BUDGET_KEEP_TURNS}),
+])
+def test_apply_sets_the_profile_and_context_size(action, context):
+    assert BudgetPolicy(budget_usd=1).apply(action, {"chat_id": "c1"}) == context
@@ -0,0 +1,63 @@
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from src.app.devtools.cassette import Cassette, CassetteMiss, RecordingChatModel, ReplayChatModel, request_key
+
+MODEL = "gpt-4.1"
+
+
+def conversation(system="Hoy es 2025-05-01", question="¿Cuánto cuesta?"):
+    return [SystemMessage(content=system), HumanMessage(content=question)]
+
+
+def record(cassette, *exchanges):
+    """Record the (question, answer) exchanges through a fake real model"""
+    inner = FakeMessagesListChatModel(responses=[AIMessage(content=answer) for _, answer in exchanges])
+    recording = RecordingChatModel(inner=inner, cassette=cassette, model_name=MODEL)
+    for question, _ in exchanges:
+        recording.invoke(conversation(question=question))
+
+
+def test_request_key_ignores_system_messages():
+    assert request_key(MODEL, conversation(system="Hoy es 2025-05-01"), ()) == request_key(MODEL, conversation(system="Hoy es 2025-06-01"), ())
+    assert request_key(MODEL, conversation(question="a"), ()) != request_key(MODEL, conversation(question="b"), ())
+    assert request_key(MODEL, conversation(), ("save_info",)) != request_key(MODEL, conversation(), ())
+
+
+def test_recorded_session_replays_from_disk(tmp_path):
+    recorded = Cassette(str(tmp_path / "session.json"))
+    record(recorded, ("¿Cuánto cuesta?", "650 millones"), ("¿Dónde queda?", "En El Poblado"))
+    recorded.save()
+
+    cassette = Cassette.load(str(tmp_path / "session.json"))
+    replay = ReplayChatModel(cassette=cassette, model_name=MODEL)
+
+    # Matched by request, whatever the order and the date in the system prompt
+    assert replay.invoke(conversation(system="Hoy es 2025-06-01", question="¿Dónde queda?")).content == "En El Poblado"
+    assert replay.invoke(conversation(question="¿Cuánto cuesta?")).content == "650 millones"
+    assert cassette.model_calls == 2
+
+
+def test_changed_request_replays_the_next_response_in_order():
+    cassette = Cassette()
+    record(cassette, ("¿Cuánto cuesta?", "650 millones"), ("¿Dónde queda?", "En El Poblado"))
+    cassette.rewind()
+    replay = ReplayChatModel(cassette=cassette, model_name=MODEL)
+
+    assert replay.invoke(conversation(question="¿Dónde queda?")).content == "En El Poblado"
+    assert replay.invoke(conversation(question="¿Y el precio?")).content == "650 millones"
+    with pytest.raises(CassetteMiss):
+        replay.invoke(conversation(question="¿Algo más?"))
+
+
+def test_rewind_plays_the_cassette_again():
+    cassette = Cassette()
+    record(cassette, ("¿Cuánto cuesta?", "650 millones"))
+    cassette.rewind()
+    replay = ReplayChatModel(cassette=cassette, model_name=MODEL)
+
+    replay.invoke(conversation())
+    cassette.rewind()
+
+    assert replay.invoke(conversation()).content == "650 millones"
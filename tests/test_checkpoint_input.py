@@ -0,0 +1,119 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+
+from src.app.config import settings
+from src.app.core.agent import main as agent_main
+from src.app.core.agent.main import Agent
+from src.app.models.chat import ConversationSummary
+
+THREAD_ID = "chat-1:EchoAgent"
+
+
+class EchoAgent(Agent):
+    def get_agents(self):
+        return []
+
+    def get_flow_description(self) -> str:
+        return ""
+
+
+class FakeCheckpointer:
+    """Latest checkpoint metadata of the thread, as MongoCheckpointSaver.get_latest_metadata returns it"""
+
+    def __init__(self, metadata=None):
+        self.metadata = metadata
+
+    def get_latest_metadata(self, thread_id):
+        assert thread_id == THREAD_ID
+        return self.metadata
+
+
+@pytest.fixture
+def checkpoint(monkeypatch):
+    checkpointer = FakeCheckpointer()
+    monkeypatch.setattr(agent_main, "get_checkpointer", lambda: checkpointer)
+    monkeypatch.setattr(settings, "CONTEXT_KEEP_TURNS", 6)
+    monkeypatch.setattr(settings, "CHECKPOINT_MAX_MESSAGES", 60)
+    return checkpointer
+
+
+def history(turns):
+    """Stored messages of a chat, ending with the new user message"""
+    messages = []
+    for turn in range(turns):
+        messages.append({"sender": "user", "content": f"pregunta {turn}"})
+        messages.append({"sender": "system", "content": f"respuesta {turn}"})
+    messages.append({"sender": "user", "content": "pregunta nueva"})
+    return messages
+
+
+def saved(message_count, message_total=None, folded=0, keep_turns=6):
+    return {"message_count": message_count, "message_total": message_total or message_count, "folded": folded, "keep_turns": keep_turns}
+
+
+def build(conversation_history, summary=None):
+    context = {"chat_id": "chat-1", "conversation_history": conversation_history, "summary": summary}
+    return EchoAgent().build_input(context, THREAD_ID)
+
+
+def test_first_run_sends_the_window(checkpoint):
+    graph_input, config = build(history(2))
+
+    assert [message.content for message in graph_input["messages"]] == [
+        "pregunta 0", "respuesta 0", "pregunta 1", "respuesta 1", "pregunta nueva",
+    ]
+    assert config["configurable"] == {"thread_id": THREAD_ID}
+    assert config["metadata"]["message_count"] == 6
+    assert (config["metadata"]["folded"], config["metadata"]["keep_turns"]) == (0, 6)
+
+
+def test_resume_only_sends_the_messages_saved_since_the_checkpoint(checkpoint):
+    # The last run covered two turns, its reply included
+    checkpoint.metadata = saved(message_count=4, message_total=7)
+
+    graph_input, config = build(history(2))
+
+    assert graph_input["messages"] == [HumanMessage(content="pregunta nueva")]
+    assert config["metadata"]["message_count"] == 6
+
+
+def test_resume_picks_up_replies_sent_outside_the_graph(checkpoint):
+    # A fast path reply was saved after the checkpointed turn
+    checkpoint.metadata = saved(message_count=3)
+
+    graph_input, _ = build(history(2))
+
+    assert graph_input["messages"] == [AIMessage(content="respuesta 1"), HumanMessage(content="pregunta nueva")]
+
+
+@pytest.mark.parametrize("metadata, summary", [
+    # The summary folded messages since the checkpoint
+    (saved(message_count=4, folded=0), ConversationSummary(text="Resumen", message_count=2)),
+    # The context size changed (budget policy)
+    (saved(message_count=4, keep_turns=3), None),
+    # The checkpointed state grew past CHECKPOINT_MAX_MESSAGES, tool calls included
+    (saved(message_count=4, message_total=60), None),
+    # The stored history is shorter than the checkpoint (chat reset)
+    (saved(message_count=9), None),
+])
+def test_compact_replaces_the_checkpointed_messages(checkpoint, metadata, summary):
+    checkpoint.metadata = metadata
+
+    graph_input, config = build(history(2), summary)
+
+    messages = graph_input["messages"]
+    assert isinstance(messages[0], RemoveMessage)
+    assert messages[-1] == HumanMessage(content="pregunta nueva")
+    assert config["metadata"]["folded"] == (summary.message_count if summary else 0)
+
+
+def test_compact_when_the_window_needs_a_fold(checkpoint, monkeypatch):
+    folds = []
+    monkeypatch.setattr(agent_main.ConversationWindow, "needs_fold", lambda self, history, summary: True)
+    monkeypatch.setattr("src.app.core.agent.context.summary_folds.defer", lambda *args: folds.append(args))
+    checkpoint.metadata = saved(message_count=4)
+
+    graph_input, _ = build(history(2))
+
+    assert isinstance(graph_input["messages"][0], RemoveMessage)
+    assert len(folds) == 1
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import pytest
+
+from src.app.core.crud.outbound_crud import OutboundCRUD
+from src.app.models.whatsapp import DeliveryStatus, OutboundKind, OutboundMessage, StatusTransition
+from src.app.services.infobip_service import InfobipService
+
+SENT_AT = datetime(2025, 5, 1, 10, 0)
+
+
+@pytest.fixture
+def crud(mongo):
+    """Records of one sent message, msg-1"""
+    crud = OutboundCRUD(mongo)
+    crud.add_records([(OutboundMessage(to="573001", kind=OutboundKind.TEXT, content="Hola"), "msg-1")])
+    return crud
+
+
+def transition(status, minute, **kwargs):
+    return StatusTransition(message_id="msg-1", status=status, at=SENT_AT.replace(minute=minute), **kwargs)
+
+
+def record(mongo):
+    return mongo.outbound_messages.find_one({"_id": "msg-1"})
+
+
+def test_parse_delivery_and_seen_reports():
+    transitions = InfobipService().parse_delivery_reports({"results": [
+        {"messageId": "msg-1", "doneAt": "2025-05-01T10:01:00.000+0000", "status": {"groupName": "DELIVERED"}},
+        {"messageId": "msg-2", "doneAt": "2025-05-01T07:02:00.000-0500", "status": {"groupName": "UNDELIVERABLE"},
+         "error": {"id": 7, "permanent": True}},
+        {"messageId": "msg-3", "seenAt": "2025-05-01T10:03:00.000+0000"},
+        {"messageId": "msg-4", "status": {"groupName": "PENDING"}},
+        {"status": {"groupName": "DELIVERED"}},
+    ]})
+
+    assert [(t.message_id, t.status, t.at) for t in transitions] == [
+        ("msg-1", DeliveryStatus.DELIVERED, datetime(2025, 5, 1, 10, 1)),
+        ("msg-2", DeliveryStatus.FAILED, datetime(2025, 5, 1, 12, 2)),
+        ("msg-3", DeliveryStatus.SEEN, datetime(2025, 5, 1, 10, 3)),
+    ]
+    assert transitions[0].error_code is None
+    assert (transitions[1].error_code, transitions[1].permanent) == (7, True)
+
+
+def test_parse_delivery_reports_without_results():
+    assert InfobipService().parse_delivery_reports({}) == []
+
+
+def test_status_moves_up_and_keeps_every_timestamp(mongo, crud):
+    crud.apply_transitions([transition(DeliveryStatus.DELIVERED, 1), transition(DeliveryStatus.SEEN, 2)])
+    # A delivery report arriving after the seen report
+    crud.apply_transitions([transition(DeliveryStatus.DELIVERED, 3)])
+
+    document = record(mongo)
+    assert document["status"] == int(DeliveryStatus.SEEN)
+    assert document["seen_at"] == SENT_AT.replace(minute=2)
+
+
+def test_failure_sets_the_error_fields(mongo, crud):
+    assert crud.apply_transitions([transition(DeliveryStatus.FAILED, 1, error_code=7, permanent=True)]) == 1
+
+    document = record(mongo)
+    assert document["status"] == int(DeliveryStatus.FAILED)
+    assert (document["failed_at"], document["error_code"], document["permanent"]) == (SENT_AT.replace(minute=1), 7, True)
+
+
+def test_late_failure_does_not_touch_a_delivered_message(mongo, crud):
+    crud.apply_transitions([transition(DeliveryStatus.DELIVERED, 1)])
+
+    assert crud.apply_transitions([transition(DeliveryStatus.FAILED, 2, error_code=7)]) == 0
+
+    document = record(mongo)
+    assert document["status"] == int(DeliveryStatus.DELIVERED)
+    assert "failed_at" not in document
+    assert "error_code" not in document
+
+
+def test_failed_message_delivered_later_moves_up(mongo, crud):
+    crud.apply_transitions([transition(DeliveryStatus.FAILED, 1, error_code=7), transition(DeliveryStatus.DELIVERED, 2)])
+
+    assert record(mongo)["status"] == int(DeliveryStatus.DELIVERED)
+
+
+def test_reports_of_unknown_messages_are_not_counted(crud):
+    unknown = StatusTransition(message_id="other", status=DeliveryStatus.DELIVERED, at=SENT_AT)
+
+    assert crud.apply_transitions([unknown, transition(DeliveryStatus.DELIVERED, 1)]) == 1
@@ -0,0 +1,97 @@
+import pytest
+
+from src.app.core.fast_path import (
+    GREETING_REPLIES,
+    THANKS_REPLIES,
+    FastPathAction,
+    FastPathIntent,
+    classify,
+    route,
+)
+from src.app.models.business_stage import BuyerStage, SellerStage
+from src.app.models.chat import RoutingContext
+from src.app.utils.text import normalize_text
+
+BUYER = RoutingContext(role="buyer", buyer_stage=BuyerStage.SCHEDULING)
+SELLER = RoutingContext(role="seller", seller_stage=SellerStage.REGISTRATION)
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("Hola", FastPathIntent.GREETING),
+    ("¡Buenas tardes!", FastPathIntent.GREETING),
+    ("HOLA BROKY", FastPathIntent.GREETING),
+    ("Que tal, cómo estás", FastPathIntent.GREETING),
+    ("Muchas gracias por la información", FastPathIntent.THANKS),
+    ("Perfecto, gracias", FastPathIntent.THANKS),
+    ("te agradezco", FastPathIntent.THANKS),
+    ("Sí", FastPathIntent.AFFIRMATIVE),
+    ("claro que sí", FastPathIntent.AFFIRMATIVE),
+    ("Dale 👍", FastPathIntent.AFFIRMATIVE),
+    ("ok", FastPathIntent.AFFIRMATIVE),
+    ("No gracias", FastPathIntent.NEGATIVE),
+    ("todavía no", FastPathIntent.NEGATIVE),
+    ("👍", FastPathIntent.POSITIVE_EMOJI),
+    ("🙏 🙏", FastPathIntent.POSITIVE_EMOJI),
+    ("❤️", FastPathIntent.POSITIVE_EMOJI),
+    ("😢", FastPathIntent.EMOJI),
+    ("🏠?", FastPathIntent.EMOJI),
+])
+def test_classify_trivial_messages(text, intent):
+    assert classify(text) == intent
+
+
+# They start like a trivial message but carry a question or a request for the agent
+@pytest.mark.parametrize("text", [
+    "hola, quiero ver el apartamento",
+    "Buenos días, tengo una pregunta",
+    "gracias, ¿cuánto cuesta?",
+    "gracias pero no me interesa el precio",
+    "si, el sábado a las 3",
+    "no, prefiero el domingo",
+    "no sé",
+    "ok pero cuál es la dirección",
+    "Mañana",
+    "1",
+    "",
+])
+def test_classify_leaves_real_messages_to_the_agent(text):
+    assert classify(text) is None
+
+
+@pytest.mark.parametrize("text, routing, awaiting_answer, action, reply", [
+    ("gracias", BUYER, False, FastPathAction.TEMPLATE, THANKS_REPLIES["buyer"]),
+    ("gracias", SELLER, False, FastPathAction.TEMPLATE, THANKS_REPLIES["seller"]),
+    ("👍", BUYER, False, FastPathAction.TEMPLATE, THANKS_REPLIES["buyer"]),
+    ("hola", BUYER, False, FastPathAction.TEMPLATE, GREETING_REPLIES[BuyerStage.SCHEDULING]),
+    ("hola", SELLER, True, FastPathAction.TEMPLATE, GREETING_REPLIES[SellerStage.REGISTRATION]),
+    # Answers to a question of the agent need the conversation
+    ("sí", BUYER, True, FastPathAction.WORKER, None),
+    ("no", SELLER, True, FastPathAction.WORKER, None),
+    ("👍", BUYER, True, FastPathAction.WORKER, None),
+    ("😢", BUYER, False, FastPathAction.WORKER, None),
+    # "¿Quieres agendar una visita?" "Gracias" may be a polite no
+    ("gracias", BUYER, True, FastPathAction.AGENT, None),
+    ("muchas gracias", SELLER, True, FastPathAction.AGENT, None),
+    ("¿cuánto cuesta?", BUYER, False, FastPathAction.AGENT, None),
+])
+def test_route_by_intent_and_conversation(text, routing, awaiting_answer, action, reply):
+    decision = route(text, routing, has_history=True, awaiting_answer=awaiting_answer)
+
+    assert decision.action == action
+    assert decision.reply == reply
+
+
+@pytest.mark.parametrize("text", ["hola", "gracias", "sí", "👍"])
+def test_first_message_of_a_chat_goes_to_the_agent(text):
+    assert route(text, BUYER, has_history=False).action == FastPathAction.AGENT
+    assert route(text, None, has_history=True).action == FastPathAction.AGENT
+
+
+@pytest.mark.parametrize("text, normalized", [
+    ("¡Hola, Broky!", "hola broky"),
+    ("Mañana   a las 3:00", "manana a las 3 00"),
+    ("CAMIÓN   pequeño", "camion pequeno"),
+    ("", ""),
+])
+def test_normalize_text(text, normalized):
+    assert normalize_text(text) == normalized
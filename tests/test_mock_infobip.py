@@ -0,0 +1,79 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.app.devtools import mock_infobip
+from src.app.models.whatsapp import DeliveryStatus, WhatsAppError
+from src.app.services.infobip_service import InfobipService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """InfobipService talking to the stand-in in process"""
+    monkeypatch.setattr(InfobipService, "_client", TestClient(mock_infobip.app))
+    monkeypatch.setattr(mock_infobip, "config", {**mock_infobip.config, "latency_ms": 0, "jitter_ms": 0, "error_rate": 0, "reject_rate": 0})
+    mock_infobip.reset()
+    yield InfobipService()
+    mock_infobip.reset()
+
+
+def template(to):
+    return {"to": to, "template_name": "reminder", "language": "es", "template_data": {"placeholders": ["Laura"]}}
+
+
+def test_sends_are_kept_per_recipient(service):
+    response = service.send_text_message("573001", "Hola")
+    service.send_template_message("573001", "reminder", template_data={"placeholders": ["Laura"]})
+
+    assert response.messageId
+    assert [message["kind"] for message in mock_infobip.outbox["573001"]] == ["text", "template"]
+    assert mock_infobip.stats["messages"] == 2
+
+
+def test_template_batch_gets_a_result_per_message(service):
+    results = service.send_template_messages([template("573001"), template("573002")])
+
+    assert [(result.to, result.ok) for result in results] == [("573001", True), ("573002", True)]
+    assert mock_infobip.stats["requests"] == 1
+
+
+def test_rejected_template_messages_are_retryable(service):
+    mock_infobip.configure(reject_rate=1)
+
+    [result] = service.send_template_messages([template("573001")])
+
+    assert (result.ok, result.retryable) == (False, True)
+    assert mock_infobip.outbox == {}
+
+
+@pytest.mark.parametrize("status, retryable", [(429, True), (503, True), (400, False)])
+def test_injected_errors(service, status, retryable):
+    mock_infobip.configure(error_rate=1, error_status=status)
+
+    with pytest.raises(WhatsAppError) as error:
+        service.send_text_message("573001", "Hola")
+
+    assert error.value.status_code == status
+    assert error.value.retryable == retryable
+
+
+def test_configure_rejects_unknown_settings():
+    with pytest.raises(ValueError):
+        mock_infobip.configure(latency=10)
+
+
+def test_inbound_payload_is_received_as_a_message(service):
+    message = service.receive_webhook_message(mock_infobip.inbound_payload("573001", text="¿Sigue disponible?", message_id="in-1"))
+
+    assert (message["from"], message["id"], message["content"]["text"]) == ("573001", "in-1", "¿Sigue disponible?")
+
+
+@pytest.mark.parametrize("group_name, status", [
+    ("DELIVERED", DeliveryStatus.DELIVERED),
+    ("UNDELIVERABLE", DeliveryStatus.FAILED),
+    ("SEEN", DeliveryStatus.SEEN),
+])
+def test_report_payload_is_parsed(service, group_name, status):
+    [transition] = service.parse_delivery_reports(mock_infobip.report_payload(["msg-1"], group_name, permanent=True))
+
+    assert (transition.message_id, transition.status) == ("msg-1", status)
+    assert transition.permanent == (status == DeliveryStatus.FAILED)
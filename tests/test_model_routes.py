@@ -0,0 +1,42 @@
+import pytest
+
+from src.app.config import settings
+from src.app.core.model_routes import ModelRouter, RoutingTable
+
+STAGE = "seller:visits"
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_ROUTE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(settings, "MODEL_ROUTE_FALLBACK_SECONDS", 300)
+    router = ModelRouter("unused.json")
+    router._table = RoutingTable(**{
+        "default": {"model": "gpt-4.1", "fallback": "gpt-4.1-mini"},
+        "stages": {STAGE: {"slo_p95_ms": 1000, "routes": {"*": {"model": "gpt-4o", "fallback": "gpt-4o-mini"}}}},
+    })
+    return router
+
+
+def breach(router):
+    for _ in range(3):
+        router.observe(STAGE, "supervisor", "gpt-4o", 5000)
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_slo_breach_falls_back_only_when_enabled(router, monkeypatch, enabled):
+    monkeypatch.setattr(settings, "MODEL_ROUTE_FALLBACK_ENABLED", enabled)
+
+    breach(router)
+
+    assert router.degraded(STAGE) == enabled
+
+
+def test_stage_within_its_slo_keeps_its_primary_models(router, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_ROUTE_FALLBACK_ENABLED", True)
+
+    for _ in range(3):
+        router.observe(STAGE, "supervisor", "gpt-4o", 200)
+
+    assert not router.degraded(STAGE)
+    assert router.route(STAGE, "supervisor").model == "gpt-4o"
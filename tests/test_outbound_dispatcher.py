@@ -0,0 +1,159 @@
+import threading
+import time
+
+import pytest
+
+from src.app.config import settings
+from src.app.models.whatsapp import OutboundKind, OutboundMessage, WhatsAppError
+from src.app.services import outbound_dispatcher as dispatcher_module
+from src.app.services.outbound_dispatcher import OutboundDispatcher, TokenBucket
+
+
+@pytest.fixture
+def dispatcher(mongo, monkeypatch):
+    """Queued dispatcher with fast retries, sending through a fake _deliver"""
+    monkeypatch.setattr(settings, "OUTBOUND_QUEUE_ENABLED", True)
+    monkeypatch.setattr(settings, "OUTBOUND_WORKERS", 4)
+    monkeypatch.setattr(settings, "OUTBOUND_RATE_PER_SECOND", 1000)
+    monkeypatch.setattr(settings, "OUTBOUND_BURST", 1000)
+    monkeypatch.setattr(settings, "OUTBOUND_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(settings, "OUTBOUND_BACKOFF_MAX", 0.02)
+    monkeypatch.setattr(settings, "OUTBOUND_MAX_ATTEMPTS", 3)
+    dispatcher = OutboundDispatcher()
+    yield dispatcher
+    dispatcher.shutdown(timeout=5)
+
+
+def fake_deliver(monkeypatch, failures=None):
+    """Record the delivered texts per recipient; failures maps a text to the errors of its first attempts"""
+    delivered = {}
+    failures = dict(failures or {})
+    lock = threading.Lock()
+
+    def deliver(message):
+        with lock:
+            errors = failures.get(message.content)
+            if errors:
+                raise errors.pop(0)
+            delivered.setdefault(message.to, []).append(message.content)
+        return None
+
+    monkeypatch.setattr(OutboundDispatcher, "_deliver", staticmethod(deliver))
+    return delivered
+
+
+def text(to, content):
+    return OutboundMessage(to=to, kind=OutboundKind.TEXT, content=content)
+
+
+def test_token_bucket_waits_once_the_burst_is_spent():
+    bucket = TokenBucket(rate=50, capacity=5)
+
+    assert bucket.acquire(5) == 0.0
+    waited = bucket.acquire(1)
+    assert waited == pytest.approx(0.02, abs=0.01)
+
+
+def test_token_bucket_request_over_capacity_leaves_debt():
+    bucket = TokenBucket(rate=100, capacity=2)
+
+    assert bucket.acquire(4) == 0.0
+    # Two tokens of debt plus the one taken: 0.03s
+    assert bucket.acquire(1) == pytest.approx(0.03, abs=0.01)
+
+
+def test_token_bucket_without_rate_never_waits():
+    bucket = TokenBucket(rate=0, capacity=1)
+
+    assert bucket.acquire(100) == 0.0
+
+
+def test_messages_of_a_recipient_keep_their_order_across_retries(monkeypatch, dispatcher):
+    delivered = fake_deliver(monkeypatch, {"1": [WhatsAppError(status_code=429)]})
+
+    for content in ["1", "2", "3"]:
+        dispatcher.enqueue(text("573001", content))
+    dispatcher.enqueue(text("573002", "a"))
+
+    assert dispatcher.flush(timeout=5)
+    assert delivered == {"573001": ["1", "2", "3"], "573002": ["a"]}
+    assert dispatcher.stats()["queued"] == 0
+
+
+def test_a_retrying_recipient_does_not_hold_back_the_others(monkeypatch, dispatcher):
+    monkeypatch.setattr(settings, "OUTBOUND_BACKOFF_BASE", 0.3)
+    monkeypatch.setattr(settings, "OUTBOUND_BACKOFF_MAX", 0.3)
+    delivered = fake_deliver(monkeypatch, {"slow": [WhatsAppError(status_code=503)]})
+
+    dispatcher.enqueue(text("573001", "slow"))
+    dispatcher.enqueue(text("573002", "fast"))
+
+    deadline = time.monotonic() + 0.15
+    while "573002" not in delivered and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert delivered.get("573002") == ["fast"]
+    assert "573001" not in delivered
+    assert dispatcher.flush(timeout=5)
+    assert delivered["573001"] == ["slow"]
+
+
+def test_permanent_errors_are_dead_lettered_right_away(mongo, monkeypatch, dispatcher):
+    fake_deliver(monkeypatch, {"bad": [WhatsAppError(status_code=400)]})
+
+    dispatcher.enqueue(text("573001", "bad"))
+
+    assert dispatcher.flush(timeout=5)
+    [dead_letter] = list(mongo.outbound_dead_letters.find())
+    assert dead_letter["to"] == "573001"
+    assert dead_letter["attempts"] == 1
+    assert dead_letter["error"].startswith("WhatsApp API Error")
+
+
+def test_retryable_errors_are_dead_lettered_after_the_last_attempt(mongo, monkeypatch, dispatcher):
+    errors = [WhatsAppError(status_code=429) for _ in range(settings.OUTBOUND_MAX_ATTEMPTS)]
+    delivered = fake_deliver(monkeypatch, {"throttled": errors})
+
+    dispatcher.enqueue(text("573001", "throttled"))
+    dispatcher.enqueue(text("573001", "next"))
+
+    assert dispatcher.flush(timeout=5)
+    [dead_letter] = list(mongo.outbound_dead_letters.find())
+    assert dead_letter["content"] == "throttled"
+    assert dead_letter["attempts"] == settings.OUTBOUND_MAX_ATTEMPTS
+    # The lane moves on once the message is given up on
+    assert delivered == {"573001": ["next"]}
+
+
+def test_messages_left_at_shutdown_are_dead_lettered(mongo, monkeypatch, dispatcher):
+    monkeypatch.setattr(settings, "OUTBOUND_BACKOFF_BASE", 30)
+    monkeypatch.setattr(settings, "OUTBOUND_BACKOFF_MAX", 30)
+    fake_deliver(monkeypatch, {"stuck": [WhatsAppError(status_code=503)]})
+
+    dispatcher.enqueue(text("573001", "stuck"))
+    assert not dispatcher.flush(timeout=0.2)
+    dispatcher.shutdown(timeout=0)
+
+    [dead_letter] = list(mongo.outbound_dead_letters.find())
+    assert dead_letter["content"] == "stuck"
+    assert dead_letter["error"] == "Not sent before shutdown"
+    assert dispatcher.stats() == {"queued": 0, "recipients": 0, "workers": 0}
+
+
+def test_queued_template_messages_are_batched(monkeypatch, dispatcher):
+    batches = []
+
+    class FakeInfobip:
+        def send_template_messages(self, messages):
+            batches.append([message["to"] for message in messages])
+            return [dispatcher_module.TemplateSendResult(to=message["to"]) for message in messages]
+
+    monkeypatch.setattr(dispatcher_module, "InfobipService", FakeInfobip)
+    # One worker takes every due message in one go
+    monkeypatch.setattr(settings, "OUTBOUND_WORKERS", 1)
+    with dispatcher._condition:
+        for to in ["573001", "573002", "573003"]:
+            dispatcher.enqueue(OutboundMessage(to=to, kind=OutboundKind.TEMPLATE, template_name="reminder"))
+
+    assert dispatcher.flush(timeout=5)
+    assert sorted(sum(batches, [])) == ["573001", "573002", "573003"]
+    assert len(batches) == 1
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from src.app.config import settings
+from src.app.core.agent.turn_context import TurnContext
+from src.app.core.tools.buyer.scheduler import notify_seller
+from src.app.models.whatsapp import OutboundKind, OutboundMessage, WhatsAppError
+from src.app.services.outbound_dispatcher import OutboundDispatcher, outbound_dispatcher
+
+CHAT_ID = ObjectId("66f200000000000000000001")
+SELLER_ID = ObjectId("66f200000000000000000051")
+BUYER_ID = ObjectId("66f200000000000000000052")
+PROPERTY_ID = ObjectId("66f20000000000000000005a")
+
+
+@pytest.fixture
+def inline(mongo, monkeypatch):
+    """Dispatcher sending inline, with the idempotency keys in the in-memory MongoDB"""
+    monkeypatch.setattr(settings, "OUTBOUND_QUEUE_ENABLED", False)
+    monkeypatch.setattr(settings, "OUTBOUND_IDEMPOTENCY_ENABLED", True)
+    monkeypatch.setattr(settings, "OUTBOUND_TRACKING_ENABLED", False)
+    return OutboundDispatcher()
+
+
+def reply(content="Hola", turn_id="wamid.1"):
+    return OutboundMessage(to="573001", kind=OutboundKind.TEXT, content=content, chat_id=str(CHAT_ID), turn_id=turn_id)
+
+
+def test_claim_skips_a_message_already_claimed(mongo, inline):
+    first, again = reply(), reply()
+
+    assert inline._claim([first]) == [first]
+    # Another process (or a redelivered turn) queued the same message
+    assert OutboundDispatcher()._claim([again]) == []
+    assert mongo.outbound_sent_keys.find_one({"_id": first.key})["status"] == "pending"
+
+
+def test_claim_skips_duplicates_within_a_batch_and_keeps_other_messages(inline):
+    first, duplicate, other = reply(), reply(), reply(content="Otra")
+
+    assert inline._claim([first, duplicate, other]) == [first, other]
+
+
+def test_claim_takes_over_a_stale_claim(mongo, inline):
+    message = reply()
+    stale = datetime.utcnow() - timedelta(seconds=settings.OUTBOUND_IDEMPOTENCY_CLAIM_SECONDS + 1)
+    mongo.outbound_sent_keys.insert_one({"_id": message.key, "to": message.to, "status": "pending", "claimed_at": stale})
+
+    assert inline._claim([message]) == [message]
+    assert mongo.outbound_sent_keys.find_one({"_id": message.key})["claimed_at"] > stale
+
+
+def test_claim_ignores_retries_and_messages_without_a_key(inline):
+    retry = reply()
+    retry.attempts = 1
+    keyless = OutboundMessage(to="573001", kind=OutboundKind.TEXT, content="Hola")
+
+    assert inline._claim([retry, keyless]) == [retry, keyless]
+
+
+def test_sent_keys_are_never_claimed_again(mongo, inline):
+    message = reply()
+    inline._claim([message])
+    inline._mark_sent([message])
+    # Even once the claim is old
+    mongo.outbound_sent_keys.update_one({"_id": message.key}, {"$set": {"claimed_at": datetime(2020, 1, 1)}})
+
+    assert inline._claim([reply()]) == []
+    assert OutboundDispatcher()._claim([reply()]) == []
+    assert mongo.outbound_sent_keys.find_one({"_id": message.key})["status"] == "sent"
+
+
+def test_release_lets_a_retried_turn_send_the_message(mongo, inline):
+    message = reply()
+    inline._claim([message])
+    inline._release(message)
+
+    assert mongo.outbound_sent_keys.find_one({"_id": message.key}) is None
+    assert OutboundDispatcher()._claim([reply()]) != []
+
+
+def test_release_keeps_sent_keys(mongo, inline):
+    message = reply()
+    inline._claim([message])
+    inline._mark_sent([message])
+    inline._release(message)
+
+    assert mongo.outbound_sent_keys.find_one({"_id": message.key})["status"] == "sent"
+
+
+def test_inline_send_releases_the_key_when_delivery_fails(mongo, monkeypatch, inline):
+    def fail(message):
+        raise WhatsAppError(status_code=503)
+
+    monkeypatch.setattr(OutboundDispatcher, "_deliver", staticmethod(fail))
+    with pytest.raises(WhatsAppError):
+        inline.send(reply())
+    assert mongo.outbound_sent_keys.count_documents({}) == 0
+
+    delivered = []
+    monkeypatch.setattr(OutboundDispatcher, "_deliver", staticmethod(delivered.append))
+    inline.send(reply())
+    inline.send(reply())
+    assert len(delivered) == 1
+
+
+def test_notify_seller_keys_the_notification_by_chat(mongo, monkeypatch):
+    mongo.users.insert_many([
+        {"_id": SELLER_ID, "name": "Laura Gómez", "phone": "573100000005", "role": "seller", "created_at": datetime(2025, 1, 1)},
+        {"_id": BUYER_ID, "name": "Andrés Pérez", "phone": "573100000006", "role": "buyer", "created_at": datetime(2025, 1, 1)},
+    ])
+    mongo.properties.insert_one({
+        "_id": PROPERTY_ID, "address": "Calle 10 #43-15", "owner_id": str(SELLER_ID), "created_at": datetime(2025, 1, 1),
+    })
+    mongo.chats.insert_one({
+        "_id": CHAT_ID, "user_phone": "573100000006", "user_id": str(BUYER_ID), "property_id": str(PROPERTY_ID),
+        "created_at": datetime(2025, 1, 1), "is_active": True,
+    })
+    mongo.visits.insert_one({
+        "property_id": str(PROPERTY_ID), "buyer_id": str(BUYER_ID), "seller_id": str(SELLER_ID),
+        "scheduled_at": datetime(2025, 5, 3, 15, 0), "status": "requested", "created_at": datetime(2025, 1, 1),
+    })
+    sent = []
+    monkeypatch.setattr(outbound_dispatcher, "send", sent.append)
+
+    turn = TurnContext(chat_id=str(CHAT_ID), turn_id="wamid.1")
+    assert notify_seller.func(state={"chat_id": str(CHAT_ID), "turn": turn}) == "Notificación enviada correctamente"
+
+    [message] = sent
+    assert message.to == "573100000005"
+    assert message.chat_id == str(CHAT_ID)
+    # Keyed by the buyer's chat, not by the seller's phone shared by every buyer
+    other_chat = message.model_copy(update={"chat_id": str(ObjectId())})
+    assert message.key != other_chat.key
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain import hub
+
+from src.app.config import settings
+from src.app.core.prompts import PromptRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = PromptRegistry(settings.PROMPTS_DIR, str(tmp_path))
+    registry.load()
+    return registry
+
+
+def fake_hub(monkeypatch, templates):
+    """Serve the given templates from hub.pull, recording the pulled names"""
+    pulled = []
+
+    def pull(name):
+        pulled.append(name)
+        if name not in templates:
+            raise ValueError(f"{name} not found")
+        return SimpleNamespace(template=templates[name])
+
+    monkeypatch.setattr(hub, "pull", pull)
+    return pulled
+
+
+def test_local_only_prompts_are_not_pulled(monkeypatch, registry):
+    pulled = fake_hub(monkeypatch, {})
+
+    assert registry.refresh_from_hub() == []
+    assert "conversation_summary" not in pulled
+    assert "supervisor" in pulled
+
+
+def test_hub_template_with_other_placeholders_is_not_swapped_in(monkeypatch, registry):
+    fake_hub(monkeypatch, {"booking_agent": "Hoy es {current_date}. Agenda la visita."})
+
+    assert registry.refresh_from_hub() == []
+    prompt = registry.get("booking_agent")
+    assert prompt.version == "v2"
+    prompt.format()
+
+
+def test_hub_template_with_the_same_placeholders_is_swapped_in_and_cached(monkeypatch, registry):
+    fake_hub(monkeypatch, {"agenda_agent": "Registra la agenda y pasa a {next_stage}."})
+
+    assert registry.refresh_from_hub() == ["agenda_agent"]
+    assert registry.get("agenda_agent").version.startswith("hub-")
+
+    restarted = PromptRegistry(settings.PROMPTS_DIR, registry.cache_dir)
+    restarted.load()
+    assert restarted.get("agenda_agent").template == "Registra la agenda y pasa a {next_stage}."
@@ -0,0 +1,86 @@
+import glob
+import os
+
+import pytest
+from bson import json_util
+from langchain_core.messages import HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+from src.app.config import settings
+from src.app.devtools.cassette import Cassette
+from src.app.devtools.harness import AgentHarness
+from src.app.devtools.scripted import DEFAULT_REPLY, ScriptedChatModel, TurnScript
+
+CORPUS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "scripts", "scenarios", "corpus", "*.json")))
+
+
+@tool
+def save_info(value: str) -> str:
+    """Save something"""
+    return "ok"
+
+
+@tool
+def transfer_to_worker() -> str:
+    """Hand the turn to the worker"""
+    return "ok"
+
+
+@tool
+def AgentResponse(type: str, message: str) -> str:
+    """Structured response"""
+    return message
+
+
+def scripted(*tools, tool_calls=None, reply=None):
+    script = TurnScript()
+    script.set(tool_calls, reply)
+    model = ScriptedChatModel(script=script, cassette=Cassette(), model_name="gpt-4.1")
+    return model.bind_tools(list(tools)) if tools else model
+
+
+def test_worker_calls_its_scripted_tools_then_replies():
+    model = scripted(save_info, tool_calls=[{"name": "save_info", "args": {"value": "x"}}, {"name": "other", "args": {}}], reply="Listo")
+    question = HumanMessage(content="hola")
+
+    step = model.invoke([question])
+    [call] = step.tool_calls
+    answer = model.invoke([question, step, ToolMessage(content="ok", name="save_info", tool_call_id=call["id"])])
+
+    assert (call["name"], call["args"]) == ("save_info", {"value": "x"})
+    assert answer.content == "Listo"
+    assert answer.usage_metadata["total_tokens"] > 0
+
+
+def test_supervisor_hands_off_then_replies():
+    model = scripted(transfer_to_worker, reply="Listo")
+    question = HumanMessage(content="hola")
+
+    handoff = model.invoke([question])
+    answer = model.invoke([question, handoff, ToolMessage(content="ok", name="transfer_to_worker", tool_call_id=handoff.tool_calls[0]["id"])])
+
+    assert handoff.tool_calls[0]["name"] == "transfer_to_worker"
+    assert (answer.content, answer.tool_calls) == ("Listo", [])
+
+
+def test_structured_response_carries_the_reply():
+    response = scripted(AgentResponse).invoke([HumanMessage(content="hola")])
+
+    assert response.tool_calls[0]["args"] == {"type": "text", "message": DEFAULT_REPLY}
+
+
+@pytest.mark.parametrize("streaming, direct", [(False, False), (True, False), (False, True)], ids=["run", "stream", "direct"])
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_corpus_scenario_runs_through_the_webhook(mongo, monkeypatch, path, streaming, direct):
+    monkeypatch.setattr(settings, "AGENT_STREAMING", streaming)
+    monkeypatch.setattr(settings, "AGENT_DIRECT_SINGLE_WORKER", direct)
+    with open(path, encoding="utf-8") as f:
+        scenario = json_util.loads(f.read())
+
+    with AgentHarness(Cassette(), mode="scripted") as harness:
+        results = harness.run(scenario)
+
+    for result, message in zip(results, scenario["messages"]):
+        assert result.replies == [message["reply"]]
+        # Scripted tools take a model step of their own before the reply
+        assert result.model_calls >= (2 if message.get("tools") else 1)
@@ -0,0 +1,97 @@
+import pytest
+
+from src.app.models.whatsapp import WhatsAppError, WhatsAppTemplateResponse
+from src.app.services.infobip_service import InfobipService
+
+
+def reply(to, group="PENDING", message_id=None):
+    return {
+        "to": to, "messageCount": 1, "messageId": message_id or f"id-{to}",
+        "status": {"groupId": 1, "groupName": group, "id": 7, "name": f"{group}_ENROUTE", "description": "Message sent"},
+    }
+
+
+def message(to, placeholders=("Laura",)):
+    return {"to": to, "template_name": "reminder", "language": "es", "template_data": {"placeholders": list(placeholders)}}
+
+
+@pytest.fixture
+def service():
+    return InfobipService()
+
+
+def answer(monkeypatch, service, replies):
+    """Answer the template request with the given replies, recording the sent recipients"""
+    posted = []
+
+    def post_templates(entries):
+        posted.append([entry["to"] for entry in entries])
+        return WhatsAppTemplateResponse(messages=replies)
+
+    monkeypatch.setattr(service, "_post_templates", post_templates)
+    return posted
+
+
+def test_results_follow_the_request_order(monkeypatch, service):
+    answer(monkeypatch, service, [reply("573001"), reply("573002")])
+
+    results = service.send_template_messages([message("573001"), message("573002")])
+
+    assert [(result.to, result.ok, result.response.messageId) for result in results] == [
+        ("573001", True, "id-573001"), ("573002", True, "id-573002"),
+    ]
+
+
+def test_replies_out_of_order_are_matched_by_recipient(monkeypatch, service):
+    answer(monkeypatch, service, [reply("573002"), reply("573001")])
+
+    results = service.send_template_messages([message("573001"), message("573002")])
+
+    assert [result.response.to for result in results] == ["573001", "573002"]
+
+
+def test_invalid_placeholders_are_not_sent(monkeypatch, service):
+    posted = answer(monkeypatch, service, [reply("573002")])
+
+    results = service.send_template_messages([message("573001", placeholders=("",)), message("573002")])
+
+    assert posted == [["573002"]]
+    assert not results[0].ok and not results[0].retryable
+    assert results[1].ok
+
+
+def test_rejected_and_missing_messages_are_retryable(monkeypatch, service):
+    answer(monkeypatch, service, [reply("573001", group="REJECTED")])
+
+    rejected, missing = service.send_template_messages([message("573001"), message("573002")])
+
+    assert (rejected.ok, rejected.retryable, rejected.response.messageId) == (False, True, "id-573001")
+    assert rejected.error.startswith("REJECTED_ENROUTE")
+    assert (missing.ok, missing.retryable, missing.response) == (False, True, None)
+
+
+def test_same_recipient_twice_gets_one_reply_each(monkeypatch, service):
+    answer(monkeypatch, service, [reply("573001", message_id="b"), reply("573002"), reply("573001", message_id="a")])
+
+    results = service.send_template_messages([message("573001"), message("573001"), message("573002")])
+
+    assert sorted(result.response.messageId for result in results[:2]) == ["a", "b"]
+    assert results[2].response.messageId == "id-573002"
+
+
+def test_no_valid_message_sends_nothing(monkeypatch, service):
+    posted = answer(monkeypatch, service, [])
+
+    [result] = service.send_template_messages([message("573001", placeholders=(None,))])
+
+    assert posted == []
+    assert not result.ok
+
+
+def test_failed_request_raises(monkeypatch, service):
+    def post_templates(entries):
+        raise WhatsAppError(status_code=429)
+
+    monkeypatch.setattr(service, "_post_templates", post_templates)
+    with pytest.raises(WhatsAppError):
+        service.send_template_messages([message("573001")])
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from src.app.core.agent.tool_executor import ConcurrentToolNode, read_only
+
+events = []
+# The two lookups only get past it when they run at the same time
+both_running = threading.Barrier(2, timeout=2)
+
+
+@read_only
+@tool
+def lookup(name: str) -> str:
+    """Read something"""
+    events.append(f"start {name}")
+    both_running.wait()
+    events.append(f"end {name}")
+    return f"read {name}"
+
+
+@tool
+def save(name: str) -> str:
+    """Write something"""
+    events.append(f"save {name}")
+    return f"saved {name}"
+
+
+@read_only
+@tool
+async def alookup(name: str) -> str:
+    """Read something, async"""
+    events.append(f"start {name}")
+    await asyncio.sleep(0.05)
+    events.append(f"end {name}")
+    return f"read {name}"
+
+
+def step(*calls):
+    return {"messages": [AIMessage(content="", tool_calls=[
+        {"name": name, "args": {"name": arg}, "id": f"call-{index}"} for index, (name, arg) in enumerate(calls)
+    ])]}
+
+
+def setup_function():
+    events.clear()
+    both_running.reset()
+
+
+def test_batches_group_consecutive_read_only_calls():
+    node = ConcurrentToolNode([lookup, save])
+    calls = step(("lookup", "a"), ("lookup", "b"), ("save", "c"), ("lookup", "d"), ("save", "e"), ("save", "f"))
+
+    assert node.batches(calls["messages"][0].tool_calls) == [[0, 1], [2], [3], [4], [5]]
+
+
+def test_read_only_calls_run_concurrently_and_keep_their_order():
+    node = ConcurrentToolNode([lookup, save], max_concurrency=4)
+
+    result = node.invoke(step(("lookup", "a"), ("lookup", "b"), ("save", "c")))
+
+    assert [message.content for message in result["messages"]] == ["read a", "read b", "saved c"]
+    assert [message.tool_call_id for message in result["messages"]] == ["call-0", "call-1", "call-2"]
+    # The save waits for both lookups
+    assert events[-1] == "save c"
+    assert sorted(events[:2]) == ["start a", "start b"]
+
+
+def test_a_lookup_after_a_save_runs_after_it():
+    node = ConcurrentToolNode([lookup, save])
+
+    result = node.invoke(step(("save", "a"), ("lookup", "b"), ("lookup", "c")))
+
+    assert events[0] == "save a"
+    assert [message.content for message in result["messages"]] == ["saved a", "read b", "read c"]
+
+
+def test_async_read_only_calls_run_concurrently():
+    node = ConcurrentToolNode([alookup, save])
+
+    result = asyncio.run(node.ainvoke(step(("alookup", "a"), ("alookup", "b"), ("save", "c"))))
+
+    assert events[:2] == ["start a", "start b"]
+    assert events[-1] == "save c"
+    assert [message.content for message in result["messages"]] == ["read a", "read b", "saved c"]
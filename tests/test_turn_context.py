@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from src.app.core.agent.turn_context import TurnContext
+from src.app.core.tools.buyer.scheduler import get_seller_availability
+from src.app.core.tools.general import get_business_stage
+from src.app.models.business_stage import BuyerStage
+from src.app.services.chat_service import ChatService
+
+SELLER_ID = ObjectId("66f100000000000000000051")
+PROPERTY_ID = ObjectId("66f10000000000000000005a")
+BUYER_PHONE = "573100000006"
+
+
+def seed(db):
+    db.users.insert_many([
+        {
+            "_id": SELLER_ID, "name": "Laura Gómez", "phone": "573100000005", "role": "seller",
+            "availability": [{"day_of_week": 5, "start_time": "14:00:00", "end_time": "16:00:00", "description": "Sábados en la tarde"}],
+            "created_at": datetime(2025, 1, 1),
+        },
+        {"name": "Andrés Pérez", "phone": BUYER_PHONE, "role": "buyer", "created_at": datetime(2025, 1, 1)},
+    ])
+    db.properties.insert_one({
+        "_id": PROPERTY_ID, "address": "Calle 10 #43-15, El Poblado, Medellín", "type": "apartamento",
+        "value": 650000000, "owner_id": str(SELLER_ID), "business_stage": "visits", "created_at": datetime(2025, 1, 1),
+    })
+    # A buyer chat after the inquiry message linked the property
+    db.chats.insert_one({
+        "user_phone": BUYER_PHONE, "user_id": "pending", "property_id": str(PROPERTY_ID),
+        "business_stage": BuyerStage.SCHEDULING.value, "created_at": datetime(2025, 1, 1), "is_active": True,
+        "routing": {"role": "buyer", "property_id": str(PROPERTY_ID), "seller_stage": "visits", "buyer_stage": "scheduling", "version": 1},
+    })
+
+
+def follow_up_turn():
+    """Resolve a follow-up buyer message and prime the turn context with its chat, as the webhook does"""
+    user_type, chat = ChatService().resolve_chat({"from": BUYER_PHONE, "content": {"text": "¿Qué horarios tiene disponibles?"}})
+    turn = TurnContext(chat_id=chat.id).prime(chat=chat)
+    return user_type, chat, turn
+
+
+def test_primed_chat_keeps_the_linked_property_and_stage(mongo):
+    seed(mongo)
+
+    user_type, chat, turn = follow_up_turn()
+
+    assert user_type == "buyer"
+    assert chat.property_id == str(PROPERTY_ID)
+    assert chat.routing.property_id == str(PROPERTY_ID)
+    assert turn.linked_property.id == str(PROPERTY_ID)
+    assert turn.buyer_stage == BuyerStage.SCHEDULING
+
+
+def test_follow_up_tools_read_the_primed_context(mongo):
+    seed(mongo)
+    _, chat, turn = follow_up_turn()
+    state = {"chat_id": chat.id, "turn": turn}
+
+    slots = get_seller_availability.func(state=state)
+    stage = get_business_stage.func(user_type="buyer", state=state)
+
+    assert [slot.description for slot in slots] == ["Sábados en la tarde"]
+    assert stage["stage"] == BuyerStage.SCHEDULING.value
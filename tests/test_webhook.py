@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from src.app.config import settings
+from src.app.core.fast_path import THANKS_REPLIES
+from src.app.devtools.cassette import Cassette
+from src.app.devtools.harness import AgentHarness
+from src.app.services.infobip_service import InfobipService
+
+SELLER_ID = ObjectId("66f100000000000000000051")
+ADDRESS = "Calle 10 #43-15, El Poblado, Medellín"
+SEED = {
+    "users": [{"_id": SELLER_ID, "name": "Laura Gómez", "phone": "573100000005", "role": "seller", "created_at": datetime(2025, 1, 1)}],
+    "properties": [{
+        "_id": ObjectId("66f10000000000000000005a"), "address": ADDRESS, "type": "apartamento", "value": 650000000,
+        "owner_id": str(SELLER_ID), "business_stage": "visits", "is_active": True, "created_at": datetime(2025, 1, 1),
+    }],
+}
+INQUIRY = f"¡Hola! 🏠 Me gustaría obtener información sobre la propiedad ubicada en {ADDRESS}"
+
+
+@pytest.fixture
+def harness(mongo, monkeypatch):
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", True)
+    with AgentHarness(Cassette(), mode="scripted") as harness:
+        harness.reset_db(SEED)
+        yield harness
+
+
+def test_follow_up_fact_question_is_cached_for_the_next_buyer(harness):
+    harness.run_turn(0, {"from": "573100000006", "text": INQUIRY, "reply": "¡Hola! ¿Cómo te llamas?"})
+    first = harness.run_turn(1, {"from": "573100000006", "text": "¿Cuánto cuesta el apartamento?", "reply": "Cuesta 650 millones, Andrés."})
+
+    harness.run_turn(2, {"from": "573100000007", "text": INQUIRY, "reply": "¡Hola! ¿Cómo te llamas?"})
+    second = harness.run_turn(3, {"from": "573100000007", "text": "cuanto cuesta el apartamento", "reply": "No debería llegar aquí"})
+
+    assert first.replies == ["Cuesta 650 millones, Andrés."]
+    # The other buyer gets the answer built from the property, not the first buyer's reply
+    assert second.replies == ["El precio de la propiedad es $650.000.000."]
+    assert second.model_calls == 0
+
+
+def test_different_question_runs_the_agent(harness):
+    harness.run_turn(0, {"from": "573100000006", "text": INQUIRY})
+    harness.run_turn(1, {"from": "573100000006", "text": "¿Cuánto cuesta el apartamento?", "reply": "Cuesta 650 millones, Andrés."})
+
+    turn = harness.run_turn(2, {"from": "573100000006", "text": "¿cuánto cuesta con descuento?", "reply": "Déjame consultarlo con la dueña."})
+
+    assert turn.replies == ["Déjame consultarlo con la dueña."]
+    assert turn.model_calls > 0
+
+
+def test_processing_indicator_is_sent_on_every_path(harness, monkeypatch):
+    indicated = []
+
+    async def asend_processing_indicator(service, to, message_id):
+        indicated.append(to)
+
+    monkeypatch.setattr(InfobipService, "asend_processing_indicator", asend_processing_indicator)
+    harness.run_turn(0, {"from": "573100000006", "text": INQUIRY, "reply": "¡Hola! ¿Cómo te llamas?"})
+    harness.run_turn(1, {"from": "573100000006", "text": "¿Cuánto cuesta el apartamento?", "reply": "Cuesta 650 millones, Andrés."})
+    # Answered from the cache
+    harness.run_turn(2, {"from": "573100000006", "text": "cuanto cuesta el apartamento"})
+
+    assert indicated == ["573100000006"] * 3
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_fast_path_only_answers_thanks_when_enabled(harness, monkeypatch, enabled):
+    monkeypatch.setattr(settings, "FAST_PATH_ENABLED", enabled)
+    harness.run_turn(0, {"from": "573100000006", "text": INQUIRY, "reply": "Con gusto te ayudo con la propiedad."})
+
+    turn = harness.run_turn(1, {"from": "573100000006", "text": "¡Muchas gracias!", "reply": "¡A ti, Andrés!"})
+
+    if enabled:
+        assert turn.replies == [THANKS_REPLIES["buyer"]]
+        assert turn.model_calls == 0
+    else:
+        assert turn.replies == ["¡A ti, Andrés!"]